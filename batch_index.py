@@ -0,0 +1,216 @@
+# batch_index.py
+# 历史批次指纹索引：每个已分析批次保存一条逐通道特征向量（DataAnalyzer.batch_fingerprint），持久化到缓存目录
+# 相似批次检索为稳健标准化后的暴力欧氏距离（矩阵-向量乘积 + 部分排序），上万个批次也在毫秒级完成
+
+import os
+import json
+import warnings
+import numpy as np
+
+INDEX_FOLDER = os.path.join("cache", "batch_index")
+
+class BatchIndex:
+    """
+    批次指纹索引：(批次数 × 特征数) 矩阵，特征为 (列名, 特征名)，批次缺少的特征为NaN
+
+    矩阵保存为 fingerprints.npy，批次与特征的元数据保存为 index.json
+    """
+
+    def __init__(self, folder=INDEX_FOLDER):
+        self.folder = folder
+        self.batches = []  # [{"name", "path", "mtime", "rows"}]
+        self.features = []  # [(列名, 特征名)]
+        self._feature_pos = {}
+        self._path_pos = {}
+        self._rows = []  # 尚未并入矩阵的新增行 (特征位置数组, 值数组)
+        self._matrix = np.empty((0, 0))
+        self._scaled = None  # 缓存的稳健标准化矩阵
+        self.load()
+
+    def __len__(self):
+        return len(self.batches)
+
+    def load(self):
+        """从缓存目录加载索引，不存在时为空索引"""
+        meta_path = os.path.join(self.folder, "index.json")
+        if not os.path.exists(meta_path):
+            return self
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.batches = meta["batches"]
+        self.features = [tuple(feature) for feature in meta["features"]]
+        self._feature_pos = {feature: i for i, feature in enumerate(self.features)}
+        self._path_pos = {batch["path"]: i for i, batch in enumerate(self.batches)}
+        self._matrix = np.load(os.path.join(self.folder, "fingerprints.npy"))
+        self._rows = []
+        self._scaled = None
+        return self
+
+    def save(self):
+        """写入缓存目录（先写临时文件再替换，避免中断时留下不一致的索引）"""
+        os.makedirs(self.folder, exist_ok=True)
+        matrix = self.matrix()
+        matrix_path = os.path.join(self.folder, "fingerprints.npy")
+        meta_path = os.path.join(self.folder, "index.json")
+        with open(matrix_path + ".tmp", "wb") as f:
+            np.save(f, matrix)
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"batches": self.batches, "features": [list(feature) for feature in self.features]},
+                      f, ensure_ascii=False, indent=2)
+        os.replace(matrix_path + ".tmp", matrix_path)
+        os.replace(meta_path + ".tmp", meta_path)
+        return self
+
+    def find(self, path):
+        """按文件路径查找批次序号，未索引返回None"""
+        return self._path_pos.get(os.path.abspath(path))
+
+    def is_current(self, path):
+        """文件已索引且之后未修改"""
+        i = self.find(path)
+        return i is not None and self.batches[i]["mtime"] == os.path.getmtime(path)
+
+    def _vector(self, fingerprint, grow):
+        """把 {列名: {特征名: 值}} 展开为 (特征位置, 值)；grow 为 True 时登记新特征"""
+        positions, values = [], []
+        for col, features in fingerprint.items():
+            for name, value in features.items():
+                feature = (col, name)
+                if feature not in self._feature_pos:
+                    if not grow:
+                        continue
+                    self._feature_pos[feature] = len(self.features)
+                    self.features.append(feature)
+                positions.append(self._feature_pos[feature])
+                values.append(value)
+        return np.asarray(positions, dtype=np.intp), np.asarray(values, dtype=float)
+
+    def add(self, name, path, fingerprint, rows=None):
+        """
+        登记一个批次的指纹；同一文件重复登记时覆盖旧指纹
+
+        参数:
+            name (str): 批次名
+            path (str): 文件路径
+            fingerprint (dict): DataAnalyzer.batch_fingerprint 的结果
+            rows (int): 数据行数（仅记录）
+        """
+        path = os.path.abspath(path)
+        entry = {"name": name, "path": path,
+                 "mtime": os.path.getmtime(path) if os.path.exists(path) else None, "rows": rows}
+        positions, values = self._vector(fingerprint, grow=True)
+        existing = self.find(path)
+        if existing is not None:
+            matrix = self.matrix()
+            matrix[existing] = np.nan
+            matrix[existing, positions] = values
+            self.batches[existing] = entry
+        else:
+            self._path_pos[path] = len(self.batches)
+            self.batches.append(entry)
+            self._rows.append((positions, values))
+        self._scaled = None
+        return self
+
+    def _widen(self, matrix):
+        """特征数增加后在右侧补NaN列"""
+        wide = np.full((matrix.shape[0], len(self.features)), np.nan)
+        wide[:, :matrix.shape[1]] = matrix
+        return wide
+
+    def matrix(self):
+        """(批次数 × 特征数) 指纹矩阵，新增行在此时一次并入"""
+        if self._rows or self._matrix.shape[1] < len(self.features):
+            matrix = self._widen(self._matrix)
+            if self._rows:
+                new = np.full((len(self._rows), len(self.features)), np.nan)
+                for i, (positions, values) in enumerate(self._rows):
+                    new[i, positions] = values
+                matrix = np.vstack([matrix, new])
+            self._matrix = matrix
+            self._rows = []
+        return self._matrix
+
+    def _scaled_matrix(self):
+        """
+        按特征稳健标准化：(x - 中位数) / (1.4826 × MAD)，MAD 为0时用标准差，仍为0时不缩放；缺失值记为0（中位数处）
+
+        返回:
+            tuple: (标准化矩阵, 中位数, 尺度)
+        """
+        if self._scaled is None:
+            matrix = self.matrix()
+            with np.errstate(invalid='ignore', divide='ignore'), warnings.catch_warnings():
+                # 全为NaN的特征（所有批次都缺失）中位数为NaN，下面统一处理
+                warnings.simplefilter('ignore', RuntimeWarning)
+                center = np.nanmedian(matrix, axis=0)
+                scale = 1.4826 * np.nanmedian(np.abs(matrix - center), axis=0)
+                scale = np.where(scale > 0, scale, np.nanstd(matrix, axis=0))
+            center = np.nan_to_num(center, nan=0.0)
+            scale = np.where(np.isfinite(scale) & (scale > 0), scale, 1.0)
+            scaled = np.nan_to_num((matrix - center) / scale, nan=0.0, posinf=0.0, neginf=0.0)
+            self._scaled = (scaled, center, scale)
+        return self._scaled
+
+    def search(self, fingerprint, k=5, exclude_path=None, difference_count=3):
+        """
+        检索与给定指纹最相似的 k 个历史批次
+
+        只比较查询批次具备的特征；距离为稳健标准化后的欧氏距离除以 √特征数（平均每个特征偏离多少个稳健标准差）
+
+        参数:
+            fingerprint (dict): 查询批次的指纹
+            k (int): 返回的相似批次数
+            exclude_path (str): 排除的文件（通常为查询批次自身）
+            difference_count (int): 每个相似批次列出差异最大的特征数
+
+        返回:
+            list: [{"name", "path", "distance", "coverage", "largest_differences"}]，按距离从小到大
+        """
+        if not self.batches:
+            return []
+        scaled, center, scale = self._scaled_matrix()
+        positions, values = self._vector(fingerprint, grow=False)
+        keep = np.isfinite(values)
+        positions, values = positions[keep], values[keep]
+        if len(positions) == 0:
+            return []
+        query = (values - center[positions]) / scale[positions]
+        subset = scaled[:, positions]
+
+        # ||x - q||² = ||x||² - 2x·q + ||q||²，一次矩阵-向量乘积得到所有批次的距离
+        squared = np.einsum('ij,ij->i', subset, subset) - 2 * (subset @ query) + query @ query
+        distances = np.sqrt(np.maximum(squared, 0.0) / len(positions))
+        if exclude_path is not None:
+            excluded = self.find(exclude_path)
+            if excluded is not None:
+                distances[excluded] = np.inf
+
+        available = int(np.isfinite(distances).sum())
+        k = min(k, available)
+        if k <= 0:
+            return []
+        nearest = np.argpartition(distances, k - 1)[:k] if k < len(distances) else np.arange(len(distances))
+        nearest = nearest[np.argsort(distances[nearest], kind='stable')][:k]
+
+        matrix = self.matrix()
+        results = []
+        for i in nearest:
+            gap = np.abs(subset[i] - query)
+            d = min(difference_count, len(positions))
+            largest = np.argpartition(-gap, d - 1)[:d] if 0 < d < len(positions) else np.arange(d)
+            largest = largest[np.argsort(-gap[largest], kind='stable')]
+            results.append({
+                "name": self.batches[i]["name"],
+                "path": self.batches[i]["path"],
+                "distance": float(distances[i]),
+                "coverage": float(np.isfinite(matrix[i, positions]).mean()),  # 查询特征中该批次具备的比例
+                "largest_differences": [{
+                    "column": self.features[positions[f]][0],
+                    "feature": self.features[positions[f]][1],
+                    "query_value": float(values[f]),
+                    "batch_value": float(matrix[i, positions[f]]),
+                    "scaled_difference": float(subset[i, f] - query[f])
+                } for f in largest]
+            })
+        return results
@@ -0,0 +1,348 @@
+# benchmark_analyzer.py
+# 分析引擎性能基准：对比优化前后的调用方式，并校验结果一致
+
+import time
+import json
+import numpy as np
+import pandas as pd
+from scipy.stats import linregress, ttest_ind
+from data_analyzer import DataAnalyzer
+from benchmark_baseline import BaselineAnalyzer
+
+def make_benchmark_data(rows=20000, cols=40, seed=42):
+    """
+    构造模拟测试数据：若干数值通道 + 时间列，含少量缺失值和以字符串存储的数值列
+    """
+    rng = np.random.default_rng(seed)
+    data = {"时间": pd.date_range("2024-01-01", periods=rows, freq="s").astype(str)}
+    for i in range(cols):
+        values = rng.normal(10 + i, 1 + i * 0.01, rows) + np.linspace(0, 0.5, rows)
+        values[rng.choice(rows, rows // 100, replace=False)] = np.nan
+        data[f"CH{i:03d}"] = values
+    df = pd.DataFrame(data)
+    # 模拟CSV读入后仍为字符串的数值列
+    df["CH000"] = df["CH000"].astype(str)
+    return df
+
+def _timeit(func, repeat=3):
+    """返回多次执行中的最短耗时（秒）和最后一次的结果"""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def _same(a, b):
+    """按JSON序列化结果比较（NaN也视为相等）"""
+    return json.dumps(a, sort_keys=True, default=str) == json.dumps(b, sort_keys=True, default=str)
+
+def _matches_baseline(baseline, current, rtol=1e-9):
+    """基线输出中的每个字段在新输出中都存在且相等（浮点按相对误差比较）；新输出新增的字段不参与比较"""
+    if isinstance(baseline, dict):
+        return isinstance(current, dict) and all(
+            key in current and _matches_baseline(value, current[key], rtol) for key, value in baseline.items())
+    if isinstance(baseline, list):
+        return (isinstance(current, list) and len(baseline) == len(current)
+                and all(_matches_baseline(a, b, rtol) for a, b in zip(baseline, current)))
+    if isinstance(baseline, float):
+        return isinstance(current, (int, float)) and bool(np.isclose(baseline, current, rtol=rtol, equal_nan=True))
+    return baseline == current
+
+def benchmark_comprehensive_analysis(rows=20000, cols=40):
+    """
+    综合分析基准：基线版本的原始实现（benchmark_baseline，各分析段独立数值化，摘要再重算一遍统计/稳定性/趋势）
+    对比共享分析上下文的 comprehensive_analysis，并逐字段校验与基线输出一致
+
+    基线的趋势回归在有缺失值时 x 与 y 错位（新实现已按行对齐），且不使用时间列，
+    因此半数通道补齐缺失值，时间列为等间隔1秒（经过秒数与行号相同），趋势段只比较这些无缺失的通道
+    """
+    df = make_benchmark_data(rows, cols)
+    complete = [f"CH{i:03d}" for i in range(1, cols, 2)]
+    for col in complete:
+        df[col] = df[col].interpolate(limit_direction="both")
+    baseline = BaselineAnalyzer()
+    analyzer = DataAnalyzer()
+
+    baseline_time, baseline_result = _timeit(lambda: baseline.comprehensive_analysis(df, None, "时间"))
+    fused_time, fused_result = _timeit(lambda: analyzer.comprehensive_analysis(df, None, "时间"))
+
+    sections = {
+        section: _matches_baseline(baseline_result[section], fused_result[section])
+        for section in baseline_result if section != "trend_analysis"
+    }
+    sections["trend_analysis"] = _matches_baseline(
+        {col: baseline_result["trend_analysis"][col] for col in complete},
+        {col: fused_result["trend_analysis"].get(col) for col in complete}, rtol=1e-7)
+    identical = all(sections.values())
+
+    print(f"=== comprehensive_analysis ({rows} 行 × {cols} 列) ===")
+    print(f"基线实现: {baseline_time:.3f}s")
+    print(f"共享上下文: {fused_time:.3f}s")
+    print(f"加速比: {baseline_time / fused_time:.2f}x, 与基线输出一致: {identical}")
+    if not identical:
+        print("不一致的分析段:", [section for section, ok in sections.items() if not ok])
+
+    return {"baseline": baseline_time, "fused": fused_time, "identical": identical}
+
+def benchmark_basic_statistics(rows=5000, cols=400):
+    """
+    基础统计基准：逐列 pandas 计算（旧实现）对比二维矩阵向量化计算
+    """
+    df = make_benchmark_data(rows, cols)
+    analyzer = DataAnalyzer()
+    columns = [col for col in df.columns if col != "时间"]
+
+    def legacy():
+        results = {}
+        for col in columns:
+            series = pd.to_numeric(df[col], errors="coerce").dropna()
+            results[col] = {
+                "count": len(series),
+                "mean": float(series.mean()),
+                "std": float(series.std()),
+                "min": float(series.min()),
+                "max": float(series.max()),
+                "median": float(series.median()),
+                "cv": float(series.std() / series.mean()) if series.mean() != 0 else 0,
+                "q25": float(series.quantile(0.25)),
+                "q75": float(series.quantile(0.75))
+            }
+        return results
+
+    legacy_time, legacy_result = _timeit(legacy)
+    vector_time, vector_result = _timeit(lambda: analyzer.basic_statistics(df, columns))
+
+    identical = all(
+        np.allclose([legacy_result[col][key] for key in legacy_result[col]],
+                    [vector_result[col][key] for key in legacy_result[col]],
+                    rtol=1e-9, equal_nan=True)
+        for col in columns
+    )
+
+    print(f"=== basic_statistics ({rows} 行 × {cols} 列) ===")
+    print(f"逐列计算: {legacy_time:.3f}s")
+    print(f"向量化: {vector_time:.3f}s")
+    print(f"加速比: {legacy_time / vector_time:.2f}x, 结果一致: {identical}")
+
+    return {"legacy": legacy_time, "vectorized": vector_time, "identical": identical}
+
+def benchmark_stability_analysis(rows=20000, cols=200, window_sizes=(10, 100, 1000)):
+    """
+    稳定性基准：逐列 pandas rolling（旧实现，每个窗口单独计算）对比累积和滚动引擎
+    """
+    df = make_benchmark_data(rows, cols)
+    analyzer = DataAnalyzer()
+    columns = [col for col in df.columns if col != "时间"]
+
+    def legacy():
+        results = {}
+        for window in window_sizes:
+            for col in columns:
+                series = pd.to_numeric(df[col], errors="coerce").dropna()
+                rolling_std = series.rolling(window=window).std()
+                pct_change = series.pct_change().dropna()
+                results[(col, window)] = {
+                    "rolling_std_mean": float(rolling_std.mean()),
+                    "rolling_std_max": float(rolling_std.max()),
+                    "max_change_rate": float(abs(pct_change).max()),
+                    "avg_change_rate": float(abs(pct_change).mean()),
+                    "stable_periods": int(sum(rolling_std < rolling_std.mean()))
+                }
+        return results
+
+    legacy_time, legacy_result = _timeit(legacy, repeat=1)
+    engine_time, engine_result = _timeit(lambda: analyzer.multi_window_stability(df, columns, window_sizes), repeat=1)
+
+    identical = all(
+        np.allclose([legacy_result[(col, window)][key] for key in legacy_result[(col, window)]],
+                    [engine_result[col][window][key] for key in legacy_result[(col, window)]],
+                    rtol=1e-7)
+        for col in columns for window in window_sizes
+    )
+
+    print(f"=== stability_analysis ({rows} 行 × {cols} 列, 窗口 {list(window_sizes)}) ===")
+    print(f"逐列逐窗口计算: {legacy_time:.3f}s")
+    print(f"滚动引擎: {engine_time:.3f}s")
+    print(f"加速比: {legacy_time / engine_time:.2f}x, 结果一致: {identical}")
+
+    return {"legacy": legacy_time, "engine": engine_time, "identical": identical}
+
+def benchmark_rolling_precision(rows=500000, window=10):
+    """
+    滚动标准差精度校验：大动态范围序列（大偏移上的线性漂移、1e7 阶跃）上对比 pandas rolling().std()
+    与逐窗口两遍法的精确值；pandas 自身用增量更新，也有约 1e-4 的相对误差，stable_periods 按精确值比较
+    """
+    rng = np.random.default_rng(0)
+    cases = {
+        "漂移": 1e4 + np.linspace(0, 5e4, rows) + rng.normal(0, 0.1, rows),
+        "阶跃": np.concatenate([rng.normal(0, 40, rows // 2), rng.normal(1e7, 40, rows - rows // 2)]),
+    }
+    analyzer = DataAnalyzer()
+    identical = True
+    print(f"=== rolling 精度 ({rows} 行, 窗口 {window}) ===")
+    for name, values in cases.items():
+        engine = analyzer.multi_window_stability(pd.DataFrame({"A": values}), ["A"], [window])["A"][window]
+        pandas_std = pd.Series(values).rolling(window).std()
+        exact = np.lib.stride_tricks.sliding_window_view(values, window).std(axis=1, ddof=1)
+        matches = (
+            np.allclose([engine["rolling_std_mean"], engine["rolling_std_max"]],
+                        [pandas_std.mean(), pandas_std.max()], rtol=1e-4)
+            and np.allclose([engine["rolling_std_mean"], engine["rolling_std_max"]],
+                            [exact.mean(), exact.max()], rtol=1e-7)
+            and engine["stable_periods"] == int((exact < exact.mean()).sum())
+        )
+        identical = identical and matches
+        print(f"{name}: rolling_std_mean {engine['rolling_std_mean']:.6f} (pandas {pandas_std.mean():.6f}), "
+              f"rolling_std_max {engine['rolling_std_max']:.6f} (pandas {pandas_std.max():.6f}), "
+              f"stable_periods {engine['stable_periods']} (pandas {int((pandas_std < pandas_std.mean()).sum())}), "
+              f"一致: {matches}")
+
+    return {"identical": identical}
+
+def benchmark_trend_analysis(rows=20000, cols=1000):
+    """
+    趋势基准：逐列 scipy.stats.linregress 对比整矩阵批量闭式回归（一次 [1, x]ᵀ·Y 矩阵乘法）；
+    除端到端耗时外，另在同一个已数值化的矩阵上单独比较回归本身
+    """
+    df = make_benchmark_data(rows, cols)
+    analyzer = DataAnalyzer()
+    columns = [col for col in df.columns if col != "时间"]
+    x_all = np.arange(len(df))
+
+    def legacy():
+        results = {}
+        for col in columns:
+            values = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float)
+            valid = ~np.isnan(values)
+            results[col] = linregress(x_all[valid], values[valid])
+        return results
+
+    legacy_time, legacy_result = _timeit(legacy, repeat=1)
+    batched_time, batched_result = _timeit(lambda: analyzer.trend_analysis(df, columns), repeat=1)
+
+    identical = all(
+        np.allclose([legacy_result[col].slope, legacy_result[col].intercept, legacy_result[col].rvalue,
+                     legacy_result[col].pvalue, legacy_result[col].stderr],
+                    [batched_result[col][key] for key in ("slope", "intercept", "correlation", "p_value", "std_err")],
+                    rtol=1e-7)
+        for col in columns
+    )
+
+    matrix = np.column_stack([pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float) for col in columns])
+    matrix = np.asfortranarray(matrix)
+    valid = ~np.isnan(matrix)
+    kernel_legacy_time, _ = _timeit(
+        lambda: [linregress(x_all[valid[:, j]], matrix[valid[:, j], j]) for j in range(matrix.shape[1])], repeat=1)
+    kernel_batched_time, _ = _timeit(lambda: analyzer._matrix_trend(matrix), repeat=1)
+
+    print(f"=== trend_analysis ({rows} 行 × {cols} 列) ===")
+    print(f"逐列 linregress: {legacy_time:.3f}s")
+    print(f"批量回归: {batched_time:.3f}s")
+    print(f"加速比: {legacy_time / batched_time:.2f}x, 结果一致: {identical}")
+    print(f"仅回归（同一数值矩阵）: linregress {kernel_legacy_time:.3f}s, 矩阵乘法 {kernel_batched_time:.3f}s, "
+          f"加速比 {kernel_legacy_time / kernel_batched_time:.2f}x")
+
+    return {"legacy": legacy_time, "batched": batched_time, "identical": identical,
+            "kernel_legacy": kernel_legacy_time, "kernel_batched": kernel_batched_time}
+
+def benchmark_outlier_detection(rows=20000, cols=1000):
+    """
+    异常检测基准：逐列 pandas 分位数 + 布尔筛选（旧实现）对比整矩阵位图检测
+    """
+    df = make_benchmark_data(rows, cols)
+    analyzer = DataAnalyzer()
+    columns = [col for col in df.columns if col != "时间"]
+
+    def legacy():
+        results = {}
+        for col in columns:
+            series = pd.to_numeric(df[col], errors="coerce").dropna()
+            q1, q3 = series.quantile(0.25), series.quantile(0.75)
+            outlier_mask = (series < q1 - 1.5 * (q3 - q1)) | (series > q3 + 1.5 * (q3 - q1))
+            results[col] = series[outlier_mask].index.tolist()
+        return results
+
+    legacy_time, legacy_result = _timeit(legacy, repeat=1)
+    vector_time, outlier_index = _timeit(lambda: analyzer.detect_outliers(df, columns), repeat=1)
+
+    identical = all(outlier_index.indices(col).tolist() == legacy_result[col] for col in columns)
+
+    print(f"=== outlier_detection ({rows} 行 × {cols} 列) ===")
+    print(f"逐列检测: {legacy_time:.3f}s")
+    print(f"矩阵位图检测: {vector_time:.3f}s")
+    print(f"加速比: {legacy_time / vector_time:.2f}x, 结果一致: {identical}")
+
+    return {"legacy": legacy_time, "vectorized": vector_time, "identical": identical}
+
+def benchmark_parallel_analysis(rows=20000, cols=800, workers=4):
+    """
+    并行基准：单进程 comprehensive_analysis 对比按列划分到多个工作进程（共享内存矩阵）
+    """
+    df = make_benchmark_data(rows, cols)
+    analyzer = DataAnalyzer()
+
+    serial_time, serial_result = _timeit(lambda: analyzer.comprehensive_analysis(df, None, "时间"), repeat=1)
+    parallel_time, parallel_result = _timeit(
+        lambda: analyzer.comprehensive_analysis(df, None, "时间", workers=workers), repeat=1)
+
+    # 列划分不同时矩阵乘法的累加顺序不同，回归结果可能有末位舍入差异
+    identical = all(
+        np.allclose([value for value in serial_result[section][col].values() if isinstance(value, float)],
+                    [value for value in parallel_result[section][col].values() if isinstance(value, float)],
+                    rtol=1e-9, equal_nan=True)
+        for section in ("basic_statistics", "stability_analysis", "trend_analysis", "outlier_detection")
+        for col in serial_result[section]
+    )
+
+    print(f"=== 并行 comprehensive_analysis ({rows} 行 × {cols} 列, {workers} 进程) ===")
+    print(f"单进程: {serial_time:.3f}s")
+    print(f"多进程: {parallel_time:.3f}s")
+    print(f"加速比: {serial_time / parallel_time:.2f}x, 结果一致: {identical}")
+
+    return {"serial": serial_time, "parallel": parallel_time, "identical": identical}
+
+def benchmark_batch_comparison(rows=20000, cols=400):
+    """
+    批次对比基准：逐列数值化 + scipy ttest_ind（Welch）对比两批次各一遍统计的批量检验
+    """
+    df1 = make_benchmark_data(rows, cols, seed=1)
+    df2 = make_benchmark_data(rows, cols, seed=2)
+    analyzer = DataAnalyzer()
+    columns = [col for col in df1.columns if col != "时间"]
+
+    def legacy():
+        results = {}
+        for col in columns:
+            series1 = pd.to_numeric(df1[col], errors="coerce").dropna()
+            series2 = pd.to_numeric(df2[col], errors="coerce").dropna()
+            results[col] = ttest_ind(series1, series2, equal_var=False)
+        return results
+
+    legacy_time, legacy_result = _timeit(legacy, repeat=1)
+    batched_time, batched_result = _timeit(lambda: analyzer.batch_comparison(df1, df2, columns), repeat=1)
+
+    identical = all(
+        np.allclose([legacy_result[col].statistic, legacy_result[col].pvalue],
+                    [batched_result["comparison"][col]["t_statistic"], batched_result["comparison"][col]["t_p_value"]],
+                    rtol=1e-7)
+        for col in columns
+    )
+
+    print(f"=== batch_comparison ({rows} 行 × {cols} 列) ===")
+    print(f"逐列检验: {legacy_time:.3f}s")
+    print(f"批量检验: {batched_time:.3f}s")
+    print(f"加速比: {legacy_time / batched_time:.2f}x, 结果一致: {identical}")
+
+    return {"legacy": legacy_time, "batched": batched_time, "identical": identical}
+
+if __name__ == "__main__":
+    benchmark_comprehensive_analysis()
+    benchmark_basic_statistics()
+    benchmark_stability_analysis()
+    benchmark_rolling_precision()
+    benchmark_trend_analysis()
+    benchmark_outlier_detection()
+    benchmark_parallel_analysis()
+    benchmark_batch_comparison()
@@ -0,0 +1,361 @@
+# benchmark_baseline.py
+# 性能基准的对照实现：优化前（基线版本）综合分析各段的原始代码，冻结保存、不再修改，
+# 仅供 benchmark_analyzer 对比耗时并校验新实现与旧输出一致
+
+import pandas as pd
+import numpy as np
+from scipy import stats
+from scipy.stats import linregress
+import warnings
+warnings.filterwarnings('ignore')
+
+class BaselineAnalyzer:
+    """
+    基线版本的数据分析器（逐列 pandas 计算，各分析段与摘要各自重新数值化）
+    """
+    
+    def basic_statistics(self, data, columns=None):
+        """
+        基础统计分析
+        
+        参数:
+            data (DataFrame): 输入数据
+            columns (list): 要分析的列名，None则分析所有数值列
+            
+        返回:
+            dict: 统计结果
+        """
+        if columns is None:
+            # 自动选择数值列，排除无名列和完全缺失的列
+            numeric_cols = []
+            for col in data.columns:
+                # 跳过无名列
+                if col.startswith('Unnamed:'):
+                    continue
+                # 检查是否为数值列且有有效数据
+                try:
+                    series = pd.to_numeric(data[col], errors='coerce').dropna()
+                    if len(series) > 0:
+                        numeric_cols.append(col)
+                except:
+                    continue
+        else:
+            numeric_cols = columns
+        
+        results = {}
+        for col in numeric_cols:
+            if col in data.columns:
+                series = pd.to_numeric(data[col], errors='coerce').dropna()
+                if len(series) > 0:
+                    results[col] = {
+                        "count": len(series),
+                        "mean": float(series.mean()),
+                        "std": float(series.std()),
+                        "min": float(series.min()),
+                        "max": float(series.max()),
+                        "median": float(series.median()),
+                        "cv": float(series.std() / series.mean()) if series.mean() != 0 else 0,  # 变异系数
+                        "q25": float(series.quantile(0.25)),
+                        "q75": float(series.quantile(0.75))
+                    }
+        
+        return results
+    
+    def stability_analysis(self, data, columns=None, window_size=10):
+        """
+        稳定性分析
+        
+        参数:
+            data (DataFrame): 输入数据
+            columns (list): 要分析的列名
+            window_size (int): 滚动窗口大小
+            
+        返回:
+            dict: 稳定性指标
+        """
+        if columns is None:
+            # 自动选择数值列，排除无名列和完全缺失的列
+            numeric_cols = []
+            for col in data.columns:
+                if col.startswith('Unnamed:'):
+                    continue
+                try:
+                    series = pd.to_numeric(data[col], errors='coerce').dropna()
+                    if len(series) > 0:
+                        numeric_cols.append(col)
+                except:
+                    continue
+        else:
+            numeric_cols = columns
+        
+        results = {}
+        for col in numeric_cols:
+            if col in data.columns:
+                series = pd.to_numeric(data[col], errors='coerce').dropna()
+                if len(series) > window_size:
+                    # 滚动标准差
+                    rolling_std = series.rolling(window=window_size).std()
+                    
+                    # 稳定性指标
+                    stability_index = 1 / (1 + rolling_std.mean()) if rolling_std.mean() > 0 else 1
+                    
+                    # 变化率分析
+                    pct_change = series.pct_change().dropna()
+                    
+                    results[col] = {
+                        "stability_index": float(stability_index),
+                        "rolling_std_mean": float(rolling_std.mean()),
+                        "rolling_std_max": float(rolling_std.max()),
+                        "max_change_rate": float(abs(pct_change).max()) if len(pct_change) > 0 else 0,
+                        "avg_change_rate": float(abs(pct_change).mean()) if len(pct_change) > 0 else 0,
+                        "stable_periods": int(sum(rolling_std < rolling_std.mean())),  # 稳定周期数
+                        "stability_rating": self._get_stability_rating(stability_index)
+                    }
+        
+        return results
+    
+    def trend_analysis(self, data, columns=None, time_col=None):
+        """
+        趋势分析
+        
+        参数:
+            data (DataFrame): 输入数据
+            columns (list): 要分析的列名
+            time_col (str): 时间列名，如果为None则使用索引
+            
+        返回:
+            dict: 趋势分析结果
+        """
+        if columns is None:
+            # 自动选择数值列，排除无名列和完全缺失的列
+            numeric_cols = []
+            for col in data.columns:
+                if col.startswith('Unnamed:'):
+                    continue
+                try:
+                    series = pd.to_numeric(data[col], errors='coerce').dropna()
+                    if len(series) > 0:
+                        numeric_cols.append(col)
+                except:
+                    continue
+        else:
+            numeric_cols = columns
+        
+        results = {}
+        
+        # 准备时间序列
+        if time_col and time_col in data.columns:
+            try:
+                time_series = pd.to_datetime(data[time_col])
+                x_values = np.arange(len(time_series))
+            except:
+                x_values = np.arange(len(data))
+        else:
+            x_values = np.arange(len(data))
+        
+        for col in numeric_cols:
+            if col in data.columns and col != time_col:
+                series = pd.to_numeric(data[col], errors='coerce').dropna()
+                if len(series) > 2:
+                    # 对齐x和y的长度
+                    min_len = min(len(x_values), len(series))
+                    x = x_values[:min_len]
+                    y = series.iloc[:min_len]
+                    
+                    # 线性回归分析
+                    try:
+                        slope, intercept, r_value, p_value, std_err = linregress(x, y)
+                        
+                        # 趋势判断
+                        trend_direction = "上升" if slope > 0 else "下降" if slope < 0 else "平稳"
+                        trend_strength = "强" if abs(r_value) > 0.7 else "中等" if abs(r_value) > 0.3 else "弱"
+                        
+                        results[col] = {
+                            "slope": float(slope),
+                            "intercept": float(intercept),
+                            "r_squared": float(r_value ** 2),
+                            "correlation": float(r_value),
+                            "p_value": float(p_value),
+                            "trend_direction": trend_direction,
+                            "trend_strength": trend_strength,
+                            "is_significant": bool(p_value < 0.05),
+                            "relative_change": float((series.iloc[-1] - series.iloc[0]) / series.iloc[0] * 100) if series.iloc[0] != 0 else 0
+                        }
+                    except Exception as e:
+                        results[col] = {"error": f"趋势分析失败: {str(e)}"}
+        
+        return results
+    
+    def outlier_detection(self, data, columns=None, method='iqr', threshold=1.5):
+        """
+        异常值检测
+        
+        参数:
+            data (DataFrame): 输入数据
+            columns (list): 要分析的列名
+            method (str): 检测方法 'iqr' 或 'zscore'
+            threshold (float): 阈值
+            
+        返回:
+            dict: 异常检测结果
+        """
+        if columns is None:
+            # 自动选择数值列，排除无名列和完全缺失的列
+            numeric_cols = []
+            for col in data.columns:
+                if col.startswith('Unnamed:'):
+                    continue
+                try:
+                    series = pd.to_numeric(data[col], errors='coerce').dropna()
+                    if len(series) > 0:
+                        numeric_cols.append(col)
+                except:
+                    continue
+        else:
+            numeric_cols = columns
+        
+        results = {}
+        
+        for col in numeric_cols:
+            if col in data.columns:
+                series = pd.to_numeric(data[col], errors='coerce').dropna()
+                if len(series) > 0:
+                    outliers = []
+                    outlier_indices = []
+                    
+                    if method == 'iqr':
+                        Q1 = series.quantile(0.25)
+                        Q3 = series.quantile(0.75)
+                        IQR = Q3 - Q1
+                        lower_bound = Q1 - threshold * IQR
+                        upper_bound = Q3 + threshold * IQR
+                        
+                        outlier_mask = (series < lower_bound) | (series > upper_bound)
+                        outliers = series[outlier_mask].tolist()
+                        outlier_indices = series[outlier_mask].index.tolist()
+                        
+                    elif method == 'zscore':
+                        z_scores = np.abs(stats.zscore(series))
+                        outlier_mask = z_scores > threshold
+                        outliers = series[outlier_mask].tolist()
+                        outlier_indices = series[outlier_mask].index.tolist()
+                    
+                    results[col] = {
+                        "outlier_count": len(outliers),
+                        "outlier_percentage": float(len(outliers) / len(series) * 100),
+                        "outlier_values": [float(x) for x in outliers[:10]],  # 最多显示10个
+                        "outlier_indices": [int(x) for x in outlier_indices[:10]],
+                        "method": method,
+                        "threshold": threshold
+                    }
+        
+        return results
+    
+    def comprehensive_analysis(self, data, columns=None, time_col=None):
+        """
+        综合分析：整合所有分析功能
+        
+        参数:
+            data (DataFrame): 输入数据
+            columns (list): 要分析的列名
+            time_col (str): 时间列名
+            
+        返回:
+            dict: 综合分析结果
+        """
+        results = {
+            "basic_statistics": self.basic_statistics(data, columns),
+            "stability_analysis": self.stability_analysis(data, columns),
+            "trend_analysis": self.trend_analysis(data, columns, time_col),
+            "outlier_detection": self.outlier_detection(data, columns),
+            "data_quality": self._assess_data_quality(data, columns),
+            "summary": self._generate_summary(data, columns)
+        }
+        
+        return results
+    
+    def _get_stability_rating(self, stability_index):
+        """获取稳定性评级"""
+        if stability_index >= 0.9:
+            return "极稳定"
+        elif stability_index >= 0.7:
+            return "稳定"
+        elif stability_index >= 0.5:
+            return "一般"
+        else:
+            return "不稳定"
+    
+    def _assess_data_quality(self, data, columns):
+        """评估数据质量"""
+        if columns is None:
+            # 使用相同的逻辑选择有效的数值列
+            columns = []
+            for col in data.columns:
+                if col.startswith('Unnamed:'):
+                    continue
+                try:
+                    series = pd.to_numeric(data[col], errors='coerce').dropna()
+                    if len(series) > 0:
+                        columns.append(col)
+                except:
+                    continue
+        
+        total_points = len(data)
+        missing_counts = {}
+        completeness_rates = {}
+        
+        for col in columns:
+            if col in data.columns and not col.startswith('Unnamed:'):
+                missing = data[col].isna().sum()
+                missing_counts[col] = int(missing)
+                completeness_rates[col] = float((total_points - missing) / total_points * 100)
+        
+        avg_completeness = np.mean(list(completeness_rates.values())) if completeness_rates else 0
+        
+        return {
+            "total_records": total_points,
+            "missing_counts": missing_counts,
+            "completeness_rates": completeness_rates,
+            "average_completeness": float(avg_completeness),
+            "quality_rating": "优秀" if avg_completeness >= 95 else "良好" if avg_completeness >= 85 else "一般" if avg_completeness >= 70 else "较差"
+        }
+    
+    def _generate_summary(self, data, columns):
+        """生成分析摘要"""
+        if columns is None:
+            columns = data.select_dtypes(include=[np.number]).columns.tolist()
+        
+        stats = self.basic_statistics(data, columns)
+        stability = self.stability_analysis(data, columns)
+        trends = self.trend_analysis(data, columns)
+        
+        summary = {
+            "analyzed_columns": len(columns),
+            "total_records": len(data),
+            "key_findings": []
+        }
+        
+        # 分析关键发现
+        for col in columns[:5]:  # 只分析前5个关键指标
+            if col in stats and col in stability and col in trends:
+                findings = []
+                
+                # 稳定性发现
+                if stability[col]["stability_rating"] in ["极稳定", "稳定"]:
+                    findings.append(f"{col}表现稳定")
+                elif stability[col]["stability_rating"] == "不稳定":
+                    findings.append(f"{col}存在波动")
+                
+                # 趋势发现
+                if trends[col].get("is_significant", False):
+                    direction = trends[col]["trend_direction"]
+                    strength = trends[col]["trend_strength"]
+                    findings.append(f"{col}呈{strength}{direction}趋势")
+                
+                if findings:
+                    summary["key_findings"].append({
+                        "column": col,
+                        "findings": findings
+                    })
+        
+        return summary
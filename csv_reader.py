@@ -2,7 +2,11 @@
 # 智能数据分析助手 MCP 子模块：CSV 文件读取与清洗工具
 
 import pandas as pd
+import numpy as np
 import os
+import io
+import codecs
+from shared_data import data_plane
 
 def read_csv_clean(path, nrows=None, ncols=None, remove_header_repeats=True):
     """
@@ -61,6 +65,231 @@ def read_csv_clean(path, nrows=None, ncols=None, remove_header_repeats=True):
 
     return df, metadata
 
+def read_csv_shared(path, nrows=None, ncols=None, remove_header_repeats=True):
+    """
+    读取 CSV 并把数值列发布到共享内存数据平面；文件未修改时直接复用已发布的数据，不重复读取
+
+    参数同 read_csv_clean
+
+    返回:
+        df (DataFrame): 清洗后的数据（分析时自动使用共享矩阵）
+        metadata (dict): 文件元数据
+        key (tuple): 数据平面中的键，用完后调用 data_plane.release(key)
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"❌ 文件未找到: {path}")
+
+    key = (os.path.abspath(path), os.path.getmtime(path), nrows, ncols, remove_header_repeats)
+    if data_plane.acquire(key) is not None:
+        df, metadata, _ = data_plane.get(key)
+        return df, metadata, key
+
+    df, metadata = read_csv_clean(path, nrows, ncols, remove_header_repeats)
+    data_plane.publish(key, df, metadata)
+    return df, metadata, key
+
+def detect_encoding(path, block_size=1 << 20):
+    """
+    以固定大小的块流式解码整个文件，返回第一个能完整解码的编码（与 read_csv_clean 的候选顺序一致）
+    """
+    encodings = ['utf-8-sig', 'gbk', 'utf-16', 'latin1']
+    for enc in encodings:
+        decoder = codecs.getincrementaldecoder(enc)()
+        try:
+            with open(path, 'rb') as f:
+                while True:
+                    block = f.read(block_size)
+                    decoder.decode(block, final=not block)
+                    if not block:
+                        break
+            return enc
+        except (UnicodeDecodeError, UnicodeError):
+            continue
+    raise ValueError(f"❌ 无法识别编码: {path}")
+
+def read_csv_chunks(path, chunksize=100000, nrows=None, ncols=None, remove_header_repeats=True):
+    """
+    分块读取 CSV 文件，清洗规则与 read_csv_clean 相同，内存占用只与 chunksize 有关
+
+    参数:
+        path (str): 文件路径
+        chunksize (int): 每块行数
+        nrows (int): 可选，最多读取的行数（清洗后计）
+        ncols (int): 可选，仅保留前 M 列
+        remove_header_repeats (bool): 是否删除与首行重复的表头行
+
+    返回:
+        generator: 逐块产出清洗后的 DataFrame（行索引与整表读取时一致）
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"❌ 文件未找到: {path}")
+
+    encoding = detect_encoding(path)
+    column_mapping = {
+        'ʱ��': '时间',
+        'Ч��': '效率'
+    }
+
+    reader = pd.read_csv(path, encoding=encoding, engine='python', on_bad_lines='skip',
+                         chunksize=chunksize, dtype=str)
+    first_row = None
+    emitted = 0
+    for chunk in reader:
+        # 以原始文本比较重复表头行，避免各块类型推断不同造成误判
+        if remove_header_repeats and not chunk.empty:
+            if first_row is None:
+                first_row = chunk.iloc[0].to_numpy()
+            values = chunk.to_numpy()
+            same = (values == first_row) | (pd.isna(values) & pd.isna(first_row))
+            chunk = chunk[~same.all(axis=1)]
+
+        chunk.columns = [column_mapping.get(col, col) for col in chunk.columns]
+        if ncols:
+            chunk = chunk.iloc[:, :ncols]
+        if nrows is not None:
+            chunk = chunk.head(nrows - emitted)
+
+        chunk = _restore_numeric(chunk)
+        emitted += len(chunk)
+        yield chunk
+        if nrows is not None and emitted >= nrows:
+            break
+
+def _restore_numeric(df):
+    """按文本读取的数据中，能完整解析为数值的列还原为数值类型"""
+    df = df.copy()
+    for j in range(df.shape[1]):
+        original = df.iloc[:, j]
+        converted = pd.to_numeric(original, errors='coerce')
+        if converted.isna().sum() == original.isna().sum():
+            df.isetitem(j, converted)
+    return df
+
+def _detect_head_encoding(head):
+    """只按文件开头的字节判断编码（末尾可能截断在多字节字符中间，不要求完整解码），utf-16 返回 None"""
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return None
+    for enc in ['utf-8-sig', 'gbk', 'latin1']:
+        try:
+            codecs.getincrementaldecoder(enc)().decode(head, final=False)
+            return enc
+        except (UnicodeDecodeError, UnicodeError):
+            continue
+    return None
+
+def read_csv_sample(path, sample_size=20000, method='stratified', seed=0, ncols=None,
+                    remove_header_repeats=True, chunksize=100000):
+    """
+    抽样读取 CSV，用于超大文件的快速近似分析，清洗规则与 read_csv_chunks 相同
+
+    method:
+        'stratified' 按字节位置分层：数据区等分为 sample_size 层，每层随机定位一个字节后读取其后的下一整行，
+                     只读取 O(样本量) 行、与文件大小无关（数秒内完成）；记录按时间顺序写入时即为按时间分层，
+                     总行数按样本平均行长估计
+        'reservoir'  流式蓄水池抽样：分块读完整个文件，每行赋一个随机键，保留键最小的 sample_size 行
+                     （等价于等概率无放回抽样），总行数精确，但耗时与完整读取相同
+
+    参数:
+        path (str): 文件路径
+        sample_size (int): 样本行数上限
+        method (str): 'stratified' 或 'reservoir'
+        seed (int): 随机种子（结果可复现）
+        ncols (int): 可选，仅保留前 M 列
+        remove_header_repeats (bool): 是否删除与首行重复的表头行
+        chunksize (int): reservoir 模式每块行数
+
+    返回:
+        df (DataFrame): 样本（按在文件中的先后排序），索引为各行在原文件中的数据行号（stratified 为按平均行长的估计值）
+        metadata (dict): 编码、样本行数、总行数（或估计值）、抽样比例、抽样方法等
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"❌ 文件未找到: {path}")
+    if method not in ('stratified', 'reservoir'):
+        raise ValueError(f"❌ 未知抽样方法: {method}")
+    rng = np.random.default_rng(seed)
+    file_size = os.path.getsize(path)
+
+    with open(path, 'rb') as f:
+        encoding = _detect_head_encoding(f.read(1 << 20))
+    # utf-16 的换行占两个字节，无法按字节定位行首，改为流式抽样
+    if method == 'stratified' and encoding is None:
+        method = 'reservoir'
+
+    if method == 'reservoir':
+        reservoir, keys, total_rows = None, np.empty(0), 0
+        for chunk in read_csv_chunks(path, chunksize, ncols=ncols, remove_header_repeats=remove_header_repeats):
+            total_rows += len(chunk)
+            chunk_keys = rng.random(len(chunk))
+            candidates = chunk if reservoir is None else pd.concat([reservoir, chunk])
+            keys = np.concatenate([keys, chunk_keys])
+            if len(keys) > sample_size:
+                keep = np.argpartition(keys, sample_size - 1)[:sample_size]
+                candidates, keys = candidates.iloc[keep], keys[keep]
+            reservoir = candidates
+        df = reservoir.sort_index() if reservoir is not None else pd.DataFrame()
+        estimated = False
+        encoding = encoding or detect_encoding(path)
+    else:
+        with open(path, 'rb') as f:
+            header = f.readline()
+            first_line = f.readline()
+            data_start = len(header)
+            span = file_size - data_start
+            layers = max(min(int(sample_size), span), 1)
+            offsets = data_start + ((np.arange(layers) + rng.random(layers)) * span / layers).astype(np.int64)
+            lines, starts = [], []
+            for offset in offsets:
+                # 随机位置落在某行中间：丢弃该行剩余部分，取下一整行
+                f.seek(max(offset - 1, 0))
+                f.readline()
+                start = f.tell()
+                line = f.readline()
+                if line.strip() and (not starts or start != starts[-1]):
+                    starts.append(start)
+                    lines.append(line if line.endswith(b'\n') else line + b'\n')
+        mean_length = np.mean([len(line) for line in lines]) if lines else 1.0
+        total_rows = int(round(span / mean_length))
+        # 每行前加上按平均行长估计的原文件行号作为索引列（解析时跳过的坏行不会打乱对应关系）
+        positions = np.rint((np.array(starts, dtype=float) - data_start) / mean_length).astype(np.int64)
+        fields = header[len(codecs.BOM_UTF8):] if header.startswith(codecs.BOM_UTF8) else header
+        text = (b'_row,' + fields + b''.join(b'%d,' % position + line for position, line in zip(positions, lines)))
+        df = pd.read_csv(io.StringIO(text.decode(encoding, errors='replace')), engine='python',
+                         on_bad_lines='skip', dtype=str, index_col=0)
+        df.index = df.index.astype(np.int64).rename(None)
+        # 与 read_csv_chunks 一致：删除与文件第一条数据行相同的重复表头行
+        if remove_header_repeats and first_line.strip():
+            reference = pd.read_csv(io.StringIO((header + first_line).decode(encoding, errors='replace')),
+                                    engine='python', dtype=str)
+            if len(reference) and list(reference.columns) == list(df.columns):
+                values = df.to_numpy()
+                first_row = reference.iloc[0].to_numpy()
+                same = (values == first_row) | (pd.isna(values) & pd.isna(first_row))
+                df = df[~same.all(axis=1)]
+        estimated = True
+
+    column_mapping = {
+        'ʱ��': '时间',
+        'Ч��': '效率'
+    }
+    df.columns = [column_mapping.get(col, col) for col in df.columns]
+    if ncols:
+        df = df.iloc[:, :ncols]
+    # reservoir 样本来自不同块，同一列可能混有数值与文本，统一再还原一次
+    df = _restore_numeric(df)
+
+    metadata = {
+        "encoding": encoding,
+        "rows": len(df),
+        "columns": df.shape[1],
+        "sample_method": method,
+        "total_rows": total_rows,
+        "total_rows_estimated": estimated,
+        "sampling_fraction": len(df) / total_rows if total_rows else 1.0,
+        "file_size": file_size,
+        "filename": os.path.basename(path)
+    }
+    return df, metadata
+
 def read_csv_preview(path, num_rows=30):
     """
     简化接口：读取 CSV 文件前 num_rows 行，返回字段列表和部分数据
@@ -0,0 +1,99 @@
+# curve_alignment.py
+# 批次曲线对齐：两条（多通道）曲线先按相同行数分箱求均值降到网格上，再做带约束的动态时间规整（DTW）
+# 每一行的 DTW 递推用前缀最小值一次向量化求出，只计算 Sakoe-Chiba 带内的格点，10万点曲线也在秒级以内
+
+import numpy as np
+
+def bin_means(matrix, size):
+    """
+    每 size 行求一次均值（末尾不足 size 行的部分单独成箱），缺失值不参与；整箱缺失时取相邻箱线性插值
+
+    参数:
+        matrix (ndarray): (行数 × 通道数) 数值矩阵
+        size (int): 每箱行数
+
+    返回:
+        ndarray: (箱数 × 通道数) 均值矩阵
+    """
+    starts = np.arange(0, len(matrix), max(int(size), 1))
+    valid = ~np.isnan(matrix)
+    counts = np.add.reduceat(valid.astype(np.int64), starts, axis=0)
+    sums = np.add.reduceat(np.where(valid, matrix, 0.0), starts, axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts
+    positions = np.arange(len(means))
+    for j in range(means.shape[1]):
+        ok = counts[:, j] > 0
+        if ok.any() and not ok.all():
+            means[:, j] = np.interp(positions, positions[ok], means[ok, j])
+    return means
+
+def band_limits(n, m, radius):
+    """
+    Sakoe-Chiba 带：第 i 行允许的列区间 [lo, hi]，以连接 (0, 0) 与 (n-1, m-1) 的斜对角线为中心、半宽 radius
+
+    相邻行的区间相互重叠且单调不减，保证带内总存在一条连续路径
+    """
+    center = np.arange(n) * ((m - 1) / (n - 1) if n > 1 else 0.0)
+    # 斜率大于1时相邻行的中心相差超过1列，半宽至少取斜率才能连通
+    radius = max(int(radius), int(np.ceil((m - 1) / max(n - 1, 1))), 1)
+    lo = np.clip(np.floor(center - radius), 0, m - 1).astype(np.intp)
+    hi = np.clip(np.ceil(center + radius), 0, m - 1).astype(np.intp)
+    lo[0], hi[-1] = 0, m - 1
+    return lo, hi
+
+def dtw_path(a, b, radius):
+    """
+    带约束的 DTW：代价为各通道差值平方和，返回最优规整路径
+
+    第 i 行的递推 D[i, j] = c[i, j] + min(D[i-1, j-1], D[i-1, j], D[i, j-1]) 中行内依赖 D[i, j-1]
+    改写为前缀形式 D[i, j] = C[j] + min_{k≤j}(A[k] - C[k-1])（C 为行内代价累加和，A[k] 为上一行的两个前驱中较小者），
+    每行只需一次 cumsum 和一次 minimum.accumulate；带内矩阵按行保存用于回溯
+
+    参数:
+        a (ndarray): (n × 通道数) 第一条曲线
+        b (ndarray): (m × 通道数) 第二条曲线
+        radius (int): Sakoe-Chiba 带半宽（格点数）
+
+    返回:
+        tuple: (路径 (长度 × 2) 数组 [[i, j], ...] 从起点到终点, 路径上的累计代价)
+    """
+    n, m = len(a), len(b)
+    lo, hi = band_limits(n, m, radius)
+    width = int((hi - lo).max()) + 1
+    cost = np.full((n, width), np.inf)
+    # previous[j + 1] 为上一行第 j 列的累计代价，previous[0] 为虚拟起点 D[-1, -1]
+    previous = np.full(m + 1, np.inf)
+    previous[0] = 0.0
+    for i in range(n):
+        l, h = lo[i], hi[i] + 1
+        step = ((b[l:h] - a[i]) ** 2).sum(axis=1)
+        best_prior = np.minimum(previous[l:h], previous[l + 1:h + 1])
+        cumulative = np.cumsum(step)
+        row = cumulative + np.minimum.accumulate(best_prior - (cumulative - step))
+        cost[i, :h - l] = row
+        if i > 0:
+            previous[lo[i - 1] + 1:hi[i - 1] + 2] = np.inf
+        else:
+            previous[0] = np.inf
+        previous[l + 1:h + 1] = row
+
+    def at(i, j):
+        if i < 0 or j < lo[i] or j > hi[i]:
+            return np.inf
+        return cost[i, j - lo[i]]
+
+    # 回溯：每步在三个前驱中取累计代价最小者
+    path = [(n - 1, m - 1)]
+    i, j = n - 1, m - 1
+    while i > 0 or j > 0:
+        if i == 0:
+            j -= 1
+        elif j == 0:
+            i -= 1
+        else:
+            candidates = (at(i - 1, j - 1), at(i - 1, j), at(i, j - 1))
+            move = int(np.argmin(candidates))
+            i, j = (i - 1, j - 1) if move == 0 else ((i - 1, j) if move == 1 else (i, j - 1))
+        path.append((i, j))
+    return np.array(path[::-1], dtype=np.intp), float(cost[n - 1, m - 1 - lo[n - 1]])
@@ -4,340 +4,2622 @@
 
 import pandas as pd
 import numpy as np
-from scipy import stats
-from scipy.stats import linregress
+import heapq
+import weakref
+from scipy import stats, linalg, fft
+from scipy.signal import lfilter
+from streaming_stats import StatsAccumulator, TrendAccumulator, SpectrumAccumulator
+from quantile_sketch import ColumnSketches
+from parallel_analysis import run_column_parallel, run_shared_parallel
+from shared_data import SharedFrame, data_plane
+from curve_alignment import bin_means, dtw_path
+from time_utils import parse_time, elapsed_seconds, interval_seconds, format_times
 import warnings
 warnings.filterwarnings('ignore')
 
+class AnalysisContext:
+    """
+    分析上下文：对同一份数据只做一次数值化处理
+
+    构建时确定待分析的数值列，并缓存每列的数值序列；综合分析时待分析列只堆叠一次为数值矩阵，
+    各分析段按列位置从中切取子矩阵。各分析段的逐列结果也缓存在上下文中，同一列同一参数只计算一次。
+    workers 大于1时，矩阵分析按列划分到多个工作进程并行执行。
+    数据已发布到共享内存数据平面时，数值列直接取自共享矩阵，并行时工作进程挂载同一内存段；
+    否则待分析列的矩阵在首次并行时写入共享内存一次，各分析段复用同一内存段。
+    """
+    
+    def __init__(self, data, columns=None, workers=1):
+        self.data = data
+        self.workers = max(1, int(workers or 1))
+        self.shared = data_plane.frame_for(data)
+        self._numeric = {}
+        self._valid = {}
+        self._sections = {}
+        self._times = {}
+        self._matrix = None
+        self._matrix_pos = {}
+        self._published = None
+        # 已是数值类型的列无需 to_numeric，可整块取出
+        numeric_block = data.select_dtypes(include='number') if data.columns.is_unique else data.iloc[:, :0]
+        self._numeric_dtype = set(numeric_block.columns)
+        
+        if columns is None:
+            # 自动选择数值列，排除无名列和完全缺失的列
+            self.columns = []
+            has_values = numeric_block.notna().any()
+            for col in data.columns:
+                # 跳过无名列
+                if str(col).startswith('Unnamed:'):
+                    continue
+                if col in self._numeric_dtype:
+                    if has_values[col]:
+                        self.columns.append(col)
+                    continue
+                # 检查是否为数值列且有有效数据
+                try:
+                    if len(self.series(col)) > 0:
+                        self.columns.append(col)
+                except:
+                    continue
+        else:
+            self.columns = columns
+    
+    def numeric(self, col):
+        """返回数值化后的整列（保留NaN与原索引）"""
+        if col not in self._numeric:
+            if self.shared is not None and self.shared.has_columns([col]):
+                self._numeric[col] = pd.Series(self.shared.column(col), index=self.data.index, name=col, copy=False)
+            else:
+                self._numeric[col] = pd.to_numeric(self.data[col], errors='coerce')
+        return self._numeric[col]
+    
+    def series(self, col):
+        """返回数值化并去除NaN后的序列"""
+        if col not in self._valid:
+            self._valid[col] = self.numeric(col).dropna()
+        return self._valid[col]
+    
+    def time(self, col):
+        """解析时间列（格式推断一次并缓存），返回 parse_time 的 (类型, 数组)；列不存在或无法解析为 (None, None)"""
+        if col not in self._times:
+            self._times[col] = parse_time(self.data[col]) if col in self.data.columns else (None, None)
+        return self._times[col]
+    
+    def elapsed(self, col):
+        """时间列相对首个有效时间经过的秒数，无法解析时返回None"""
+        kind, values = self.time(col)
+        return None if kind is None else elapsed_seconds(kind, values)
+    
+    def section(self, name, col, func, *args):
+        """按 (分析段, 列, 参数) 缓存逐列分析结果"""
+        key = (name, col) + args
+        if key not in self._sections:
+            self._sections[key] = func(self.series(col), *args)
+        return self._sections[key]
+    
+    def result(self, name, col, *args):
+        """读取已缓存的逐列结果，未计算过返回None"""
+        return self._sections.get((name, col) + args)
+    
+    def pending(self, name, columns, *args):
+        """返回某分析段中尚未计算过的列"""
+        return [col for col in columns if (name, col) + args not in self._sections]
+    
+    def store(self, name, col, result, *args):
+        """写入批量计算得到的逐列结果"""
+        self._sections[(name, col) + args] = result
+    
+    def stack(self, columns):
+        """把指定列堆叠为列优先存储的二维数值矩阵 (行数 × 列数)，缺失值为NaN"""
+        if self._matrix is not None and all(col in self._matrix_pos for col in columns):
+            # 已堆叠过全部待分析列时按列位置切取，不再重复数值化
+            return np.asfortranarray(self._matrix[:, [self._matrix_pos[col] for col in columns]])
+        if columns and self.shared is None and all(col in self._numeric_dtype for col in columns):
+            return np.asfortranarray(self.data[list(columns)].to_numpy(dtype=float, na_value=np.nan))
+        # 数值类型的列整块转换，其余列（字符串存储的数值等）逐列数值化
+        bulk = [j for j, col in enumerate(columns) if col in self._numeric_dtype] if self.shared is None else []
+        matrix = np.empty((len(self.data), len(columns)), order='F')
+        if bulk:
+            matrix[:, bulk] = self.data[[columns[j] for j in bulk]].to_numpy(dtype=float, na_value=np.nan)
+        bulk = set(bulk)
+        for j, col in enumerate(columns):
+            if j not in bulk:
+                matrix[:, j] = self.numeric(col).to_numpy(dtype=float, na_value=np.nan)
+        return matrix
+    
+    @property
+    def matrix(self):
+        """待分析列组成的二维数值矩阵 (行数 × 列数)，缺失值为NaN"""
+        if self._matrix is None:
+            self.matrix_columns = [col for col in self.columns if col in self.data.columns]
+            self._matrix = self.stack(self.matrix_columns)
+            self._matrix_pos = {col: j for j, col in enumerate(self.matrix_columns)}
+        return self._matrix
+    
+    def published(self, columns):
+        """
+        返回包含指定列的共享内存矩阵：优先使用数据平面已发布的矩阵，
+        否则把待分析列的矩阵发布一次（上下文回收时释放）；指定列不在待分析列中返回None
+        """
+        if self.shared is not None and self.shared.has_columns(columns):
+            return self.shared
+        if self._published is None:
+            if not set(columns) <= set(self.columns):
+                return None
+            self._published = SharedFrame.create(self.matrix, self.matrix_columns)
+            weakref.finalize(self, self._published.close)
+            # 之后的切片直接取自共享矩阵，不再保留一份私有副本
+            self._matrix = self._published.matrix
+        return self._published if self._published.has_columns(columns) else None
+
+def _nan_quantiles(matrix, quantiles):
+    """
+    按列计算忽略NaN的分位数（线性插值，与 pandas/numpy 默认方法一致）
+
+    所有分位数共用一次按列排序，返回形状为 (分位数个数 × 列数) 的数组，
+    无有效值的列为NaN。
+    """
+    matrix = np.asarray(matrix, dtype=float)
+    if matrix.ndim == 1:
+        matrix = matrix[:, None]
+    quantiles = np.atleast_1d(np.asarray(quantiles, dtype=float))
+    ordered = np.sort(matrix, axis=0)  # NaN 排在每列末尾
+    counts = (~np.isnan(matrix)).sum(axis=0)
+    
+    position = quantiles[:, None] * np.maximum(counts - 1, 0)[None, :]
+    lower = np.floor(position).astype(np.intp)
+    upper = np.minimum(lower + 1, np.maximum(counts - 1, 0)[None, :])
+    frac = position - lower
+    col_index = np.arange(matrix.shape[1])[None, :]
+    a = ordered[lower, col_index]
+    b = ordered[upper, col_index]
+    
+    # 与 numpy 的 _lerp 相同的插值写法，保证结果逐位一致
+    diff = b - a
+    result = np.where(frac >= 0.5, b - diff * (1 - frac), a + diff * frac)
+    result[:, counts == 0] = np.nan
+    return result
+
+def _compress_valid(matrix):
+    """
+    把每列的有效值按原顺序移到顶部（等价于逐列 dropna），底部以NaN补齐
+
+    返回:
+        tuple: (压缩后的矩阵, 每列有效值个数)
+    """
+    valid = ~np.isnan(matrix)
+    counts = valid.sum(axis=0)
+    if valid.all():
+        return matrix, counts
+    # 布尔键的稳定排序为线性时间的基数排序
+    order = np.argsort(~valid, axis=0, kind='stable')
+    return np.take_along_axis(matrix, order, axis=0), counts
+
+def _rolling_variance(filled, counts, window):
+    """
+    所有列、所有长度为 window 的窗口的样本方差（按窗口起点排列）
+
+    窗口起点按 block 个一组分块，每块连同其后 window-1 行单独做累积和（一阶、二阶），
+    并先减去该块有效值的均值：累积和的量级只与块长和块内波动有关，
+    不随序列长度和全局动态范围（漂移、阶跃）增长，窗口方差由块内累积和差分得到
+
+    参数:
+        filled (ndarray): (列数 × 行数) 数组，每列有效值已压缩到前 counts 个位置，其后补0
+        counts (ndarray): 每列有效值个数
+        window (int): 窗口大小（2 ≤ window ≤ 行数）
+
+    返回:
+        ndarray: (列数 × (行数 - window + 1)) 方差，未截断负值；含无效位置的窗口结果无意义，由调用方剔除
+    """
+    cols, rows = filled.shape
+    starts = rows - window + 1
+    block = max(2 * window, 512)
+    blocks = -(-starts // block)
+    span = block + window - 1
+    padded = np.zeros((cols, blocks * block + window - 1))
+    padded[:, :rows] = filled
+    # 相邻块相互重叠 window-1 行的只读视图 (列数 × 块数 × span)，不复制数据
+    step = padded.strides[1]
+    view = np.lib.stride_tricks.as_strided(padded, shape=(cols, blocks, span),
+                                           strides=(padded.strides[0], block * step, step), writeable=False)
+    # 块均值只按有效值计算（补0的位置不计入个数）；块内前缀差分只涉及窗口内的元素，无效位置不影响有效窗口
+    size = np.clip(counts[:, None] - np.arange(blocks) * block, 1, span)
+    segment = view - (view.sum(axis=2) / size)[:, :, None]
+    
+    s1 = np.zeros(segment.shape[:2] + (segment.shape[2] + 1,))
+    s2 = np.zeros_like(s1)
+    np.cumsum(segment, axis=2, out=s1[:, :, 1:])
+    np.multiply(segment, segment, out=segment)
+    np.cumsum(segment, axis=2, out=s2[:, :, 1:])
+    total = s1[:, :, window:window + block] - s1[:, :, :block]
+    total_sq = s2[:, :, window:window + block] - s2[:, :, :block]
+    total *= total
+    total /= window
+    var = np.subtract(total_sq, total, out=total_sq)
+    var /= window - 1
+    return var.reshape(cols, blocks * block)[:, :starts]
+
+def _rolling_stability(matrix, window_sizes):
+    """
+    滚动稳定性引擎：对所有列、所有窗口一次性计算滚动标准差及其派生指标
+
+    窗口方差由分块、块内去均值的累积和（一阶、二阶）差分得到（见 _rolling_variance），
+    复杂度 O(行数 × 列数)，与窗口大小无关；窗口内数值完全相同时方差按0处理
+    （与 pandas 滚动方差一致），并截断浮点误差导致的负方差。
+
+    参数:
+        matrix (ndarray): (行数 × 列数) 浮点矩阵，缺失值为NaN
+        window_sizes (list): 窗口大小列表
+
+    返回:
+        tuple: ({窗口: {指标: 按列数组}}, 变化率指标 {指标: 按列数组}, 每列有效值个数)
+    """
+    values, counts = _compress_valid(np.asarray(matrix, dtype=float))
+    # 转置为 (列数 × 行数) 的行优先数组，使沿时间方向的累积和在内存中连续
+    values = np.ascontiguousarray(values.T)
+    cols, rows = values.shape
+    position = np.arange(rows)[None, :]
+    inside = position < counts[:, None]
+    filled = np.where(inside, values, 0.0)
+    
+    # 相邻值变化次数的累积和，用于识别窗口内数值完全相同的情况
+    # （有效范围之外是NaN，总被计为变化，但这些窗口本身会被剔除）
+    s_changed = np.zeros((cols, rows + 1), dtype=np.int64)
+    if rows > 1:
+        np.cumsum(values[:, 1:] != values[:, :-1], axis=1, out=s_changed[:, 2:])
+    
+    windows = {}
+    for window in window_sizes:
+        if window < 2 or window > rows:
+            windows[window] = None
+            continue
+        var = _rolling_variance(filled, counts, window)
+        np.maximum(var, 0.0, out=var)
+        # 窗口 [i-w+1, i] 内部没有发生变化则方差严格为0
+        var[s_changed[:, window:] == s_changed[:, 1:rows - window + 2]] = 0.0
+        rolling_std = np.sqrt(var, out=var)
+        rolling_std[position[:, window - 1:] >= counts[:, None]] = np.nan
+        with np.errstate(invalid='ignore'):
+            std_mean = np.nanmean(rolling_std, axis=1)
+            std_max = np.nanmax(rolling_std, axis=1)
+        windows[window] = {
+            "rolling_std_mean": std_mean,
+            "rolling_std_max": std_max,
+            "stable_periods": (rolling_std < std_mean[:, None]).sum(axis=1)
+        }
+    
+    # 相邻变化率（与 pandas pct_change 一致，0/0 的结果视为缺失）
+    if rows > 1:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            change = np.abs(values[:, 1:] / values[:, :-1] - 1)
+        usable = inside[:, 1:] & ~np.isnan(change)
+        change_count = usable.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            max_change = np.where(change_count > 0, np.where(usable, change, -np.inf).max(axis=1), 0)
+            avg_change = np.where(change_count > 0, np.where(usable, change, 0.0).sum(axis=1) / np.maximum(change_count, 1), 0)
+    else:
+        max_change = avg_change = np.zeros(cols)
+    changes = {"max_change_rate": max_change, "avg_change_rate": avg_change}
+    
+    return windows, changes, counts
+
+def _hampel_mask(values, half_window, threshold, block=1 << 18):
+    """
+    Hampel 滤波：以 2*half_window+1 点居中窗口的中位数与 MAD 判定异常（两端按边缘值延拓）
+
+    参数:
+        values (ndarray): 一维有效值序列（不含NaN）
+
+    返回:
+        tuple: (异常掩码, 每点相对局部中位数的偏差)
+    """
+    n = len(values)
+    window = 2 * half_window + 1
+    padded = np.pad(values, half_window, mode='edge')
+    mask = np.zeros(n, dtype=bool)
+    deviation = np.zeros(n)
+    # 分块展开滑动窗口，控制内存占用
+    for start in range(0, n, block):
+        stop = min(start + block, n)
+        windows = np.lib.stride_tricks.sliding_window_view(padded[start:stop + 2 * half_window], window)
+        local_median = np.median(windows, axis=1)
+        local_mad = 1.4826 * np.median(np.abs(windows - local_median[:, None]), axis=1)
+        dev = np.abs(values[start:stop] - local_median)
+        deviation[start:stop] = dev
+        mask[start:stop] = (local_mad > 0) & (dev > threshold * local_mad)
+    return mask, deviation
+
+def _welch_ttest(mean1, var1, n1, mean2, var2, n2):
+    """
+    由分组统计量批量计算 Welch t 检验（不假设方差相等），参数可为任意可广播的数组
+
+    返回:
+        tuple: (t 统计量, 双侧 p 值, Welch-Satterthwaite 自由度)，样本不足时为NaN
+    """
+    n1 = np.asarray(n1, dtype=float)
+    n2 = np.asarray(n2, dtype=float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        se1 = var1 / n1
+        se2 = var2 / n2
+        se = se1 + se2
+        t = (mean1 - mean2) / np.sqrt(se)
+        df = se ** 2 / (se1 ** 2 / (n1 - 1) + se2 ** 2 / (n2 - 1))
+        p_value = 2 * stats.t.sf(np.abs(t), df)
+    return t, p_value, df
+
+def _cohens_d(mean1, var1, n1, mean2, var2, n2):
+    """第二组相对第一组的 Cohen's d（合并标准差），参数可为任意可广播的数组"""
+    n1 = np.asarray(n1, dtype=float)
+    n2 = np.asarray(n2, dtype=float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        pooled = np.sqrt(((n1 - 1) * var1 + (n2 - 1) * var2) / (n1 + n2 - 2))
+        return np.where(pooled > 0, (mean2 - mean1) / pooled, np.where(mean1 == mean2, 0.0, np.nan))
+
+def _effect_size_label(d):
+    """按 Cohen 的经验标准划分效应量等级"""
+    d = abs(d)
+    if np.isnan(d):
+        return "无法计算"
+    return "可忽略" if d < 0.2 else "小" if d < 0.5 else "中等" if d < 0.8 else "大"
+
+def _robust_zscores(matrix):
+    """
+    按列计算稳健z分数：(x - 中位数) / (1.4826 × MAD)
+
+    MAD 为0时改用 1.2533 × 平均绝对偏差；仍为0（整列相同）或缺失的值记为0
+    """
+    median = _nan_quantiles(matrix, [0.5])[0]
+    deviation = np.abs(matrix - median)
+    scale = 1.4826 * _nan_quantiles(deviation, [0.5])[0]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        scale = np.where(scale > 0, scale, 1.2533 * np.nanmean(deviation, axis=0))
+        z = np.where(scale > 0, (matrix - median) / scale, 0.0)
+    return np.nan_to_num(z, nan=0.0, posinf=0.0, neginf=0.0)
+
+def _mahalanobis_distances(matrix):
+    """
+    各行相对原点（已中心化的稳健z分数）的马氏距离，协方差采用 Ledoit-Wolf 收缩估计
+
+    收缩到 μI（μ 为平均方差），特征数多于样本数时协方差仍可逆
+
+    返回:
+        tuple: (距离数组, 收缩强度)
+    """
+    rows, cols = matrix.shape
+    if rows == 0 or cols == 0:
+        return np.zeros(rows), 0.0
+    centered = matrix - matrix.mean(axis=0)
+    sample = centered.T @ centered / rows
+    mu = np.trace(sample) / cols
+    if mu <= 0:
+        return np.zeros(rows), 0.0
+    # d² = ||S - μI||²，b² 取逐样本外积与 S 之差的平均（上限为 d²）
+    target_gap = sample.copy()
+    target_gap[np.diag_indices(cols)] -= mu
+    d2 = (target_gap ** 2).sum()
+    b2_bar = ((centered ** 2).sum(axis=1) ** 2).sum() / rows ** 2 - (sample ** 2).sum() / rows
+    shrinkage = min(max(b2_bar, 0.0), d2) / d2 if d2 > 0 else 1.0
+    covariance = (1 - shrinkage) * sample
+    covariance[np.diag_indices(cols)] += shrinkage * mu
+    try:
+        solved = linalg.cho_solve(linalg.cho_factor(covariance), matrix.T)
+    except linalg.LinAlgError:
+        # 收缩强度接近0且样本协方差奇异时退化为伪逆
+        solved = np.linalg.pinv(covariance) @ matrix.T
+    return np.sqrt(np.maximum((matrix.T * solved).sum(axis=0), 0.0)), shrinkage
+
+def _spectral_peaks(psd, count):
+    """
+    每列功率谱中最高的 count 个局部极大值（不含直流与端点）
+
+    返回:
+        tuple: (频率位置矩阵 count × 列数，按峰值从高到低排列, 是否为有效峰的掩码)
+    """
+    bins = psd.shape[0]
+    scores = np.full(psd.shape, -np.inf)
+    if bins > 2:
+        interior = (psd[1:-1] > psd[:-2]) & (psd[1:-1] >= psd[2:])
+        scores[1:-1] = np.where(interior, psd[1:-1], -np.inf)
+    k = min(count, bins)
+    if k <= 0:
+        return np.zeros((0, psd.shape[1]), dtype=np.intp), np.zeros((0, psd.shape[1]), dtype=bool)
+    top = np.argpartition(-scores, k - 1, axis=0)[:k] if k < bins else np.argsort(-scores, axis=0)
+    top = np.take_along_axis(top, np.argsort(-np.take_along_axis(scores, top, axis=0), axis=0, kind='stable'), axis=0)
+    return top, np.isfinite(np.take_along_axis(scores, top, axis=0))
+
+def _noise_standardize(matrix):
+    """
+    变点检测前的逐列标准化：缺失值线性插值补齐，减去中位数后除以噪声尺度
+
+    噪声尺度取一阶差分的 1.4826 × MAD / √2，不受均值突变和斜坡影响；
+    量化信号差分 MAD 为0时依次退用差分标准差、整体标准差
+    """
+    signal = np.empty(matrix.shape, order='F')
+    positions = np.arange(len(matrix))
+    for j in range(matrix.shape[1]):
+        x = matrix[:, j]
+        valid = ~np.isnan(x)
+        if not valid.all():
+            x = np.interp(positions, positions[valid], x[valid])
+        diff = np.diff(x)
+        scale = 0.0
+        if len(diff):
+            scale = 1.4826 * np.median(np.abs(diff - np.median(diff))) / np.sqrt(2)
+            if not scale > 0:
+                scale = np.std(diff) / np.sqrt(2)
+        if not scale > 0:
+            scale = np.std(x)
+        signal[:, j] = (x - np.median(x)) / (scale if scale > 0 else 1.0)
+    return signal
+
+def _prefix_costs(x, linear):
+    """
+    一维序列每个前缀 x[:k]（k = 0..n）的拟合残差平方和，由累加和一次算出
+
+    linear 为 False 时每段拟合常数（均值突变），为 True 时拟合直线（平台与升降温段）
+    """
+    n = np.arange(len(x) + 1, dtype=float)
+    safe_n = np.where(n > 0, n, 1.0)
+    x = x - x.mean()  # 平移不改变残差，减小累加和的舍入误差
+    sx = np.concatenate(([0.0], np.cumsum(x)))
+    cost = np.concatenate(([0.0], np.cumsum(x * x))) - sx * sx / safe_n
+    if linear:
+        stx = np.concatenate(([0.0], np.cumsum(np.arange(len(x)) * x)))
+        centered_tx = stx - (n - 1) / 2 * sx  # Σ(t - t̄)x
+        centered_tt = n * (n * n - 1) / 12  # Σ(t - t̄)²，等距整数横坐标的闭式
+        cost -= np.where(centered_tt > 0, centered_tx * centered_tx / np.where(centered_tt > 0, centered_tt, 1.0), 0.0)
+    return np.maximum(cost, 0.0)
+
+def _best_split(block, min_size, linear):
+    """
+    区间内最优的单个切分点：各通道 [整段残差 - 左段残差 - 右段残差] 之和最大处
+
+    右段残差取反转序列的前缀残差（各自从0计横坐标，避免大数相减），
+    全部候选切分点一次向量化计算，代价 O(区间长度 × 通道数)
+
+    返回:
+        tuple: (残差下降, 切分位置（相对区间起点）)，区间不足两个最短段时为None
+    """
+    m = len(block)
+    if m < 2 * min_size:
+        return None
+    splits = np.arange(min_size, m - min_size + 1)
+    gains = np.zeros(len(splits))
+    for j in range(block.shape[1]):
+        left = _prefix_costs(block[:, j], linear)
+        right = _prefix_costs(block[::-1, j], linear)
+        gains += left[m] - left[splits] - right[m - splits]
+    best = int(gains.argmax())
+    return float(gains[best]), int(splits[best])
+
+def _refine_change_points(signal, cuts, min_size, linear, penalty, max_passes=10):
+    """
+    二分切分的修正：贪心切分在连续的折线信号（升温接平台）上会留下早期的错位变点，
+    逐个把变点在左右相邻变点之间重新求最优位置，残差下降不足 penalty 的删除，直到不再变化
+
+    返回:
+        list: [(变点位置, 相邻变点间的残差下降, 左邻位置, 右邻位置)]，按位置升序
+    """
+    cuts = sorted(cuts)
+    n = len(signal)
+    for _ in range(max_passes):
+        changed = False
+        i = 0
+        while i < len(cuts):
+            a = cuts[i - 1] if i > 0 else 0
+            b = cuts[i + 1] if i + 1 < len(cuts) else n
+            split = _best_split(signal[a:b], min_size, linear)
+            if split is None or split[0] <= penalty:
+                del cuts[i]
+                changed = True
+                continue
+            if a + split[1] != cuts[i]:
+                cuts[i] = a + split[1]
+                changed = True
+            i += 1
+        if not changed:
+            break
+    bounds = [0] + cuts + [n]
+    return [(cut, _best_split(signal[bounds[i]:bounds[i + 2]], min_size, linear)[0], bounds[i], bounds[i + 2])
+            for i, cut in enumerate(cuts)]
+
+def _top_pairs(corr, k):
+    """相关矩阵上三角中 |r| 最大的 k 对（NaN 不参与），返回 (行号, 列号) 数组，按 |r| 从大到小"""
+    rows, cols = np.triu_indices(corr.shape[0], k=1)
+    scores = np.abs(corr[rows, cols])
+    scores = np.where(np.isnan(scores), -1.0, scores)
+    k = min(k, int((scores >= 0).sum()))
+    if k <= 0:
+        return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+    top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+    top = top[np.argsort(-scores[top], kind='stable')]
+    return rows[top], cols[top]
+
+def _lag_correlations(centered, pairs, max_lag):
+    """
+    FFT 互相关：每个涉及的通道只做一次 rfft，每对通道一次逆变换得到 -max_lag..max_lag 的全部滞后
+
+    补零到 n + max_lag 即可避免循环卷绕（只取 |滞后| ≤ max_lag 的部分）；
+    每个滞后除以两通道在重叠区间上的能量开方（由平方累加和得到），
+    漂移、非平稳信号的峰值不会因重叠变短被压低，滞后0处即相关系数
+
+    返回:
+        tuple: (滞后数组, {(i, j): 归一化互相关数组})，正滞后表示第 j 列落后第 i 列
+    """
+    n = len(centered)
+    size = fft.next_fast_len(n + max_lag)
+    spectra, energy = {}, {}
+    for j in {j for pair in pairs for j in pair}:
+        spectra[j] = fft.rfft(centered[:, j], size)
+        energy[j] = np.concatenate(([0.0], np.cumsum(np.square(centered[:, j], dtype=float))))
+    lags = np.arange(-max_lag, max_lag + 1)
+    ahead = np.maximum(lags, 0)
+    behind = np.maximum(-lags, 0)
+    results = {}
+    for i, j in pairs:
+        # r[k] = Σ_t a[t] b[t + k]，负滞后位于数组末尾
+        raw = fft.irfft(np.conj(spectra[i]) * spectra[j], size)
+        xcorr = np.concatenate((raw[size - max_lag:], raw[:max_lag + 1])) if max_lag else raw[:1]
+        # 重叠区间：a 取 [behind, n - ahead)，b 取 [ahead, n - behind)
+        energy_a = energy[i][n - ahead] - energy[i][behind]
+        energy_b = energy[j][n - behind] - energy[j][ahead]
+        scale = np.sqrt(energy_a * energy_b)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            results[(i, j)] = np.where(scale > 0, xcorr / np.where(scale > 0, scale, 1.0), np.nan)
+    return lags, results
+
+def _run_lengths(flags):
+    """逐列连续为 True 的长度（为 False 处归零）：累计计数减去最近一次为 False 时的累计计数"""
+    count = np.cumsum(flags, axis=0, dtype=np.int32)
+    return count - np.maximum.accumulate(np.where(flags, 0, count), axis=0)
+
+def _onsets(flags):
+    """逐列由 False 变为 True 的位置（连续报警只计一次）"""
+    onsets = flags.copy()
+    onsets[1:] &= ~flags[:-1]
+    return onsets
+
+def _forward_fill(matrix, fill):
+    """逐列用前一个有效值填补NaN，开头的NaN用 fill（每列一个值）"""
+    valid = ~np.isnan(matrix)
+    last = np.maximum.accumulate(np.where(valid, np.arange(len(matrix))[:, None], -1), axis=0)
+    filled = np.take_along_axis(matrix, np.maximum(last, 0), axis=0)
+    return np.where(last >= 0, filled, fill)
+
+def _cusum(z, k):
+    """
+    单侧累积和 C_t = max(0, C_{t-1} + z_t - k) 的闭式解：S_t - min(0, min_{j≤t} S_j)，S 为 z - k 的累加和
+    """
+    s = np.cumsum(z - k, axis=0)
+    return s - np.minimum(np.minimum.accumulate(s, axis=0), 0.0)
+
+def _capability(mean, sigma, lsl, usl):
+    """过程能力指数：双侧规格给出 Cp 与 Cpk，单侧只给出 Cpk（sigma 无效时为None）"""
+    if not sigma > 0 or (lsl is None and usl is None):
+        return None, None
+    sides = [(usl - mean) / (3 * sigma)] if usl is not None else []
+    if lsl is not None:
+        sides.append((mean - lsl) / (3 * sigma))
+    cp = (usl - lsl) / (6 * sigma) if lsl is not None and usl is not None else None
+    return (float(cp) if cp is not None else None), float(min(sides))
+
+def _autocorrelation(x, max_lag):
+    """
+    FFT 自相关（去线性趋势后，补零到 2n 避免循环卷绕），返回 0..max_lag 的归一化自相关，O(n log n)
+    """
+    n = len(x)
+    t = np.arange(n) - (n - 1) / 2
+    detrended = x - x.mean()
+    denominator = np.dot(t, t)
+    if denominator > 0:
+        detrended = detrended - t * (np.dot(t, detrended) / denominator)
+    size = fft.next_fast_len(2 * n - 1)
+    spectrum = fft.rfft(detrended, size)
+    acf = fft.irfft(spectrum.real ** 2 + spectrum.imag ** 2, size)[:max_lag + 1]
+    return acf / acf[0] if acf[0] > 0 else np.zeros(max_lag + 1)
+
+def _acf_period(acf, min_lag):
+    """
+    由自相关求主周期：自相关首次降到0以下后，按正值区间（波瓣）分组，每个波瓣的最大值即一个候选周期；
+    取高度不低于最高波瓣 90% 的第一个波瓣（避免选到周期的整数倍，噪声造成的小波瓣被高度门限排除），
+    峰值处做抛物线插值得到小数周期
+
+    返回:
+        tuple: (周期（行数）, 该滞后处的自相关)，自相关不过零或之后没有正波瓣时为 (None, 0.0)
+    """
+    below = np.flatnonzero(acf[1:] <= 0)
+    if not len(below):
+        return None, 0.0
+    start = max(int(below[0]) + 1, int(min_lag))
+    positive = acf[start:] > 0
+    lobe_starts = np.flatnonzero(positive & ~np.r_[False, positive[:-1]]) + start
+    if not len(lobe_starts):
+        return None, 0.0
+    # 每个波瓣到下一个波瓣起点之间的最大值（中间的负值不影响）
+    heights = np.maximum.reduceat(acf, lobe_starts)
+    chosen = int(np.flatnonzero(heights >= 0.9 * heights.max())[0])
+    stop = lobe_starts[chosen + 1] if chosen + 1 < len(lobe_starts) else len(acf)
+    lag = int(lobe_starts[chosen] + acf[lobe_starts[chosen]:stop].argmax())
+    center = acf[lag]
+    if 0 < lag < len(acf) - 1:
+        left, right = acf[lag - 1], acf[lag + 1]
+        curvature = left - 2 * center + right
+        shift = 0.5 * (left - right) / curvature if curvature < 0 else 0.0
+        return lag + float(np.clip(shift, -0.5, 0.5)), float(center)
+    return float(lag), float(center)
+
+def _bootstrap_draw(matrix, resamples, max_sample, rng):
+    """
+    行重抽样：超过 max_sample 行时先无放回抽取 max_sample 行（m-out-of-n 自助法），
+    再一次生成 (重抽样次数 × 样本量) 的下标矩阵，并换算为每行被抽中次数的权重矩阵，
+    之后各列的重抽样和 / 平方和都由一次矩阵乘法得到
+
+    返回:
+        tuple: (抽取的样本行, 下标矩阵, 权重矩阵)
+    """
+    n = len(matrix)
+    sample = matrix[np.sort(rng.choice(n, max_sample, replace=False))] if n > max_sample else matrix
+    size = len(sample)
+    index = rng.integers(0, size, size=(resamples, size))
+    offsets = (np.arange(resamples) * size)[:, None]
+    weights = np.bincount((index + offsets).ravel(), minlength=resamples * size).reshape(resamples, size)
+    return sample, index, weights.astype(float)
+
+def _bootstrap_moments(sample, weights):
+    """
+    每次重抽样各列的 (有效数, 均值, 标准差)：以样本均值为原点，有效数/和/平方和各一次矩阵乘法
+
+    返回:
+        tuple: 三个 (重抽样次数 × 列数) 矩阵
+    """
+    valid = ~np.isnan(sample)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        origin = np.nan_to_num(np.nanmean(sample, axis=0))
+    centered = np.where(valid, sample - origin, 0.0)
+    counts = weights @ valid.astype(float) if not valid.all() else np.full((len(weights), sample.shape[1]), float(len(sample)))
+    sums = weights @ centered
+    squares = weights @ (centered * centered)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts
+        stds = np.sqrt(np.maximum(squares - sums * means, 0.0) / (counts - 1))
+    return counts, origin + means, stds
+
+def _bootstrap_interval(estimate, deviations, confidence):
+    """百分位区间：点估计加上（已按 √(m/n) 缩放的）重抽样偏差的分位数，另给出标准误"""
+    alpha = (1 - confidence) / 2
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        low, high = np.nanquantile(deviations, [alpha, 1 - alpha], axis=0)
+        std_error = np.nanstd(deviations, axis=0, ddof=1)
+    return estimate + low, estimate + high, std_error
+
+def _chunk_elapsed(values, kind, origin):
+    """
+    流式数据块的时间列转换为相对全局起点经过的秒数
+
+    参数:
+        values (Series): 本块的时间列
+        kind (str): 首个数据块解析得到的时间类型，本块类型不同时整块记为NaN
+        origin: 全局起点（datetime 为整数纳秒，数值为秒），None 时取本块首个有效时间
+
+    返回:
+        tuple: (秒数数组（无效为NaN）, 起点)
+    """
+    chunk_kind, parsed = parse_time(values)
+    if chunk_kind != kind:
+        return np.full(len(values), np.nan), origin
+    if kind == "datetime":
+        invalid = np.isnat(parsed)
+        ticks = parsed.astype(np.int64)
+    else:
+        invalid = np.isnan(parsed)
+        ticks = parsed
+    if origin is None:
+        if invalid.all():
+            return np.full(len(values), np.nan), origin
+        origin = ticks[np.argmax(~invalid)]
+    # 与 elapsed_seconds 一致：先在整数纳秒上减去起点再转浮点
+    seconds = (ticks - origin).astype(float)
+    if kind == "datetime":
+        seconds /= 1e9
+    seconds[invalid] = np.nan
+    return seconds, origin
+
+def _one_way_anova(count, mean, m2):
+    """
+    由分组统计量批量计算单因素方差分析（与 scipy.stats.f_oneway 一致）
+
+    参数:
+        count, mean, m2 (ndarray): (组数 × 列数) 的计数、均值与离差平方和，计数为0的组不参与
+
+    返回:
+        tuple: (F 统计量, p 值) 按列数组
+    """
+    present = count > 0
+    groups = present.sum(axis=0)
+    total = count.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        grand_mean = np.where(present, count * mean, 0.0).sum(axis=0) / total
+        between = np.where(present, count * (mean - grand_mean) ** 2, 0.0).sum(axis=0)
+        within = np.where(present, m2, 0.0).sum(axis=0)
+        df_between = groups - 1
+        df_within = total - groups
+        f_stat = (between / df_between) / (within / df_within)
+        p_value = stats.f.sf(f_stat, df_between, df_within)
+    invalid = (groups < 2) | (df_within <= 0)
+    f_stat[invalid] = np.nan
+    p_value[invalid] = np.nan
+    return f_stat, p_value
+
+def _kruskal_wallis(matrix, sizes):
+    """
+    按列批量计算 Kruskal-Wallis H 检验（含结值校正，与 scipy.stats.kruskal 一致）
+
+    参数:
+        matrix (ndarray): 各组数据按行首尾相接的 (总行数 × 列数) 矩阵，缺失值为NaN
+        sizes (list): 各组的行数
+
+    返回:
+        tuple: (H 统计量, p 值) 按列数组
+    """
+    ranks = stats.rankdata(matrix, axis=0, nan_policy='omit')
+    valid = ~np.isnan(matrix)
+    bounds = np.cumsum([0] + list(sizes))
+    rank_sum = np.array([np.nansum(ranks[a:b], axis=0) for a, b in zip(bounds[:-1], bounds[1:])])
+    group_n = np.array([valid[a:b].sum(axis=0) for a, b in zip(bounds[:-1], bounds[1:])], dtype=float)
+    total = group_n.sum(axis=0)
+    groups = (group_n > 0).sum(axis=0)
+    
+    # 结值校正：排序后相邻相等的值构成一个结，按游程统计各结的大小
+    ordered = np.sort(matrix, axis=0)
+    rows, cols = ordered.shape
+    starts = np.ones((rows, cols), dtype=bool)
+    starts[1:] = ordered[1:] != ordered[:-1]
+    run_id = np.cumsum(starts, axis=0) - 1 + np.arange(cols) * rows
+    run_size = np.bincount(run_id[~np.isnan(ordered)], minlength=rows * cols).astype(float)
+    ties = (run_size ** 3 - run_size).reshape(cols, rows).sum(axis=1)
+    
+    with np.errstate(invalid='ignore', divide='ignore'):
+        h_stat = 12.0 / (total * (total + 1)) * np.where(group_n > 0, rank_sum ** 2 / group_n, 0.0).sum(axis=0) \
+            - 3 * (total + 1)
+        h_stat = h_stat / (1 - ties / (total ** 3 - total))
+        p_value = stats.chi2.sf(h_stat, groups - 1)
+    invalid = groups < 2
+    h_stat[invalid] = np.nan
+    p_value[invalid] = np.nan
+    return h_stat, p_value
+
+class OutlierIndex:
+    """
+    异常值索引：检测一次后以按列压缩的位图保存全部异常位置，可反复查询而无需重新检测
+
+    位置均指数据行号（0 起），indices 返回原数据的行索引标签
+    """
+    
+    def __init__(self, columns, bitmap, rows, index, matrix, valid_counts, centers, method, threshold):
+        self.columns = list(columns)
+        self.bitmap = bitmap  # (列数 × ceil(行数/8)) 的 uint8 位图
+        self.rows = rows
+        self.index = index
+        self.matrix = matrix
+        self.valid_counts = valid_counts
+        self.centers = centers
+        self.method = method
+        self.threshold = threshold
+        self._column_pos = {col: j for j, col in enumerate(self.columns)}
+    
+    def mask(self, col):
+        """该列异常位置的布尔掩码（长度为行数）"""
+        return np.unpackbits(self.bitmap[self._column_pos[col]], count=self.rows).astype(bool)
+    
+    def positions(self, col):
+        """该列全部异常值的行号"""
+        return np.flatnonzero(self.mask(col))
+    
+    def count(self, col):
+        return int(np.unpackbits(self.bitmap[self._column_pos[col]], count=self.rows).sum())
+    
+    def values(self, col):
+        return self.matrix[self.positions(col), self._column_pos[col]]
+    
+    def indices(self, col):
+        """该列全部异常值对应的原数据索引标签"""
+        return self.index[self.positions(col)]
+    
+    def ranges(self, col):
+        """连续异常段的游程编码：[[起始行号, 结束行号], ...]（闭区间）"""
+        positions = self.positions(col)
+        if len(positions) == 0:
+            return []
+        breaks = np.flatnonzero(np.diff(positions) > 1)
+        starts = np.concatenate([[positions[0]], positions[breaks + 1]])
+        ends = np.concatenate([positions[breaks], [positions[-1]]])
+        return np.column_stack([starts, ends]).tolist()
+    
+    def top(self, col, k=10):
+        """
+        偏离中心最远的 k 个异常值（部分选择，按偏离程度降序）
+
+        返回:
+            list: [{"index": 索引标签, "value": 数值}, ...]
+        """
+        positions = self.positions(col)
+        if len(positions) == 0 or k <= 0:
+            return []
+        values = self.matrix[positions, self._column_pos[col]]
+        distance = np.abs(values - self.centers[self._column_pos[col]])
+        if len(positions) > k:
+            chosen = np.argpartition(-distance, k - 1)[:k]
+        else:
+            chosen = np.arange(len(positions))
+        chosen = chosen[np.argsort(-distance[chosen], kind='stable')]
+        return [{"index": int(self.index[positions[i]]), "value": float(values[i])} for i in chosen]
+
 class DataAnalyzer:
     """
     数据分析器，提供多种分析功能
     """
     
-    def __init__(self):
-        pass
+    def __init__(self):
+        pass
+    
+    def _run_matrix(self, ctx, func_name, columns, *args, matrix=None):
+        """
+        在指定列组成的数值矩阵上执行矩阵分析函数；上下文设置了多个工作进程时按列并行
+        """
+        if ctx.workers > 1 and len(columns) > 1:
+            frame = ctx.published(columns)
+            if frame is not None:
+                # 工作进程直接挂载上下文的共享矩阵，各分析段不再重复堆叠和复制
+                return run_shared_parallel(func_name, frame.descriptor, frame.positions(columns),
+                                           ctx.workers, *args)
+            if matrix is None:
+                matrix = ctx.stack(columns)
+            return run_column_parallel(func_name, matrix, ctx.workers, *args)
+        if matrix is None:
+            matrix = ctx.stack(columns)
+        return getattr(self, func_name)(matrix, *args)
+    
+    def basic_statistics(self, data, columns=None, quantile_mode='exact', quantile_error=0.01, workers=1):
+        """
+        基础统计分析
+        
+        参数:
+            data (DataFrame): 输入数据
+            columns (list): 要分析的列名，None则分析所有数值列
+            quantile_mode (str): 分位数计算方式 'exact' 精确排序 或 'approx' 近似草图（不排序全部数据）
+            quantile_error (float): 近似模式下的归一化秩误差上界
+            workers (int): 并行工作进程数，1为单进程
+            
+        返回:
+            dict: 统计结果（近似模式下附带 quantile_mode 与 quantile_rank_error）
+        """
+        ctx = AnalysisContext(data, columns, workers)
+        return self._basic_statistics(ctx, ctx.columns, quantile_mode, quantile_error)
+    
+    def _basic_statistics(self, ctx, columns, quantile_mode='exact', quantile_error=0.01):
+        columns = [col for col in columns if col in ctx.data.columns]
+        sketch_error = quantile_error if quantile_mode == 'approx' else None
+        
+        # 未缓存的列一次性堆叠成矩阵做向量化统计
+        pending = ctx.pending("basic_statistics", columns, sketch_error)
+        if pending:
+            for col, result in zip(pending, self._run_matrix(ctx, "_matrix_statistics", pending, sketch_error)):
+                ctx.store("basic_statistics", col, result, sketch_error)
+        
+        results = {}
+        for col in columns:
+            result = ctx.section("basic_statistics", col, self._column_statistics, sketch_error)
+            if result is not None:
+                results[col] = result
+        
+        return results
+    
+    def _matrix_statistics(self, matrix, quantile_error=None):
+        """
+        对二维数值矩阵 (行数 × 列数) 按列做忽略NaN的向量化统计
+
+        quantile_error 不为None时分位数改由 KLL 草图近似估计
+        返回与列一一对应的结果列表，无有效值的列为None
+        """
+        counts = (~np.isnan(matrix)).sum(axis=0)
+        means = np.nanmean(matrix, axis=0)
+        stds = np.nanstd(matrix, axis=0, ddof=1)
+        mins = np.nanmin(matrix, axis=0)
+        maxs = np.nanmax(matrix, axis=0)
+        if quantile_error is None:
+            q25, medians, q75 = _nan_quantiles(matrix, [0.25, 0.5, 0.75])
+        else:
+            sketches = ColumnSketches(range(matrix.shape[1]), quantile_error).update(matrix)
+            q25, medians, q75 = sketches.quantiles([0.25, 0.5, 0.75])
+        
+        results = []
+        for j in range(matrix.shape[1]):
+            if counts[j] == 0:
+                results.append(None)
+                continue
+            results.append({
+                "count": int(counts[j]),
+                "mean": float(means[j]),
+                "std": float(stds[j]),
+                "min": float(mins[j]),
+                "max": float(maxs[j]),
+                "median": float(medians[j]),
+                "cv": float(stds[j] / means[j]) if means[j] != 0 else 0,  # 变异系数
+                "q25": float(q25[j]),
+                "q75": float(q75[j])
+            })
+            if quantile_error is not None:
+                results[-1]["quantile_mode"] = "approx"
+                results[-1]["quantile_rank_error"] = float(sketches.rank_error)
+        return results
+    
+    def _column_statistics(self, series, quantile_error=None):
+        """单列基础统计"""
+        if len(series) == 0:
+            return None
+        return self._matrix_statistics(series.to_numpy(dtype=float)[:, None], quantile_error)[0]
+    
+    def stability_analysis(self, data, columns=None, window_size=10, workers=1):
+        """
+        稳定性分析
+        
+        参数:
+            data (DataFrame): 输入数据
+            columns (list): 要分析的列名
+            window_size (int): 滚动窗口大小
+            workers (int): 并行工作进程数，1为单进程
+            
+        返回:
+            dict: 稳定性指标
+        """
+        ctx = AnalysisContext(data, columns, workers)
+        return self._stability_analysis(ctx, ctx.columns, window_size)
+    
+    def multi_window_stability(self, data, columns=None, window_sizes=(10, 100, 1000), workers=1):
+        """
+        多窗口稳定性对比：一次遍历同时计算多个窗口大小下的稳定性指标
+        
+        参数:
+            data (DataFrame): 输入数据
+            columns (list): 要分析的列名
+            window_sizes (list): 窗口大小列表
+            workers (int): 并行工作进程数，1为单进程
+            
+        返回:
+            dict: {列名: {窗口大小: 稳定性指标}}，数据量不超过窗口大小的组合不输出
+        """
+        ctx = AnalysisContext(data, columns, workers)
+        window_sizes = [int(w) for w in window_sizes]
+        self._compute_stability(ctx, ctx.columns, window_sizes)
+        
+        results = {}
+        for col in ctx.columns:
+            if col not in data.columns:
+                continue
+            per_window = {}
+            for window in window_sizes:
+                result = ctx.section("stability_analysis", col, self._column_stability, window)
+                if result is not None:
+                    per_window[window] = result
+            if per_window:
+                results[col] = per_window
+        
+        return results
+    
+    def _stability_analysis(self, ctx, columns, window_size=10):
+        columns = [col for col in columns if col in ctx.data.columns]
+        self._compute_stability(ctx, columns, [window_size])
+        
+        results = {}
+        for col in columns:
+            result = ctx.section("stability_analysis", col, self._column_stability, window_size)
+            if result is not None:
+                results[col] = result
+        
+        return results
+    
+    def _compute_stability(self, ctx, columns, window_sizes):
+        """对未缓存的列一次性运行滚动稳定性引擎，并按 (列, 窗口) 写入缓存"""
+        pending = set()
+        for window in window_sizes:
+            pending.update(ctx.pending("stability_analysis", columns, window))
+        pending = [col for col in columns if col in pending]
+        if not pending:
+            return
+        for window, results in self._run_matrix(ctx, "_matrix_stability", pending, window_sizes).items():
+            for col, result in zip(pending, results):
+                ctx.store("stability_analysis", col, result, window)
+    
+    def _matrix_stability(self, matrix, window_sizes):
+        """
+        对二维数值矩阵按列计算稳定性指标
+
+        返回:
+            dict: {窗口大小: 与列一一对应的结果列表}，有效值不超过窗口大小的列为None
+        """
+        windows, changes, counts = _rolling_stability(matrix, window_sizes)
+        results = {}
+        for window in window_sizes:
+            metrics = windows[window]
+            column_results = []
+            for j in range(matrix.shape[1]):
+                if counts[j] <= window or metrics is None:
+                    column_results.append(None)
+                    continue
+                std_mean = float(metrics["rolling_std_mean"][j])
+                stability_index = 1 / (1 + std_mean) if std_mean > 0 else 1
+                column_results.append({
+                    "stability_index": float(stability_index),
+                    "rolling_std_mean": std_mean,
+                    "rolling_std_max": float(metrics["rolling_std_max"][j]),
+                    "max_change_rate": float(changes["max_change_rate"][j]),
+                    "avg_change_rate": float(changes["avg_change_rate"][j]),
+                    "stable_periods": int(metrics["stable_periods"][j]),  # 稳定周期数
+                    "stability_rating": self._get_stability_rating(stability_index)
+                })
+            results[window] = column_results
+        return results
+    
+    def _column_stability(self, series, window_size):
+        """单列稳定性指标"""
+        return self._matrix_stability(series.to_numpy(dtype=float)[:, None], [window_size])[window_size][0]
+    
+    def trend_analysis(self, data, columns=None, time_col=None, workers=1):
+        """
+        趋势分析
+        
+        参数:
+            data (DataFrame): 输入数据
+            columns (list): 要分析的列名
+            time_col (str): 时间列名，不参与趋势计算；可解析时以经过的秒数为横坐标
+            workers (int): 并行工作进程数，1为单进程
+            
+        返回:
+            dict: 趋势分析结果（横坐标为真实经过时间或数据行号，缺失值所在行跳过，x 与 y 保持对齐；
+                  按时间回归时附带 slope_unit）
+        """
+        ctx = AnalysisContext(data, columns, workers)
+        return self._trend_analysis(ctx, ctx.columns, time_col)
+    
+    def _trend_analysis(self, ctx, columns, time_col=None):
+        columns = [col for col in columns if col in ctx.data.columns and col != time_col]
+        # 时间列可解析时对经过的秒数回归，否则对行号回归
+        x = ctx.elapsed(time_col) if time_col else None
+        x_key = () if x is None else (time_col,)
+        
+        # 未缓存的列一次性做批量回归
+        pending = ctx.pending("trend_analysis", columns, *x_key)
+        if pending:
+            for col, result in zip(pending, self._run_matrix(ctx, "_matrix_trend", pending, x)):
+                ctx.store("trend_analysis", col, result, *x_key)
+        
+        results = {}
+        for col in columns:
+            result = ctx.result("trend_analysis", col, *x_key)
+            if result is not None:
+                results[col] = result
+        
+        return results
+    
+    def _matrix_trend(self, matrix, x=None):
+        """
+        对二维数值矩阵的所有列做一次批量闭式线性回归（横坐标为 x 或行号，缺失值按掩码剔除）
+
+        返回与列一一对应的结果列表，有效值不超过2个的列为None
+        """
+        results = TrendAccumulator(range(matrix.shape[1])).update(matrix, x).result()
+        return [results.get(j) for j in range(matrix.shape[1])]
+    
+    def resample(self, data, time_col, interval='1min', columns=None, max_bins=None):
+        """
+        按时间间隔重采样：时间列只解析一次（格式缓存），按 floor(时间 / 间隔) 分箱，
+        排序后用 reduceat 对所有列一次完成各箱的 均值/最小值/最大值/有效数 聚合
+        
+        参数:
+            data (DataFrame): 输入数据
+            time_col (str): 时间列名（时间字符串，或以秒为单位的数值）
+            interval (str|float): 间隔，如 '1s'、'1min'、'1h'，或秒数
+            columns (list): 要聚合的列名，None则为所有数值列
+            max_bins (int): 可选，箱数上限；超过时按整数倍放大间隔
+            
+        返回:
+            dict: 实际间隔、各箱起点时间（只输出有数据的箱）以及逐列的 mean/min/max/count 列表
+        """
+        ctx = AnalysisContext(data, columns)
+        kind, times = ctx.time(time_col)
+        if kind is None:
+            raise ValueError(f"❌ 时间列无法解析: {time_col}")
+        columns = [col for col in ctx.columns if col in ctx.data.columns and col != time_col]
+        step = interval_seconds(interval)
+        
+        # 箱边界与时钟对齐（时间戳在整数纳秒上整除，避免浮点误差）
+        if kind == "datetime":
+            rows = np.flatnonzero(~np.isnat(times))
+            ticks = times[rows].astype(np.int64)
+        else:
+            rows = np.flatnonzero(~np.isnan(times))
+            ticks = times[rows]
+        if not len(rows):
+            raise ValueError(f"❌ 时间列没有有效时间: {time_col}")
+        
+        def binning(step):
+            if kind == "datetime":
+                return ticks // max(int(round(step * 1e9)), 1)
+            return np.floor(ticks / step).astype(np.int64)
+        
+        bins = binning(step)
+        if max_bins and bins.max() - bins.min() + 1 > max_bins:
+            step *= int(np.ceil((bins.max() - bins.min() + 1) / max_bins))
+            bins = binning(step)
+        
+        matrix = ctx.stack(columns)[rows]
+        if (np.diff(bins) < 0).any():
+            order = np.argsort(bins, kind='stable')
+            bins, matrix = bins[order], matrix[order]
+        starts = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+        valid = ~np.isnan(matrix)
+        counts = np.add.reduceat(valid.astype(np.int64), starts, axis=0)
+        sums = np.add.reduceat(np.where(valid, matrix, 0.0), starts, axis=0)
+        mins = np.fmin.reduceat(matrix, starts, axis=0)
+        maxs = np.fmax.reduceat(matrix, starts, axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+        
+        if kind == "datetime":
+            bin_start = (bins[starts] * int(round(step * 1e9))).astype('datetime64[ns]')
+        else:
+            bin_start = bins[starts] * step
+        
+        return {
+            "time_column": time_col,
+            "time_kind": kind,
+            "requested_interval": interval,
+            "interval_seconds": float(step),
+            "bin_count": int(len(starts)),
+            "bin_start": format_times(kind, bin_start),
+            "series": {col: {
+                "mean": means[:, j].tolist(),
+                "min": mins[:, j].tolist(),
+                "max": maxs[:, j].tolist(),
+                "count": counts[:, j].tolist()
+            } for j, col in enumerate(columns)}
+        }
+    
+    # 各检测方法的默认阈值（iqr 为四分位距倍数，其余为标准化偏差）
+    OUTLIER_THRESHOLDS = {"iqr": 1.5, "zscore": 1.5, "mad": 3.5, "hampel": 3.0}
+    
+    def outlier_detection(self, data, columns=None, method='iqr', threshold=None,
+                          quantile_mode='exact', quantile_error=0.01, window_size=7, workers=1):
+        """
+        异常值检测
+        
+        参数:
+            data (DataFrame): 输入数据
+            columns (list): 要分析的列名
+            method (str): 检测方法 'iqr'、'zscore'、'mad'（中位数/MAD 稳健z分数）或 'hampel'（滚动 Hampel 滤波）
+            threshold (float): 阈值，None则使用该方法的默认值
+            quantile_mode (str): iqr 方法的四分位数计算方式 'exact' 或 'approx'
+            quantile_error (float): 近似模式下的归一化秩误差上界
+            window_size (int): hampel 方法的窗口点数（奇数）
+            workers (int): 并行工作进程数，1为单进程
+            
+        返回:
+            dict: 异常检测结果
+        """
+        ctx = AnalysisContext(data, columns, workers)
+        return self._outlier_detection(ctx, ctx.columns, method, threshold, quantile_mode, quantile_error, window_size)
+    
+    def detect_outliers(self, data, columns=None, method='iqr', threshold=None,
+                        quantile_mode='exact', quantile_error=0.01, window_size=7, workers=1):
+        """
+        对所有数值列做一次向量化异常检测，返回可反复查询的 OutlierIndex
+        
+        参数同 outlier_detection
+        
+        返回:
+            OutlierIndex: 含全部异常位置的位图索引
+        """
+        ctx = AnalysisContext(data, columns, workers)
+        columns = [col for col in ctx.columns if col in data.columns]
+        sketch_error = quantile_error if quantile_mode == 'approx' else None
+        return self._matrix_outliers(ctx, columns, method, threshold, sketch_error, window_size)
+    
+    def _outlier_detection(self, ctx, columns, method='iqr', threshold=None,
+                           quantile_mode='exact', quantile_error=0.01, window_size=7):
+        if threshold is None:
+            threshold = self.OUTLIER_THRESHOLDS.get(method, 1.5)
+        sketch_error = quantile_error if quantile_mode == 'approx' and method == 'iqr' else None
+        columns = [col for col in columns if col in ctx.data.columns]
+        key = (method, threshold, sketch_error, window_size)
+        
+        pending = ctx.pending("outlier_detection", columns, *key)
+        if pending:
+            outlier_index = self._matrix_outliers(ctx, pending, method, threshold, sketch_error, window_size)
+            for col in pending:
+                ctx.store("outlier_detection", col, self._summarize_outliers(outlier_index, col), *key)
+        
+        results = {}
+        for col in columns:
+            result = ctx.result("outlier_detection", col, *key)
+            if result is not None:
+                results[col] = result
+        
+        return results
+    
+    def _matrix_outliers(self, ctx, columns, method, threshold=None, quantile_error=None, window_size=7):
+        """
+        对指定列组成的数值矩阵一次性做异常检测
+
+        返回:
+            OutlierIndex: 异常位置位图及查询所需的中心值等信息
+        """
+        if threshold is None:
+            threshold = self.OUTLIER_THRESHOLDS.get(method, 1.5)
+        matrix = ctx.stack(columns)
+        bitmap, centers, counts, rank_error = self._run_matrix(
+            ctx, "_outlier_bitmap", columns, method, threshold, quantile_error, window_size, matrix=matrix)
+        outlier_index = OutlierIndex(columns, bitmap, matrix.shape[0], np.asarray(ctx.data.index),
+                                     matrix, counts, centers, method, threshold)
+        outlier_index.rank_error = rank_error
+        outlier_index.window_size = window_size if method == 'hampel' else None
+        return outlier_index
+    
+    def _outlier_bitmap(self, matrix, method, threshold, quantile_error=None, window_size=7):
+        """
+        对二维数值矩阵 (行数 × 列数) 按列判定异常值
+
+        返回:
+            tuple: (按列压缩的异常位图, 各列中心值, 各列有效值个数, 近似分位数秩误差或None)
+        """
+        valid = ~np.isnan(matrix)
+        counts = valid.sum(axis=0)
+        rows, cols = matrix.shape
+        rank_error = None
+        
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if method == 'iqr':
+                if quantile_error is None:
+                    q1, median, q3 = _nan_quantiles(matrix, [0.25, 0.5, 0.75])
+                else:
+                    sketches = ColumnSketches(range(cols), quantile_error).update(matrix)
+                    q1, median, q3 = sketches.quantiles([0.25, 0.5, 0.75])
+                    rank_error = sketches.rank_error
+                iqr = q3 - q1
+                mask = (matrix < q1 - threshold * iqr) | (matrix > q3 + threshold * iqr)
+                centers = median
+            elif method == 'zscore':
+                mean = np.nanmean(matrix, axis=0)
+                std = np.nanstd(matrix, axis=0)
+                mask = np.abs(matrix - mean) / std > threshold
+                centers = mean
+            elif method == 'mad':
+                median = _nan_quantiles(matrix, [0.5])[0]
+                deviation = np.abs(matrix - median)
+                scale = 1.4826 * _nan_quantiles(deviation, [0.5])[0]
+                # MAD 为0时退化为平均绝对偏差（Iglewicz-Hoaglin）
+                scale = np.where(scale > 0, scale, 1.2533 * np.nanmean(deviation, axis=0))
+                mask = (scale > 0) & (deviation / scale > threshold)
+                centers = median
+            elif method == 'hampel':
+                half_window = max(1, int(window_size) // 2)
+                mask = np.zeros((rows, cols), dtype=bool)
+                for j in range(cols):
+                    positions = np.flatnonzero(valid[:, j])
+                    if len(positions):
+                        column_mask, _ = _hampel_mask(matrix[positions, j], half_window, threshold)
+                        mask[positions[column_mask], j] = True
+                centers = _nan_quantiles(matrix, [0.5])[0]
+            else:
+                raise ValueError(f"不支持的异常检测方法: {method}")
+        
+        mask &= valid
+        return np.packbits(mask.T, axis=1), np.asarray(centers, dtype=float), counts, rank_error
+    
+    def _summarize_outliers(self, outlier_index, col, top_k=10):
+        """把 OutlierIndex 中某列的结果整理为 outlier_detection 的输出格式"""
+        j = outlier_index.columns.index(col)
+        n_valid = int(outlier_index.valid_counts[j])
+        if n_valid == 0:
+            return None
+        positions = outlier_index.positions(col)
+        first = positions[:10]  # 最多显示10个
+        result = {
+            "outlier_count": len(positions),
+            "outlier_percentage": float(len(positions) / n_valid * 100),
+            "outlier_values": [float(x) for x in outlier_index.matrix[first, j]],
+            "outlier_indices": [int(x) for x in outlier_index.index[first]],
+            "top_outliers": outlier_index.top(col, top_k),
+            "method": outlier_index.method,
+            "threshold": outlier_index.threshold
+        }
+        if outlier_index.window_size is not None:
+            result["window_size"] = outlier_index.window_size
+        if outlier_index.rank_error is not None:
+            result["quantile_mode"] = "approx"
+            result["quantile_rank_error"] = float(outlier_index.rank_error)
+        return result
+    
+    # 自助法默认参数：重抽样次数、参与重抽样的最大行数、随机种子
+    BOOTSTRAP_RESAMPLES = 1000
+    BOOTSTRAP_MAX_SAMPLE = 2000
+    BOOTSTRAP_SEED = 0
+    
+    def batch_comparison(self, data1, data2, columns=None, batch1_name="批次1", batch2_name="批次2",
+                         bootstrap_resamples=0, confidence=0.95, seed=BOOTSTRAP_SEED):
+        """
+        批次间对比分析：两批次各做一次数值化与一遍统计，所有列的 Welch t 检验、
+        效应量（Cohen's d）、变异系数变化一次性向量化计算；均值差的自助法置信区间按需计算
+        
+        参数:
+            data1, data2 (DataFrame): 两个批次的数据
+            columns (list): 要对比的列名，None则取两批次都能数值化的列
+            batch1_name, batch2_name (str): 批次名称
+            bootstrap_resamples (int): 均值差置信区间的重抽样次数，默认0不计算（约使对比耗时翻倍，
+                                       需要时传入如 BOOTSTRAP_RESAMPLES）
+            confidence (float): 置信水平
+            seed (int): 随机种子
+            
+        返回:
+            dict: 对比分析结果
+        """
+        ctx1 = AnalysisContext(data1, columns)
+        ctx2 = AnalysisContext(data2, columns)
+        if columns is None:
+            shared = set(ctx2.columns)
+            columns = [col for col in ctx1.columns if col in shared]  # 取交集，保持批次1的列顺序
+        columns = [col for col in columns if col in data1.columns and col in data2.columns]
+        
+        results = {
+            "batch1_name": batch1_name,
+            "batch2_name": batch2_name,
+            "comparison": {}
+        }
+        if not columns:
+            return results
+        
+        matrix1, matrix2 = ctx1.stack(columns), ctx2.stack(columns)
+        group1 = StatsAccumulator(columns).update(matrix1)
+        group2 = StatsAccumulator(columns).update(matrix2)
+        n1, n2 = group1.count, group2.count
+        mean1, mean2 = group1.mean, group2.mean
+        with np.errstate(invalid='ignore', divide='ignore'):
+            var1 = np.where(n1 > 1, group1.m2 / (n1 - 1), np.nan)
+            var2 = np.where(n2 > 1, group2.m2 / (n2 - 1), np.nan)
+            std1, std2 = np.sqrt(var1), np.sqrt(var2)
+            t_stat, t_p_value, _ = _welch_ttest(mean1, var1, n1, mean2, var2, n2)
+            cohens_d = _cohens_d(mean1, var1, n1, mean2, var2, n2)
+        if bootstrap_resamples and len(matrix1) and len(matrix2):
+            ci_lower, ci_upper = self._bootstrap_mean_difference(matrix1, matrix2, bootstrap_resamples, confidence,
+                                                                 seed, self.BOOTSTRAP_MAX_SAMPLE)
+        
+        for j, col in enumerate(columns):
+            if n1[j] == 0 or n2[j] == 0:
+                continue
+            m1, m2 = float(mean1[j]), float(mean2[j])
+            cv1 = float(std1[j] / m1) if m1 != 0 else 0  # 变异系数
+            cv2 = float(std2[j] / m2) if m2 != 0 else 0
+            
+            results["comparison"][col] = {
+                "batch1_mean": m1,
+                "batch2_mean": m2,
+                "mean_difference": float(m2 - m1),
+                "mean_change_percent": float((m2 - m1) / m1 * 100) if m1 != 0 else 0,
+                "batch1_std": float(std1[j]),
+                "batch2_std": float(std2[j]),
+                "batch1_cv": cv1,
+                "batch2_cv": cv2,
+                "cv_change": float(cv2 - cv1),
+                "stability_comparison": "更稳定" if cv2 < cv1 else "不如" if cv2 > cv1 else "相似",
+                "t_statistic": float(t_stat[j]),
+                "t_p_value": float(t_p_value[j]),
+                "significant_difference": bool(t_p_value[j] < 0.05),
+                "cohens_d": float(cohens_d[j]),
+                "effect_size": _effect_size_label(cohens_d[j]),
+                "improvement": self._assess_improvement(m1, m2, cv1, cv2, col)
+            }
+            if bootstrap_resamples and len(matrix1) and len(matrix2):
+                # 置信区间不含0即均值差在该置信水平下显著
+                results["comparison"][col]["mean_difference_ci"] = [float(ci_lower[j]), float(ci_upper[j])]
+                results["comparison"][col]["ci_excludes_zero"] = bool(ci_lower[j] > 0 or ci_upper[j] < 0)
+        
+        return results
+    
+    def bootstrap_confidence_intervals(self, data, columns=None, statistics=("mean", "median", "cv"),
+                                       resamples=BOOTSTRAP_RESAMPLES, confidence=0.95, seed=BOOTSTRAP_SEED,
+                                       max_sample=BOOTSTRAP_MAX_SAMPLE):
+        """
+        自助法置信区间：均值、中位数、变异系数
+        
+        所有列共用一个行下标矩阵（重抽样次数 × 样本量）：均值和变异系数由权重矩阵的矩阵乘法一次得到，
+        中位数按下标矩阵取值后沿行求中位数。行数超过 max_sample 时先无放回抽取 max_sample 行，
+        重抽样偏差按 √(样本量/有效数) 缩放回全量数据（m-out-of-n 自助法），点估计仍取全量数据
+        
+        参数:
+            data (DataFrame): 输入数据
+            columns (list): 要分析的列名，None则为所有数值列
+            statistics (tuple): 需要区间的统计量，'mean'/'median'/'cv' 的子集
+            resamples (int): 重抽样次数
+            confidence (float): 置信水平
+            seed (int): 随机种子（相同数据和参数结果可复现）
+            max_sample (int): 参与重抽样的最大行数
+            
+        返回:
+            dict: {列名: {"count", "sample_size", 统计量: {"estimate", "lower", "upper", "std_error"}}}
+        """
+        ctx = AnalysisContext(data, columns)
+        columns = [col for col in ctx.columns if col in ctx.data.columns]
+        matrix = ctx.stack(columns)
+        if not columns or not len(matrix):
+            return {}
+        rng = np.random.default_rng(seed)
+        sample, index, weights = _bootstrap_draw(matrix, resamples, max_sample, rng)
+        
+        total = StatsAccumulator(columns).update(matrix)
+        sample_count = (~np.isnan(sample)).sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            scale = np.sqrt(sample_count / total.count)
+            full_std = np.sqrt(total.m2 / (total.count - 1))
+            estimates = {"mean": total.mean, "cv": full_std / total.mean}
+        
+        intervals = {}
+        if "mean" in statistics or "cv" in statistics:
+            counts, means, stds = _bootstrap_moments(sample, weights)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                sample_mean = np.nanmean(sample, axis=0)
+                sample_cv = np.nanstd(sample, axis=0, ddof=1) / sample_mean
+                replicates = {"mean": (means, sample_mean), "cv": (stds / means, sample_cv)}
+            for name in ("mean", "cv"):
+                if name in statistics:
+                    values, center = replicates[name]
+                    intervals[name] = (estimates[name],) + _bootstrap_interval(estimates[name], scale * (values - center), confidence)
+        if "median" in statistics:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)
+                full_median = np.nanmedian(matrix, axis=0)
+                sample_median = np.nanmedian(sample, axis=0)
+                medians = np.empty((resamples, len(columns)))
+                for j in range(len(columns)):
+                    values = sample[:, j][index]
+                    medians[:, j] = np.median(values, axis=1) if sample_count[j] == len(sample) else np.nanmedian(values, axis=1)
+            intervals["median"] = (full_median,) + _bootstrap_interval(full_median, scale * (medians - sample_median), confidence)
+        
+        results = {}
+        for j, col in enumerate(columns):
+            if total.count[j] < 2:
+                continue
+            results[col] = {"count": int(total.count[j]), "sample_size": int(sample_count[j]),
+                            "resamples": int(resamples), "confidence": confidence}
+            for name in statistics:
+                if name in intervals:
+                    estimate, lower, upper, std_error = intervals[name]
+                    results[col][name] = {"estimate": float(estimate[j]), "lower": float(lower[j]),
+                                          "upper": float(upper[j]), "std_error": float(std_error[j])}
+        return results
     
-    def basic_statistics(self, data, columns=None):
+    def _bootstrap_mean_difference(self, matrix1, matrix2, resamples, confidence, seed, max_sample):
+        """两批次各自独立重抽样，均值差（批次2 - 批次1）的自助法置信区间，返回 (下限, 上限) 数组"""
+        rng = np.random.default_rng(seed)
+        deviations, estimates = [], []
+        for matrix in (matrix1, matrix2):
+            sample, _, weights = _bootstrap_draw(matrix, resamples, max_sample, rng)
+            _, means, _ = _bootstrap_moments(sample, weights)
+            with warnings.catch_warnings(), np.errstate(invalid='ignore', divide='ignore'):
+                warnings.simplefilter('ignore', RuntimeWarning)
+                scale = np.sqrt((~np.isnan(sample)).sum(axis=0) / (~np.isnan(matrix)).sum(axis=0))
+                deviations.append(scale * (means - np.nanmean(sample, axis=0)))
+                estimates.append(np.nanmean(matrix, axis=0))
+        lower, upper, _ = _bootstrap_interval(estimates[1] - estimates[0], deviations[1] - deviations[0], confidence)
+        return lower, upper
+    
+    def batch_alignment(self, data1, data2, columns=None, time_col=None, batch1_name="批次1", batch2_name="批次2",
+                        grid_points=2000, band=0.1):
         """
-        基础统计分析
+        批次曲线对齐：两批次的曲线按相同行数分箱降到网格上，多通道联合做带约束的 DTW，
+        给出规整路径和路径上逐点的差值（批次2 - 批次1），比逐行号对比更能反映同一工况下的差异
+        
+        参数:
+            data1, data2 (DataFrame): 两个批次的数据
+            columns (list): 参与对齐的列名，None则取两批次都能数值化的列
+            time_col (str): 时间列名，不参与对齐；可解析时路径同时给出两批次的经过秒数
+            batch1_name, batch2_name (str): 批次名称
+            grid_points (int): 较长批次降到的网格点数（DTW 的代价与网格点数 × 带宽成正比）
+            band (float): Sakoe-Chiba 带半宽占网格点数的比例
+            
+        返回:
+            dict: 规整路径（两批次的行位置）、时间偏移、对齐后与直接按位置对比的差值统计及逐点差值
+        """
+        ctx1 = AnalysisContext(data1, columns)
+        ctx2 = AnalysisContext(data2, columns)
+        if columns is None:
+            shared = set(ctx2.columns)
+            columns = [col for col in ctx1.columns if col in shared]
+        columns = [col for col in columns if col in data1.columns and col in data2.columns and col != time_col]
+        matrix1, matrix2 = ctx1.stack(columns), ctx2.stack(columns)
+        if not columns or not len(matrix1) or not len(matrix2):
+            raise ValueError("❌ 两个批次没有可对齐的共同数值列")
         
+        # 两批次用相同的分箱行数，保持各自的时间尺度；整列缺失的通道不参与对齐
+        size = max(-(-max(len(matrix1), len(matrix2)) // max(int(grid_points), 2)), 1)
+        grid1, grid2 = bin_means(matrix1, size), bin_means(matrix2, size)
+        usable = ~(np.isnan(grid1).all(axis=0) | np.isnan(grid2).all(axis=0))
+        columns = [col for col, ok in zip(columns, usable) if ok]
+        grid1, grid2 = grid1[:, usable], grid2[:, usable]
+        
+        # 两批次合并估计中心和尺度后标准化（保留批次间的水平差异），各通道在代价中权重相同
+        pooled = np.vstack([grid1, grid2])
+        center = pooled.mean(axis=0)
+        scale = pooled.std(axis=0)
+        scale = np.where(scale > 0, scale, 1.0)
+        radius = int(np.ceil(band * max(len(grid1), len(grid2))))
+        path, total = dtw_path((grid1 - center) / scale, (grid2 - center) / scale, radius)
+        
+        rows1, rows2 = path[:, 0] * size, path[:, 1] * size
+        delta = grid2[path[:, 1]] - grid1[path[:, 0]]
+        overlap = min(len(grid1), len(grid2))
+        unaligned = grid2[:overlap] - grid1[:overlap]
+        
+        elapsed1 = ctx1.elapsed(time_col) if time_col else None
+        elapsed2 = ctx2.elapsed(time_col) if time_col else None
+        shift = rows2 - rows1
+        result = {
+            "analysis_type": "batch_alignment",
+            "batch1_name": batch1_name,
+            "batch2_name": batch2_name,
+            "rows": [int(len(matrix1)), int(len(matrix2))],
+            "bin_size": int(size),
+            "grid_points": [int(len(grid1)), int(len(grid2))],
+            "band_radius": int(radius),
+            "dtw_distance": float(np.sqrt(total / len(path) / len(columns))),  # 路径上每点每通道的标准化均方根差
+            "path": {batch1_name: rows1.tolist(), batch2_name: rows2.tolist()},
+            "row_shift": {"mean": float(shift.mean()), "min": int(shift.min()), "max": int(shift.max()),
+                          "final": int(shift[-1])},
+            "columns": {}
+        }
+        if elapsed1 is not None and elapsed2 is not None:
+            seconds1 = elapsed1[np.minimum(rows1, len(elapsed1) - 1)]
+            seconds2 = elapsed2[np.minimum(rows2, len(elapsed2) - 1)]
+            result["time_path"] = {batch1_name: seconds1.tolist(), batch2_name: seconds2.tolist()}
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)
+                result["time_shift_seconds"] = float(np.nanmean(seconds2 - seconds1))
+        
+        for j, col in enumerate(columns):
+            result["columns"][col] = {
+                "mean_delta": float(delta[:, j].mean()),
+                "rms_delta": float(np.sqrt(np.mean(delta[:, j] ** 2))),
+                "max_abs_delta": float(np.abs(delta[:, j]).max()),
+                "max_abs_delta_at": int(rows1[np.abs(delta[:, j]).argmax()]),
+                "unaligned_rms_delta": float(np.sqrt(np.mean(unaligned[:, j] ** 2))),
+                "delta": delta[:, j].tolist()
+            }
+        return result
+    
+    def _common_columns(self, batches, contexts, columns=None):
+        """各批次都存在的列；未指定时取所有批次都能数值化的列（保持第一个批次的列顺序）"""
+        if columns is None:
+            shared = set(contexts[0].columns)
+            for ctx in contexts[1:]:
+                shared &= set(ctx.columns)
+            columns = [col for col in contexts[0].columns if col in shared]
+        return [col for col in columns if all(col in df.columns for df, _ in batches)]
+    
+    def batch_anomaly_detection(self, batches, columns=None, top_k=3, score='mahalanobis', feature_count=5):
+        """
+        异常批次检测：以各批次每个通道的均值和标准差构成 (批次数 × 特征数) 矩阵，
+        计算稳健z分数（中位数/MAD）和基于收缩协方差的马氏距离，部分排序选出最异常的批次
+        
+        参数:
+            batches (list): [(DataFrame, 批次名), ...]
+            columns (list): 要分析的列名，None则取所有批次都能数值化的列
+            top_k (int): 返回最异常的批次数
+            score (str): 排名依据 'mahalanobis'（马氏距离，考虑通道间相关性）或 'robust'（平均绝对稳健z分数）
+            feature_count (int): 每个异常批次列出偏离最大的特征数
+            
+        返回:
+            dict: 各批次得分、前 top_k 个异常批次及其主要偏离特征
+        """
+        names = [name for _, name in batches]
+        contexts = [AnalysisContext(df, columns) for df, _ in batches]
+        columns = self._common_columns(batches, contexts, columns)
+        feature_names = [(col, stat) for col in columns for stat in ("mean", "std")]
+        
+        # 每个批次一遍统计，特征按 [列1均值, 列1标准差, 列2均值, ...] 排列
+        features = np.empty((len(batches), len(feature_names)))
+        for b, ctx in enumerate(contexts):
+            acc = StatsAccumulator(columns).update(ctx.stack(columns))
+            with np.errstate(invalid='ignore', divide='ignore'):
+                std = np.where(acc.count > 1, np.sqrt(acc.m2 / (acc.count - 1)), np.nan)
+            features[b, 0::2] = np.where(acc.count > 0, acc.mean, np.nan)
+            features[b, 1::2] = std
+        
+        robust_z = _robust_zscores(features)
+        robust_scores = np.abs(robust_z).mean(axis=1) if feature_names else np.zeros(len(batches))
+        distances, shrinkage = _mahalanobis_distances(robust_z)
+        scores = distances if score == 'mahalanobis' else robust_scores
+        
+        k = min(top_k, len(batches))
+        top = np.argpartition(-scores, k - 1)[:k] if 0 < k < len(batches) else np.arange(len(batches))
+        top = top[np.argsort(-scores[top], kind='stable')][:k]
+        
+        details = {}
+        for b in top:
+            deviation = np.abs(robust_z[b])
+            f = min(feature_count, len(feature_names))
+            strongest = np.argpartition(-deviation, f - 1)[:f] if 0 < f < len(feature_names) else np.arange(f)
+            strongest = strongest[np.argsort(-deviation[strongest], kind='stable')]
+            details[names[b]] = {
+                "robust_score": float(robust_scores[b]),
+                "mahalanobis_distance": float(distances[b]),
+                "top_features": [{
+                    "column": feature_names[i][0],
+                    "feature": feature_names[i][1],
+                    "value": float(features[b, i]),
+                    "robust_z": float(robust_z[b, i])
+                } for i in strongest]
+            }
+        
+        return {
+            "score_method": score,
+            "batch_names": names,
+            "scores": [float(x) for x in scores],
+            "robust_scores": [float(x) for x in robust_scores],
+            "mahalanobis_distances": [float(x) for x in distances],
+            "top_batches": [(names[b], float(scores[b])) for b in top],
+            "top_details": details,
+            "most_normal": names[int(np.argmin(scores))] if len(batches) else None,
+            "columns": columns,
+            "feature_count": len(feature_names),
+            "shrinkage": float(shrinkage)
+        }
+
+    # 批次指纹的逐通道特征（趋势取相关系数，与数据长度和量纲无关）
+    FINGERPRINT_FEATURES = ("mean", "std", "cv", "stability_index", "trend_r")
+
+    def batch_fingerprint(self, data, columns=None, time_col=None, window_size=10):
+        """
+        批次指纹：每个通道的均值、标准差、变异系数、稳定性指数和趋势相关系数，
+        一次堆叠矩阵后向量化计算，用于在历史批次中检索相似批次
+
         参数:
             data (DataFrame): 输入数据
             columns (list): 要分析的列名，None则分析所有数值列
+            time_col (str): 时间列名，不参与指纹计算
+            window_size (int): 稳定性指数的滚动窗口大小
+
+        返回:
+            dict: {列名: {特征名: 值}}，无法计算的特征为NaN，无有效值的列不输出
+        """
+        ctx = AnalysisContext(data, columns)
+        columns = [col for col in ctx.columns if col in ctx.data.columns and col != time_col]
+        if not columns:
+            return {}
+        matrix = ctx.stack(columns)
+        acc = StatsAccumulator(columns).update(matrix)
+        stability = self._matrix_stability(matrix, [window_size])[window_size]
+        trend = self._matrix_trend(matrix)
+
+        fingerprint = {}
+        for j, col in enumerate(columns):
+            n = int(acc.count[j])
+            if n == 0:
+                continue
+            mean = float(acc.mean[j])
+            std = float(np.sqrt(acc.m2[j] / (n - 1))) if n > 1 else float('nan')
+            fingerprint[col] = {
+                "mean": mean,
+                "std": std,
+                "cv": std / mean if mean != 0 else float('nan'),
+                "stability_index": stability[j]["stability_index"] if stability[j] else float('nan'),
+                "trend_r": trend[j]["correlation"] if trend[j] else float('nan')
+            }
+        return fingerprint
+
+    def multi_batch_comparison(self, batches, columns=None, alpha=0.05, block_size=256):
+        """
+        N 批次显著性对比：逐列单因素方差分析（ANOVA）与 Kruskal-Wallis 检验，
+        以及批次两两之间的 Welch t 检验 p 值与 Cohen's d 矩阵
+        
+        参数:
+            batches (list): [(DataFrame, 批次名), ...]
+            columns (list): 要对比的列名，None则取所有批次都能数值化的列
+            alpha (float): 显著性水平；两两比较按 Bonferroni 校正为 alpha / 比较次数
+            block_size (int): 每次合并排序的列数，控制秩检验的内存占用
             
         返回:
-            dict: 统计结果
+            dict: {"batch_names", "alpha", "pairwise_alpha", "comparison": {列名: 检验结果与两两矩阵}}
         """
-        if columns is None:
-            # 自动选择数值列，排除无名列和完全缺失的列
-            numeric_cols = []
-            for col in data.columns:
-                # 跳过无名列
-                if col.startswith('Unnamed:'):
-                    continue
-                # 检查是否为数值列且有有效数据
-                try:
-                    series = pd.to_numeric(data[col], errors='coerce').dropna()
-                    if len(series) > 0:
-                        numeric_cols.append(col)
-                except:
-                    continue
-        else:
-            numeric_cols = columns
+        names = [name for _, name in batches]
+        contexts = [AnalysisContext(df, columns) for df, _ in batches]
+        columns = self._common_columns(batches, contexts, columns)
         
-        results = {}
-        for col in numeric_cols:
-            if col in data.columns:
-                series = pd.to_numeric(data[col], errors='coerce').dropna()
-                if len(series) > 0:
-                    results[col] = {
-                        "count": len(series),
-                        "mean": float(series.mean()),
-                        "std": float(series.std()),
-                        "min": float(series.min()),
-                        "max": float(series.max()),
-                        "median": float(series.median()),
-                        "cv": float(series.std() / series.mean()) if series.mean() != 0 else 0,  # 变异系数
-                        "q25": float(series.quantile(0.25)),
-                        "q75": float(series.quantile(0.75))
+        groups = len(batches)
+        pair_count = groups * (groups - 1) // 2
+        pairwise_alpha = alpha / pair_count if pair_count else alpha
+        results = {
+            "analysis_type": "multi_batch_significance",
+            "batch_names": names,
+            "alpha": alpha,
+            "pairwise_alpha": pairwise_alpha,
+            "comparison": {}
+        }
+        
+        for start in range(0, len(columns), block_size):
+            block = columns[start:start + block_size]
+            # 各批次对本块列只数值化/堆叠一次，统计量与秩检验共用
+            matrices = [ctx.stack(block) for ctx in contexts]
+            accumulators = [StatsAccumulator(block).update(matrix) for matrix in matrices]
+            count = np.array([acc.count for acc in accumulators], dtype=float)  # (批次数 × 列数)
+            mean = np.array([acc.mean for acc in accumulators])
+            m2 = np.array([acc.m2 for acc in accumulators])
+            with np.errstate(invalid='ignore', divide='ignore'):
+                var = np.where(count > 1, m2 / (count - 1), np.nan)
+            
+            anova = _one_way_anova(count, mean, m2)
+            kruskal = _kruskal_wallis(np.concatenate(matrices), [len(matrix) for matrix in matrices])
+            
+            # 两两比较：(批次数 × 批次数 × 列数)
+            p_matrix = _welch_ttest(mean[:, None], var[:, None], count[:, None],
+                                    mean[None, :], var[None, :], count[None, :])[1]
+            d_matrix = _cohens_d(mean[:, None], var[:, None], count[:, None],
+                                 mean[None, :], var[None, :], count[None, :])
+            diagonal = np.arange(groups)
+            p_matrix[diagonal, diagonal] = 1.0
+            d_matrix[diagonal, diagonal] = 0.0
+            
+            for j, col in enumerate(block):
+                present = count[:, j] > 0
+                if present.sum() < 2:
+                    continue
+                p_values = p_matrix[:, :, j]
+                results["comparison"][col] = {
+                    "batch_means": [float(x) for x in mean[:, j]],
+                    "batch_stds": [float(x) for x in np.sqrt(var[:, j])],
+                    "batch_counts": [int(x) for x in count[:, j]],
+                    "anova": {
+                        "f_statistic": float(anova[0][j]),
+                        "p_value": float(anova[1][j]),
+                        "significant": bool(anova[1][j] < alpha)
+                    },
+                    "kruskal_wallis": {
+                        "h_statistic": float(kruskal[0][j]),
+                        "p_value": float(kruskal[1][j]),
+                        "significant": bool(kruskal[1][j] < alpha)
+                    },
+                    "pairwise": {
+                        "p_value": p_values.tolist(),
+                        "cohens_d": d_matrix[:, :, j].tolist(),
+                        "significant": (p_values < pairwise_alpha).tolist()
                     }
+                }
         
         return results
     
-    def stability_analysis(self, data, columns=None, window_size=10):
+    def comprehensive_analysis(self, data, columns=None, time_col=None, workers=1):
         """
-        稳定性分析
+        综合分析：整合所有分析功能
         
         参数:
             data (DataFrame): 输入数据
             columns (list): 要分析的列名
-            window_size (int): 滚动窗口大小
+            time_col (str): 时间列名
+            workers (int): 并行工作进程数，1为单进程
             
         返回:
-            dict: 稳定性指标
+            dict: 综合分析结果
         """
-        if columns is None:
-            # 自动选择数值列，排除无名列和完全缺失的列
-            numeric_cols = []
-            for col in data.columns:
-                if col.startswith('Unnamed:'):
-                    continue
-                try:
-                    series = pd.to_numeric(data[col], errors='coerce').dropna()
-                    if len(series) > 0:
-                        numeric_cols.append(col)
-                except:
-                    continue
-        else:
-            numeric_cols = columns
+        # 只构建一次分析上下文，各分析段共享数值化结果，摘要直接复用已算出的逐列结果
+        ctx = AnalysisContext(data, columns, workers)
         
-        results = {}
-        for col in numeric_cols:
-            if col in data.columns:
-                series = pd.to_numeric(data[col], errors='coerce').dropna()
-                if len(series) > window_size:
-                    # 滚动标准差
-                    rolling_std = series.rolling(window=window_size).std()
-                    
-                    # 稳定性指标
-                    stability_index = 1 / (1 + rolling_std.mean()) if rolling_std.mean() > 0 else 1
-                    
-                    # 变化率分析
-                    pct_change = series.pct_change().dropna()
-                    
-                    results[col] = {
-                        "stability_index": float(stability_index),
-                        "rolling_std_mean": float(rolling_std.mean()),
-                        "rolling_std_max": float(rolling_std.max()),
-                        "max_change_rate": float(abs(pct_change).max()) if len(pct_change) > 0 else 0,
-                        "avg_change_rate": float(abs(pct_change).mean()) if len(pct_change) > 0 else 0,
-                        "stable_periods": int(sum(rolling_std < rolling_std.mean())),  # 稳定周期数
-                        "stability_rating": self._get_stability_rating(stability_index)
-                    }
+        results = self._section_analysis(ctx, time_col)
+        results["data_quality"] = self._assess_data_quality(data, columns, ctx)
+        results["summary"] = self._generate_summary(data, columns, ctx)
         
         return results
     
-    def trend_analysis(self, data, columns=None, time_col=None):
+    def section_analysis(self, data, columns=None, time_col=None, workers=1):
         """
-        趋势分析
+        只计算统计、稳定性、趋势、异常四个分析段（不含数据质量与摘要），用于多批次指标汇总
+        
+        参数同 comprehensive_analysis
+        
+        返回:
+            dict: basic_statistics / stability_analysis / trend_analysis / outlier_detection
+        """
+        return self._section_analysis(AnalysisContext(data, columns, workers), time_col)
+    
+    def _section_analysis(self, ctx, time_col=None):
+        # 待分析列只堆叠一次，各分析段从同一矩阵按列切取
+        ctx.matrix
+        return {
+            "basic_statistics": self._basic_statistics(ctx, ctx.columns),
+            "stability_analysis": self._stability_analysis(ctx, ctx.columns),
+            "trend_analysis": self._trend_analysis(ctx, ctx.columns, time_col),
+            "outlier_detection": self._outlier_detection(ctx, ctx.columns)
+        }
+    
+    def streaming_accumulate(self, chunks, columns=None, time_col=None, quantile_error=None):
+        """
+        把数据块逐个累加到流式统计累加器中，不保留原始数据
+
+        参数:
+            chunks (iterable): DataFrame 数据块（如 csv_reader.read_csv_chunks 的输出）
+            columns (list): 要分析的列名，None则按首个数据块自动选择
+            time_col (str): 时间列名，不参与趋势分析；首个数据块可解析时，趋势以相对首个有效时间经过的秒数为横坐标
+                            （与 trend_analysis 一致），否则以行号为横坐标
+            quantile_error (float): 不为None时同时维护分位数草图，值为归一化秩误差上界
+            
+        返回:
+            tuple: (StatsAccumulator, TrendAccumulator, ColumnSketches或None, 数据块数)，
+                   可与其他工作进程按文件顺序得到的累加器合并
+        """
+        stats_acc = trend_acc = sketches = None
+        time_kind = origin = None
+        chunk_count = 0
+        for chunk in chunks:
+            if stats_acc is None:
+                candidates = columns if columns is not None else [
+                    col for col in chunk.columns if not col.startswith('Unnamed:')
+                ]
+                target = []
+                for col in candidates:
+                    if col not in chunk.columns:
+                        continue
+                    try:
+                        pd.to_numeric(chunk[col], errors='coerce')
+                        target.append(col)
+                    except:
+                        continue
+                stats_acc = StatsAccumulator(target)
+                trend_acc = TrendAccumulator([col for col in target if col != time_col])
+                if quantile_error is not None:
+                    sketches = ColumnSketches(target, quantile_error)
+                if time_col and time_col in chunk.columns:
+                    time_kind = parse_time(chunk[time_col])[0]
+            ctx = AnalysisContext(chunk, stats_acc.columns)
+            matrix = ctx.stack(stats_acc.columns)
+            stats_acc.update(matrix)
+            x = None
+            if time_kind is not None:
+                x, origin = _chunk_elapsed(chunk[time_col], time_kind, origin)
+            trend_acc.update(ctx.stack(trend_acc.columns), x)
+            if sketches is not None:
+                sketches.update(matrix)
+            chunk_count += 1
+        
+        if stats_acc is None:
+            stats_acc, trend_acc = StatsAccumulator([]), TrendAccumulator([])
+            if quantile_error is not None:
+                sketches = ColumnSketches([], quantile_error)
+        return stats_acc, trend_acc, sketches, chunk_count
+    
+    def streaming_analysis(self, chunks, columns=None, time_col=None, quantile_error=None):
+        """
+        流式分析：逐块计算基础统计与趋势，内存占用与文件大小无关
         
         参数:
-            data (DataFrame): 输入数据
+            chunks (iterable): DataFrame 数据块
             columns (list): 要分析的列名
-            time_col (str): 时间列名，如果为None则使用索引
+            time_col (str): 时间列名
+            quantile_error (float): 不为None时用草图近似给出 median/q25/q75
             
         返回:
-            dict: 趋势分析结果
+            dict: 与内存分析结构一致的 basic_statistics 与 trend_analysis
+                  （未指定 quantile_error 时不含分位数）
         """
-        if columns is None:
-            # 自动选择数值列，排除无名列和完全缺失的列
-            numeric_cols = []
-            for col in data.columns:
-                if col.startswith('Unnamed:'):
-                    continue
-                try:
-                    series = pd.to_numeric(data[col], errors='coerce').dropna()
-                    if len(series) > 0:
-                        numeric_cols.append(col)
-                except:
-                    continue
-        else:
-            numeric_cols = columns
+        stats_acc, trend_acc, sketches, chunk_count = self.streaming_accumulate(
+            chunks, columns, time_col, quantile_error)
+        statistics = stats_acc.result()
+        if sketches is not None:
+            q25, medians, q75 = sketches.quantiles([0.25, 0.5, 0.75])
+            for j, col in enumerate(sketches.columns):
+                if col in statistics:
+                    statistics[col].update({
+                        "median": float(medians[j]),
+                        "q25": float(q25[j]),
+                        "q75": float(q75[j]),
+                        "quantile_mode": "approx",
+                        "quantile_rank_error": float(sketches.rank_error)
+                    })
+        return {
+            "basic_statistics": statistics,
+            "trend_analysis": trend_acc.result(),
+            "rows_processed": int(stats_acc.rows),
+            "chunks_processed": chunk_count
+        }
+    
+    def spectral_analysis(self, data, columns=None, time_col=None, sample_rate=None, nperseg=1024,
+                          bands=None, peak_count=5, chunk_rows=1 << 18):
+        """
+        频谱分析：逐通道 Welch 功率谱密度、主频、频带能量与 RMS
         
-        results = {}
+        所有通道组成的矩阵按 chunk_rows 行分块送入 SpectrumAccumulator，分段做批量 FFT，
+        工作内存与数据长度无关，结果与整段计算一致
         
-        # 准备时间序列
-        if time_col and time_col in data.columns:
-            try:
-                time_series = pd.to_datetime(data[time_col])
-                x_values = np.arange(len(time_series))
-            except:
-                x_values = np.arange(len(data))
-        else:
-            x_values = np.arange(len(data))
-        
-        for col in numeric_cols:
-            if col in data.columns and col != time_col:
-                series = pd.to_numeric(data[col], errors='coerce').dropna()
-                if len(series) > 2:
-                    # 对齐x和y的长度
-                    min_len = min(len(x_values), len(series))
-                    x = x_values[:min_len]
-                    y = series.iloc[:min_len]
-                    
-                    # 线性回归分析
-                    try:
-                        slope, intercept, r_value, p_value, std_err = linregress(x, y)
-                        
-                        # 趋势判断
-                        trend_direction = "上升" if slope > 0 else "下降" if slope < 0 else "平稳"
-                        trend_strength = "强" if abs(r_value) > 0.7 else "中等" if abs(r_value) > 0.3 else "弱"
-                        
-                        results[col] = {
-                            "slope": float(slope),
-                            "intercept": float(intercept),
-                            "r_squared": float(r_value ** 2),
-                            "correlation": float(r_value),
-                            "p_value": float(p_value),
-                            "trend_direction": trend_direction,
-                            "trend_strength": trend_strength,
-                            "is_significant": bool(p_value < 0.05),
-                            "relative_change": float((series.iloc[-1] - series.iloc[0]) / series.iloc[0] * 100) if series.iloc[0] != 0 else 0
-                        }
-                    except Exception as e:
-                        results[col] = {"error": f"趋势分析失败: {str(e)}"}
+        参数:
+            data (DataFrame): 输入数据
+            columns (list): 要分析的列名，None则分析所有数值列
+            time_col (str): 时间列名，不参与分析；未给出 sample_rate 时由其采样间隔推断采样率
+            sample_rate (float): 采样率（Hz），None则由时间列推断，无法推断时频率单位为 周期/点
+            nperseg (int): Welch 分段长度（重叠一半），数据不足一段时取数据长度
+            bands (list): 频带 [[下限, 上限], ...]（Hz），None则按奈奎斯特频率划分倍频程频带
+            peak_count (int): 每个通道输出的主频个数
+            chunk_rows (int): 每次送入累加器的行数
+            
+        返回:
+            dict: 频率轴、各通道功率谱（供绘图）及逐通道 rms/主频/频带能量
+        """
+        ctx = AnalysisContext(data, columns)
+        columns = [col for col in ctx.columns if col in ctx.data.columns and col != time_col]
+        sample_rate, source = self._resolve_sample_rate(sample_rate, ctx.elapsed(time_col) if time_col else None)
         
-        return results
+        matrix = ctx.stack(columns)
+        spectrum = SpectrumAccumulator(columns, nperseg)
+        stats_acc = StatsAccumulator(columns)
+        for start in range(0, max(len(matrix), 1), chunk_rows):
+            block = matrix[start:start + chunk_rows]
+            spectrum.update(block)
+            stats_acc.update(block)
+        return self._spectral_result(spectrum, stats_acc, sample_rate, source, bands, peak_count)
     
-    def outlier_detection(self, data, columns=None, method='iqr', threshold=1.5):
+    def streaming_spectral_analysis(self, chunks, columns=None, time_col=None, sample_rate=None, nperseg=1024,
+                                    bands=None, peak_count=5):
         """
-        异常值检测
+        流式频谱分析：逐个数据块累加 Welch 周期图，块间保留不足一段的尾部，内存占用与文件大小无关
+        
+        参数:
+            chunks (iterable): DataFrame 数据块（如 csv_reader.read_csv_chunks 的输出）
+            其余参数同 spectral_analysis；采样率由首个数据块的时间列推断
+            
+        返回:
+            dict: 与 spectral_analysis 结构一致，另含 chunks_processed
+        """
+        spectrum = stats_acc = None
+        chunk_count = 0
+        for chunk in chunks:
+            ctx = AnalysisContext(chunk, columns if spectrum is None else spectrum.columns)
+            if spectrum is None:
+                target = [col for col in ctx.columns if col in chunk.columns and col != time_col]
+                spectrum = SpectrumAccumulator(target, nperseg)
+                stats_acc = StatsAccumulator(target)
+                sample_rate, source = self._resolve_sample_rate(sample_rate, ctx.elapsed(time_col) if time_col else None)
+            matrix = ctx.stack(spectrum.columns)
+            spectrum.update(matrix)
+            stats_acc.update(matrix)
+            chunk_count += 1
+        if spectrum is None:
+            spectrum, stats_acc = SpectrumAccumulator([], nperseg), StatsAccumulator([])
+            sample_rate, source = self._resolve_sample_rate(sample_rate, None)
+        result = self._spectral_result(spectrum, stats_acc, sample_rate, source, bands, peak_count)
+        result["chunks_processed"] = chunk_count
+        return result
+    
+    def _resolve_sample_rate(self, sample_rate, elapsed):
+        """确定采样率：参数优先，其次为时间列相邻采样间隔的中位数，否则为1（频率单位 周期/点）"""
+        if sample_rate:
+            return float(sample_rate), "argument"
+        if elapsed is not None:
+            steps = np.diff(elapsed[~np.isnan(elapsed)])
+            steps = steps[steps > 0]
+            if len(steps):
+                return float(1.0 / np.median(steps)), "time_column"
+        return 1.0, "default"
+    
+    def _spectral_result(self, spectrum, stats_acc, sample_rate, source, bands, peak_count):
+        """由累加器整理频谱分析结果"""
+        freqs, psd = spectrum.result(sample_rate)
+        resolution = float(freqs[1] - freqs[0]) if len(freqs) > 1 else 0.0
+        nyquist = sample_rate / 2
+        if bands is None:
+            # 倍频程频带：[0, fN/32), [fN/32, fN/16), ..., [fN/2, fN]
+            edges = [0.0] + [nyquist / 2 ** i for i in range(5, -1, -1)]
+            bands = list(zip(edges[:-1], edges[1:]))
+        band_masks = [(freqs >= lo) & ((freqs < hi) if hi < nyquist else (freqs <= hi)) for lo, hi in bands]
+        total_energy = psd.sum(axis=0) * resolution
+        band_energy = np.array([psd[mask].sum(axis=0) * resolution for mask in band_masks]).reshape(len(bands), -1)
+        peaks, is_peak = _spectral_peaks(psd, peak_count)
+        
+        channels = {}
+        for j, col in enumerate(spectrum.columns):
+            n = int(stats_acc.count[j])
+            if n == 0:
+                continue
+            channels[col] = {
+                "mean": float(stats_acc.mean[j]),
+                "rms": float(np.sqrt(stats_acc.m2[j] / n)),  # 去均值后的时域 RMS
+                "psd_rms": float(np.sqrt(total_energy[j])),  # 功率谱积分得到的 RMS
+                "dominant_frequencies": [
+                    {"frequency": float(freqs[i]), "psd": float(psd[i, j])}
+                    for i, ok in zip(peaks[:, j], is_peak[:, j]) if ok
+                ],
+                "band_energy": [
+                    {"band": [float(lo), float(hi)], "energy": float(band_energy[b, j]),
+                     "ratio": float(band_energy[b, j] / total_energy[j]) if total_energy[j] > 0 else 0.0}
+                    for b, (lo, hi) in enumerate(bands)
+                ]
+            }
+        
+        return {
+            "analysis_type": "spectral",
+            "sample_rate": float(sample_rate),
+            "sample_rate_source": source,
+            "frequency_unit": "周期/点" if source == "default" else "Hz",
+            "nperseg": int(spectrum.segment_length),
+            "segments": int(spectrum.segments or (1 if len(freqs) else 0)),
+            "frequency_resolution": resolution,
+            "rows_processed": int(stats_acc.rows),
+            "frequencies": freqs.tolist(),
+            "spectra": {col: psd[:, j].tolist() for j, col in enumerate(spectrum.columns) if col in channels},
+            "channels": channels
+        }
+    
+    def change_point_detection(self, data, columns=None, time_col=None, model='linear', penalty=None,
+                               min_size=None, max_change_points=20):
+        """
+        变点检测：把热真空等分阶段试验的序列切分为保温平台、升降温等若干段，逐段给出统计量，
+        避免稳定性、趋势指标跨阶段平均
+        
+        多通道联合二分切分（binary segmentation）：各通道按噪声水平标准化后，每次在残差平方和
+        下降最多的区间切分，残差由累加和向量化算出，总代价 O(n log n × 通道数)；
+        切分完成后每个变点在相邻变点之间重新定位，去掉贪心切分留下的错位变点
         
         参数:
             data (DataFrame): 输入数据
-            columns (list): 要分析的列名
-            method (str): 检测方法 'iqr' 或 'zscore'
-            threshold (float): 阈值
+            columns (list): 参与检测的列名，None则为所有数值列
+            time_col (str): 时间列名，不参与检测；可解析时输出各段起止时间，斜率按每秒计
+            model (str): 'linear' 每段拟合直线（平台与升降温段），'mean' 每段拟合常数（均值突变）
+            penalty (float): 新增一个变点所需的最小残差下降（标准化单位），
+                             None 为 BIC：(每段参数数 × 通道数 + 1) × ln(行数)
+            min_size (int): 每段最少行数，None 为 max(5, 行数 // 1000)
+            max_change_points (int): 变点数上限，超过时只保留残差下降最大的
             
         返回:
-            dict: 异常检测结果
+            dict: 变点（位置、时间、残差下降、各通道贡献占比）与分段统计（均值/标准差/极值/斜率/阶段类型）
         """
-        if columns is None:
-            # 自动选择数值列，排除无名列和完全缺失的列
-            numeric_cols = []
-            for col in data.columns:
-                if col.startswith('Unnamed:'):
-                    continue
-                try:
-                    series = pd.to_numeric(data[col], errors='coerce').dropna()
-                    if len(series) > 0:
-                        numeric_cols.append(col)
-                except:
+        if model not in ('linear', 'mean'):
+            raise ValueError(f"❌ 未知变点模型: {model}")
+        linear = model == 'linear'
+        ctx = AnalysisContext(data, columns)
+        columns = [col for col in ctx.columns if col in ctx.data.columns and col != time_col]
+        raw = ctx.stack(columns)
+        present = (~np.isnan(raw)).any(axis=0)
+        columns = [col for col, ok in zip(columns, present) if ok]
+        raw = raw[:, present]
+        n = len(raw)
+        min_size = max(int(min_size) if min_size else max(5, n // 1000), 3 if linear else 2)
+        if penalty is None:
+            penalty = ((2 if linear else 1) * len(columns) + 1) * np.log(max(n, 2))
+        penalty = float(penalty)
+        
+        # 二分切分：堆中保存各区间的最优切分，每次取残差下降最大的一个
+        signal = _noise_standardize(raw)
+        heap, found = [], []
+        
+        def push(a, b):
+            split = _best_split(signal[a:b], min_size, linear) if columns else None
+            if split is not None and split[0] > penalty:
+                heapq.heappush(heap, (-split[0], a + split[1], a, b))
+        
+        push(0, n)
+        while heap and len(found) < max_change_points:
+            gain, cut, a, b = heapq.heappop(heap)
+            found.append((cut, -gain))
+            push(a, cut)
+            push(cut, b)
+        found = _refine_change_points(signal, [item[0] for item in found], min_size, linear, penalty)
+        
+        kind, times = ctx.time(time_col) if time_col else (None, None)
+        elapsed = None if kind is None else elapsed_seconds(kind, times)
+        
+        def time_of(positions):
+            return format_times(kind, times[positions]) if kind is not None else [int(p) for p in positions]
+        
+        change_points = []
+        for (cut, gain, a, b), label in zip(found, time_of([item[0] for item in found])):
+            # 各通道对该变点的贡献：该通道单独的残差下降占比
+            channel_gain = np.array([
+                _prefix_costs(signal[a:b, j], linear)[-1] - _prefix_costs(signal[a:cut, j], linear)[-1]
+                - _prefix_costs(signal[cut:b, j], linear)[-1] for j in range(len(columns))
+            ])
+            total = channel_gain.sum()
+            change_points.append({
+                "position": int(cut),
+                "time": label,
+                "gain": float(gain),
+                "contributions": {col: float(channel_gain[j] / total) if total > 0 else 0.0
+                                  for j, col in enumerate(columns)}
+            })
+        
+        bounds = np.array([0] + [item[0] for item in found] + [n], dtype=np.intp)
+        starts, ends = bounds[:-1], bounds[1:]
+        segments = [{
+            "segment": i + 1,
+            "start": int(start),
+            "end": int(end),
+            "rows": int(end - start),
+            "start_time": start_label,
+            "end_time": end_label,
+            "duration": (float(elapsed[end - 1] - elapsed[start]) if elapsed is not None else int(end - start)),
+            "channels": {}
+        } for i, (start, end, start_label, end_label)
+            in enumerate(zip(starts, ends, time_of(starts), time_of(ends - 1))) if end > start]
+        if segments:
+            self._segment_statistics(raw, columns, starts, elapsed, segments)
+        
+        return {
+            "analysis_type": "change_point",
+            "model": model,
+            "penalty": penalty,
+            "min_size": int(min_size),
+            "rows_processed": int(n),
+            "time_column": time_col if kind is not None else None,
+            "slope_unit": "每秒" if elapsed is not None else "每行",
+            "change_points": change_points,
+            "segments": segments
+        }
+    
+    def _segment_statistics(self, raw, columns, starts, elapsed, segments):
+        """
+        分段统计：各段在行方向上连续，用 reduceat 对所有段一次完成分组聚合
+        
+        斜率为段内最小二乘直线（横坐标为经过秒数或行号）；段内首尾变化量不超过
+        max(3 × 拟合残差标准差, 5% × 通道全程极差) 时记为 平台，否则为 上升/下降
+        """
+        lengths = np.diff(np.append(starts, len(raw)))
+        t_all = elapsed if elapsed is not None else np.arange(len(raw), dtype=float)
+        # 以各段最小值为原点，减小平方和的舍入误差
+        t_origin = np.fmin.reduceat(t_all, starts)
+        t_local = t_all - np.repeat(t_origin, lengths)
+        
+        for j, col in enumerate(columns):
+            x = raw[:, j]
+            valid = ~np.isnan(x) & ~np.isnan(t_local)
+            lows, highs = np.fmin.reduceat(x, starts), np.fmax.reduceat(x, starts)
+            x_local = np.where(valid, x - np.repeat(np.nan_to_num(lows), lengths), 0.0)
+            t = np.where(valid, t_local, 0.0)
+            count = np.add.reduceat(valid.astype(np.int64), starts)
+            sx, sxx = np.add.reduceat(x_local, starts), np.add.reduceat(x_local * x_local, starts)
+            st, stt = np.add.reduceat(t, starts), np.add.reduceat(t * t, starts)
+            stx = np.add.reduceat(t * x_local, starts)
+            t_span = np.fmax.reduceat(np.where(valid, t_local, np.nan), starts) - \
+                     np.fmin.reduceat(np.where(valid, t_local, np.nan), starts)
+            channel_range = np.nanmax(x) - np.nanmin(x)
+            
+            with np.errstate(invalid='ignore', divide='ignore'):
+                safe = np.maximum(count, 1)
+                mean = lows + sx / safe
+                centered_xx = np.maximum(sxx - sx * sx / safe, 0.0)
+                std = np.sqrt(centered_xx / np.maximum(count - 1, 1))
+                centered_tt = stt - st * st / safe
+                centered_tx = stx - st * sx / safe
+                slope = np.where(centered_tt > 0, centered_tx / np.where(centered_tt > 0, centered_tt, 1.0), 0.0)
+                residual = np.sqrt(np.maximum(centered_xx - slope * centered_tx, 0.0) / np.maximum(count - 2, 1))
+                change = slope * np.nan_to_num(t_span)
+            
+            for segment, i in zip(segments, range(len(starts))):
+                if count[i] == 0:
                     continue
+                flat = abs(change[i]) <= max(3 * residual[i], 0.05 * channel_range)
+                segment["channels"][col] = {
+                    "count": int(count[i]),
+                    "mean": float(mean[i]),
+                    "std": float(std[i]) if count[i] > 1 else 0.0,
+                    "min": float(lows[i]),
+                    "max": float(highs[i]),
+                    "cv": float(std[i] / abs(mean[i])) if count[i] > 1 and mean[i] != 0 else 0.0,
+                    "slope": float(slope[i]),
+                    "change": float(change[i]),
+                    "phase": "平台" if flat else ("上升" if change[i] > 0 else "下降")
+                }
+        return segments
+    
+    def correlation_analysis(self, data, columns=None, time_col=None, top_k=10, precision='float64',
+                             lag_pairs=None, max_lag=None):
+        """
+        通道间相关与滞后分析
+        
+        相关矩阵由标准化（减均值、缺失记0）后的数值矩阵一次矩阵乘法得到；有缺失值时分母也由
+        矩阵乘法按两列同时有效的行计算（成对有效，均值取各列全体有效值）。500+ 通道时只输出
+        |r| 最大的 top_k 对，滞后由 FFT 互相关一次得到全部滞后
+        
+        参数:
+            data (DataFrame): 输入数据
+            columns (list): 要分析的列名，None则为所有数值列
+            time_col (str): 时间列名，不参与相关；可解析时滞后同时给出秒数
+            top_k (int): 输出相关性最强的通道对数
+            precision (str): 'float64' 或 'float32'（宽矩阵时内存与计算量减半，相关系数误差约1e-6）
+            lag_pairs (list): 估计滞后的通道对 [[列1, 列2], ...]，None则为 top_k 对
+            max_lag (int): 最大滞后行数，None则为行数的1/4
+            
+        返回:
+            dict: 相关矩阵、最强通道对及各通道对的最佳滞后
+        """
+        if precision not in ('float64', 'float32'):
+            raise ValueError(f"❌ 未知计算精度: {precision}")
+        dtype = np.float32 if precision == 'float32' else np.float64
+        ctx = AnalysisContext(data, columns)
+        columns = [col for col in ctx.columns if col in ctx.data.columns and col != time_col]
+        matrix = ctx.stack(columns)
+        valid = ~np.isnan(matrix)
+        n = len(matrix)
+        
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(valid, matrix, 0.0).sum(axis=0) / valid.sum(axis=0)
+        centered = np.where(valid, matrix - mean, 0.0).astype(dtype, order='F')
+        del matrix
+        numerator = centered.T @ centered
+        if valid.all():
+            energy = np.diag(numerator)
+            denominator = np.sqrt(np.outer(energy, energy))
+            overlap = np.full(numerator.shape, n)
         else:
-            numeric_cols = columns
+            # energy[i, j] = 第 i 列在两列同时有效的行上的平方和
+            mask = valid.astype(dtype, order='F')
+            energy = (centered * centered).T @ mask
+            denominator = np.sqrt(energy * energy.T)
+            overlap = np.rint(mask.T @ mask).astype(np.int64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = np.clip(np.where(denominator > 0, numerator / denominator, np.nan), -1.0, 1.0).astype(float)
         
-        results = {}
+        top_rows, top_cols = _top_pairs(corr, top_k)
+        top_pairs = [{
+            "pair": [columns[i], columns[j]],
+            "correlation": float(corr[i, j]),
+            "overlap": int(overlap[i, j])
+        } for i, j in zip(top_rows, top_cols)]
         
-        for col in numeric_cols:
-            if col in data.columns:
-                series = pd.to_numeric(data[col], errors='coerce').dropna()
-                if len(series) > 0:
-                    outliers = []
-                    outlier_indices = []
-                    
-                    if method == 'iqr':
-                        Q1 = series.quantile(0.25)
-                        Q3 = series.quantile(0.75)
-                        IQR = Q3 - Q1
-                        lower_bound = Q1 - threshold * IQR
-                        upper_bound = Q3 + threshold * IQR
-                        
-                        outlier_mask = (series < lower_bound) | (series > upper_bound)
-                        outliers = series[outlier_mask].tolist()
-                        outlier_indices = series[outlier_mask].index.tolist()
-                        
-                    elif method == 'zscore':
-                        z_scores = np.abs(stats.zscore(series))
-                        outlier_mask = z_scores > threshold
-                        outliers = series[outlier_mask].tolist()
-                        outlier_indices = series[outlier_mask].index.tolist()
-                    
-                    results[col] = {
-                        "outlier_count": len(outliers),
-                        "outlier_percentage": float(len(outliers) / len(series) * 100),
-                        "outlier_values": [float(x) for x in outliers[:10]],  # 最多显示10个
-                        "outlier_indices": [int(x) for x in outlier_indices[:10]],
-                        "method": method,
-                        "threshold": threshold
-                    }
+        # 滞后：FFT 互相关，滞后秒数按时间列的采样间隔中位数换算
+        position = {col: j for j, col in enumerate(columns)}
+        if lag_pairs is None:
+            pairs = list(zip(top_rows.tolist(), top_cols.tolist()))
+        else:
+            pairs = [(position[a], position[b]) for a, b in lag_pairs
+                     if a in position and b in position and a != b]
+        max_lag = min(int(max_lag) if max_lag is not None else n // 4, max(n - 1, 0))
+        step = None
+        elapsed = ctx.elapsed(time_col) if time_col else None
+        if elapsed is not None:
+            steps = np.diff(elapsed[~np.isnan(elapsed)])
+            steps = steps[steps > 0]
+            step = float(np.median(steps)) if len(steps) else None
         
-        return results
+        lags = []
+        if pairs and n > 1:
+            lag_values, xcorrs = _lag_correlations(centered, pairs, max_lag)
+            for i, j in pairs:
+                xcorr = xcorrs[(i, j)]
+                if np.isnan(xcorr).all():
+                    continue
+                best = int(np.nanargmax(np.abs(xcorr)))
+                lag = int(lag_values[best])
+                lags.append({
+                    "pair": [columns[i], columns[j]],
+                    "lag": lag,
+                    "lag_seconds": lag * step if step is not None else None,
+                    "correlation_at_lag": float(xcorr[best]),
+                    "zero_lag_correlation": float(xcorr[max_lag])
+                })
+        
+        return {
+            "analysis_type": "correlation",
+            "columns": columns,
+            "rows_processed": int(n),
+            "precision": precision,
+            "max_lag": int(max_lag),
+            "sample_interval": step,
+            "matrix": np.where(np.isnan(corr), None, np.round(corr, 6)).tolist(),
+            "top_pairs": top_pairs,
+            "lags": lags
+        }
+    
+    # SPC 判异规则：连续同侧点数、连续单调点数
+    SPC_RUN_LENGTH = 9
+    SPC_TREND_LENGTH = 6
     
-    def batch_comparison(self, data1, data2, columns=None, batch1_name="批次1", batch2_name="批次2"):
+    def spc_analysis(self, batches, columns=None, spec_limits=None, ewma_lambda=0.2, ewma_width=3.0,
+                     cusum_k=0.5, cusum_h=5.0, baseline_batches=None, alarm_tolerance=0.05):
         """
-        批次间对比分析
+        统计过程控制（SPC）：所有批次按顺序首尾相接构成一条控制图序列，对所有通道一次计算
+        EWMA、CUSUM 控制图、判异规则和过程能力指数 Cp/Cpk，并按批次汇总报警
+        
+        EWMA 递推由 lfilter 一次完成；CUSUM 的 max(0, ·) 递推用累加和减去前缀最小值的闭式解；
+        连续同侧、连续单调规则用累计计数求连续长度，全部为整列向量运算
         
         参数:
-            data1, data2 (DataFrame): 两个批次的数据
-            columns (list): 要对比的列名
-            batch1_name, batch2_name (str): 批次名称
+            batches (list): [(DataFrame, 批次名), ...]，按生产顺序排列
+            columns (list): 要分析的列名，None则取所有批次都能数值化的列
+            spec_limits (dict): 规格限 {列名: {"lsl": 下限, "usl": 上限, "target": 目标值}} 或 {列名: [下限, 上限]}，
+                                缺少的一侧为 None；给出 target 时以其为中心线
+            ewma_lambda (float): EWMA 平滑系数 λ
+            ewma_width (float): EWMA 控制限宽度 L（σ 的倍数）
+            cusum_k (float): CUSUM 参考值 k（σ 的倍数）
+            cusum_h (float): CUSUM 决策区间 h（σ 的倍数）
+            baseline_batches (int): 估计中心线和 σ 的基准批次数（前若干批次），None则用全部批次
+            alarm_tolerance (float): 批次内处于 EWMA/CUSUM 报警状态的点数比例超过该值时判为失控
+                                     （逐点控制图在长序列上总有少量误报，不能以出现报警为准）
             
         返回:
-            dict: 对比分析结果
+            dict: 逐通道的中心线、σ、控制限、报警统计、过程能力以及逐批次汇总
         """
-        if columns is None:
-            numeric_cols1 = data1.select_dtypes(include=[np.number]).columns.tolist()
-            numeric_cols2 = data2.select_dtypes(include=[np.number]).columns.tolist()
-            columns = list(set(numeric_cols1) & set(numeric_cols2))  # 取交集
+        batches = [(df, name) for df, name in batches if len(df)]
+        if not batches:
+            raise ValueError("❌ 没有可分析的批次数据")
+        names = [name for _, name in batches]
+        contexts = [AnalysisContext(df, columns) for df, _ in batches]
+        columns = self._common_columns(batches, contexts, columns)
+        sizes = np.array([len(df) for df, _ in batches], dtype=np.intp)
+        starts = np.concatenate(([0], np.cumsum(sizes)[:-1])).astype(np.intp)
+        matrix = np.vstack([ctx.stack(columns) for ctx in contexts])
+        limits = [self._spec_limits((spec_limits or {}).get(col)) for col in columns]
         
-        results = {
-            "batch1_name": batch1_name,
-            "batch2_name": batch2_name,
-            "comparison": {}
+        # 中心线与 σ：组内 σ 由相邻点移动极差（不跨批次）估计，MR̄ / 1.128
+        base_rows = int(sizes[:baseline_batches].sum()) if baseline_batches else len(matrix)
+        base = matrix[:base_rows]
+        moving_range = np.abs(np.diff(base, axis=0))
+        boundaries = starts[(starts > 0) & (starts < base_rows)] - 1
+        moving_range[boundaries] = np.nan
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            center = np.nanmean(base, axis=0)
+            sigma_within = np.nanmean(moving_range, axis=0) / 1.128
+            sigma_overall = np.nanstd(matrix, axis=0, ddof=1)
+            overall_mean = np.nanmean(matrix, axis=0)
+        center = np.array([target if target is not None else c for c, (_, _, target) in zip(center, limits)])
+        sigma = np.where(sigma_within > 0, sigma_within, sigma_overall)
+        sigma = np.where(np.isfinite(sigma) & (sigma > 0), sigma, np.nan)
+        
+        valid = ~np.isnan(matrix)
+        filled = _forward_fill(matrix, np.nan_to_num(center))
+        
+        # EWMA：z_t = λx_t + (1-λ)z_{t-1}，z_0 为中心线；控制限随 t 收敛到稳态宽度
+        lam = float(ewma_lambda)
+        ewma, _ = lfilter([lam], [1.0, lam - 1.0], filled, axis=0, zi=((1 - lam) * np.nan_to_num(center))[None, :])
+        t = np.arange(1, len(matrix) + 1)[:, None]
+        half_width = ewma_width * sigma * np.sqrt(lam / (2 - lam) * (1 - (1 - lam) ** (2 * t)))
+        with np.errstate(invalid='ignore'):
+            ewma_flags = np.abs(ewma - center) > half_width
+            
+            # CUSUM（标准化后双侧），每个批次从0开始累积，前一批次的报警不会延续到下一批次
+            z = (filled - center) / sigma
+            cusum_upper, cusum_lower = np.empty_like(z), np.empty_like(z)
+            for start, size in zip(starts, sizes):
+                cusum_upper[start:start + size] = _cusum(z[start:start + size], cusum_k)
+                cusum_lower[start:start + size] = _cusum(-z[start:start + size], cusum_k)
+            cusum_flags = (cusum_upper > cusum_h) | (cusum_lower > cusum_h)
+            
+            # 判异规则（只在有效点上判断）：超出3σ、连续同侧、连续上升或下降
+            individual = np.where(valid, (matrix - center) / sigma, np.nan)
+            beyond_flags = np.abs(individual) > 3
+            run_flags = ((_run_lengths(individual > 0) >= self.SPC_RUN_LENGTH) |
+                         (_run_lengths(individual < 0) >= self.SPC_RUN_LENGTH))
+            step = np.diff(matrix, axis=0, prepend=np.nan)
+            trend_flags = ((_run_lengths(step > 0) >= self.SPC_TREND_LENGTH - 1) |
+                           (_run_lengths(step < 0) >= self.SPC_TREND_LENGTH - 1))
+        
+        events = {
+            "ewma": _onsets(ewma_flags),
+            "cusum": _onsets(cusum_flags),
+            "beyond_3sigma": beyond_flags,
+            "run": _onsets(run_flags),
+            "trend": _onsets(trend_flags)
         }
+        # 各批次的报警数与统计量：批次在行方向连续，reduceat 一次完成分组求和（以中心线为原点减小舍入误差）
+        per_batch = {name: np.add.reduceat(flags.astype(np.int64), starts, axis=0) for name, flags in events.items()}
+        alarm_points = np.add.reduceat((ewma_flags | cusum_flags).astype(np.int64), starts, axis=0)
+        offset = np.where(valid, matrix - np.nan_to_num(center), 0.0)
+        batch_count = np.add.reduceat(valid.astype(np.int64), starts, axis=0)
+        batch_sum = np.add.reduceat(offset, starts, axis=0)
+        batch_sq = np.add.reduceat(offset * offset, starts, axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            batch_mean = batch_sum / batch_count
+            batch_std = np.sqrt(np.maximum(batch_sq - batch_sum * batch_mean, 0.0) / (batch_count - 1))
+        batch_mean += np.nan_to_num(center)
+        batch_position = np.searchsorted(starts, np.arange(len(matrix)), side='right') - 1
         
-        for col in columns:
-            if col in data1.columns and col in data2.columns:
-                series1 = pd.to_numeric(data1[col], errors='coerce').dropna()
-                series2 = pd.to_numeric(data2[col], errors='coerce').dropna()
-                
-                if len(series1) > 0 and len(series2) > 0:
-                    # 基础统计对比
-                    mean1, mean2 = series1.mean(), series2.mean()
-                    std1, std2 = series1.std(), series2.std()
-                    
-                    # T检验
-                    try:
-                        t_stat, t_p_value = stats.ttest_ind(series1, series2)
-                        significant_diff = bool(t_p_value < 0.05)  # 确保为Python bool
-                    except:
-                        t_stat, t_p_value, significant_diff = float(0), float(1), False
-                    
-                    # 变异系数对比
-                    cv1 = std1 / mean1 if mean1 != 0 else 0
-                    cv2 = std2 / mean2 if mean2 != 0 else 0
-                    
-                    results["comparison"][col] = {
-                        "batch1_mean": float(mean1),
-                        "batch2_mean": float(mean2),
-                        "mean_difference": float(mean2 - mean1),
-                        "mean_change_percent": float((mean2 - mean1) / mean1 * 100) if mean1 != 0 else 0,
-                        "batch1_std": float(std1),
-                        "batch2_std": float(std2),
-                        "batch1_cv": float(cv1),
-                        "batch2_cv": float(cv2),
-                        "stability_comparison": "更稳定" if cv2 < cv1 else "不如" if cv2 > cv1 else "相似",
-                        "t_statistic": float(t_stat),
-                        "t_p_value": float(t_p_value),
-                        "significant_difference": significant_diff,
-                        "improvement": self._assess_improvement(mean1, mean2, cv1, cv2, col)
-                    }
+        channels = {}
+        for j, col in enumerate(columns):
+            lsl, usl, target = limits[j]
+            if not np.isfinite(sigma[j]):
+                channels[col] = {"error": "有效数据不足，无法估计σ"}
+                continue
+            cp, cpk = _capability(overall_mean[j], sigma[j], lsl, usl)
+            pp, ppk = _capability(overall_mean[j], sigma_overall[j], lsl, usl)
+            
+            def first(flags):
+                hits = np.flatnonzero(flags[:, j])
+                if not len(hits):
+                    return None
+                b = int(batch_position[hits[0]])
+                return {"batch": names[b], "row": int(hits[0] - starts[b])}
+            
+            batch_summary = {}
+            for b, name in enumerate(names):
+                if batch_count[b, j] == 0:
+                    continue
+                std = float(batch_std[b, j]) if batch_count[b, j] > 1 else 0.0
+                alarm_fraction = float(alarm_points[b, j] / sizes[b])
+                batch_summary[name] = {
+                    "rows": int(batch_count[b, j]),
+                    "mean": float(batch_mean[b, j]),
+                    "std": std,
+                    "cpk": _capability(batch_mean[b, j], std, lsl, usl)[1],
+                    "alarms": {key: int(per_batch[key][b, j]) for key in events},
+                    "alarm_fraction": alarm_fraction,
+                    "out_of_control": alarm_fraction > alarm_tolerance
+                }
+            
+            channels[col] = {
+                "center": float(center[j]),
+                "sigma_within": float(sigma[j]),
+                "sigma_overall": float(sigma_overall[j]),
+                "ewma": {
+                    "lambda": lam,
+                    "ucl": float(center[j] + ewma_width * sigma[j] * np.sqrt(lam / (2 - lam))),  # 稳态控制限
+                    "lcl": float(center[j] - ewma_width * sigma[j] * np.sqrt(lam / (2 - lam))),
+                    "alarms": int(events["ewma"][:, j].sum()),
+                    "first_alarm": first(ewma_flags)
+                },
+                "cusum": {
+                    "k": float(cusum_k),
+                    "h": float(cusum_h),
+                    "alarms": int(events["cusum"][:, j].sum()),
+                    "first_alarm": first(cusum_flags),
+                    "max_upper": float(cusum_upper[:, j].max()),
+                    "max_lower": float(cusum_lower[:, j].max())
+                },
+                "rules": {
+                    "beyond_3sigma": int(events["beyond_3sigma"][:, j].sum()),
+                    f"run_{self.SPC_RUN_LENGTH}_same_side": int(events["run"][:, j].sum()),
+                    f"trend_{self.SPC_TREND_LENGTH}": int(events["trend"][:, j].sum())
+                },
+                "capability": {"lsl": lsl, "usl": usl, "target": target, "mean": float(overall_mean[j]),
+                               "cp": cp, "cpk": cpk, "pp": pp, "ppk": ppk} if cpk is not None else None,
+                "out_of_control_batches": [name for name, item in batch_summary.items() if item["out_of_control"]],
+                "batches": batch_summary
+            }
         
-        return results
+        return {
+            "analysis_type": "spc",
+            "batch_names": names,
+            "batch_starts": starts.tolist(),
+            "rows_processed": int(len(matrix)),
+            "baseline_batches": baseline_batches or len(names),
+            "channels": channels
+        }
     
-    def comprehensive_analysis(self, data, columns=None, time_col=None):
+    def _spec_limits(self, spec):
+        """规格限统一为 (下限, 上限, 目标值)，缺失为 None"""
+        if spec is None:
+            return None, None, None
+        if isinstance(spec, dict):
+            values = (spec.get("lsl"), spec.get("usl"), spec.get("target"))
+        else:
+            values = (list(spec) + [None, None, None])[:3]
+        return tuple(float(value) if value is not None else None for value in values)
+    
+    def periodicity_analysis(self, data, columns=None, time_col=None, min_period=None, max_period=None,
+                             min_strength=0.3):
         """
-        综合分析：整合所有分析功能
+        周期性分析：FFT 自相关求每个通道的主周期，按周期切分为完整循环，逐循环统计并估计循环间漂移
+        
+        循环起点对齐到折叠平均波形的最低点（温度循环从低温端开始）；各循环在行方向连续，
+        逐循环统计由 reduceat 一次完成，漂移为循环均值/幅值对循环序号的闭式线性回归
         
         参数:
             data (DataFrame): 输入数据
-            columns (list): 要分析的列名
-            time_col (str): 时间列名
+            columns (list): 要分析的列名，None则为所有数值列
+            time_col (str): 时间列名，不参与分析；可解析时周期同时换算为秒
+            min_period (int): 最小周期（行数），默认2
+            max_period (int): 最大周期（行数），默认行数的一半（至少要有两个完整循环）
+            min_strength (float): 周期处自相关不低于该值才判为周期信号
             
         返回:
-            dict: 综合分析结果
+            dict: 逐通道的周期、周期强度、循环数、逐循环统计和循环间漂移
         """
-        results = {
-            "basic_statistics": self.basic_statistics(data, columns),
-            "stability_analysis": self.stability_analysis(data, columns),
-            "trend_analysis": self.trend_analysis(data, columns, time_col),
-            "outlier_detection": self.outlier_detection(data, columns),
-            "data_quality": self._assess_data_quality(data, columns),
-            "summary": self._generate_summary(data, columns)
+        ctx = AnalysisContext(data, columns)
+        columns = [col for col in ctx.columns if col in ctx.data.columns and col != time_col]
+        matrix = ctx.stack(columns)
+        n = len(matrix)
+        max_lag = min(int(max_period) if max_period else n // 2, n - 2) if n > 2 else 0
+        
+        step = None
+        kind, times = ctx.time(time_col) if time_col else (None, None)
+        elapsed = None if kind is None else elapsed_seconds(kind, times)
+        if elapsed is not None:
+            steps = np.diff(elapsed[~np.isnan(elapsed)])
+            steps = steps[steps > 0]
+            step = float(np.median(steps)) if len(steps) else None
+        
+        positions = np.arange(n)
+        channels = {}
+        for j, col in enumerate(columns):
+            x = matrix[:, j]
+            valid = ~np.isnan(x)
+            if valid.sum() < 4 or max_lag < 2:
+                channels[col] = {"error": "有效数据不足，无法检测周期"}
+                continue
+            if not valid.all():
+                x = np.interp(positions, positions[valid], x[valid])
+            acf = _autocorrelation(x, max_lag)
+            period, strength = _acf_period(acf, min_period or 2)
+            result = {
+                "periodic": period is not None and strength >= min_strength,
+                "period": period,
+                "period_seconds": period * step if period is not None and step is not None else None,
+                "strength": strength
+            }
+            if result["periodic"]:
+                result.update(self._cycle_statistics(x, matrix[:, j], period, times if kind else None, kind))
+            channels[col] = result
+        
+        return {
+            "analysis_type": "periodicity",
+            "rows_processed": int(n),
+            "sample_interval": step,
+            "time_column": time_col if kind is not None else None,
+            "channels": channels
         }
+    
+    def _cycle_statistics(self, filled, raw, period, times, kind):
+        """按周期切分完整循环并逐循环统计（filled 为插值补齐的序列，统计只用原始有效值）"""
+        n = len(filled)
+        # 折叠平均波形：相位按 round(周期) 个相位箱累加，最低点所在相位作为循环起点
+        bins = max(int(round(period)), 1)
+        phase_bin = ((np.arange(n) % period) / period * bins).astype(np.intp) % bins
+        profile = np.bincount(phase_bin, weights=filled, minlength=bins) / np.maximum(np.bincount(phase_bin, minlength=bins), 1)
+        offset = int(profile.argmin()) / bins * period
         
-        return results
+        count = int((n - offset) // period)
+        starts = np.rint(offset + np.arange(count + 1) * period).astype(np.intp)
+        starts = starts[starts <= n]
+        if len(starts) < 2:
+            return {"cycle_count": 0}
+        segment = raw[starts[0]:starts[-1]]
+        local = starts[:-1] - starts[0]
+        valid = ~np.isnan(segment)
+        values = np.where(valid, segment, 0.0)
+        counts = np.add.reduceat(valid.astype(np.int64), local)
+        sums = np.add.reduceat(values, local)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = sums / counts
+            deviation = np.where(valid, segment - np.repeat(means, np.diff(starts)), 0.0)
+            stds = np.sqrt(np.add.reduceat(deviation * deviation, local) / np.maximum(counts - 1, 1))
+        mins, maxs = np.fmin.reduceat(segment, local), np.fmax.reduceat(segment, local)
+        amplitudes = maxs - mins
+        
+        # 循环间漂移：对循环序号做闭式线性回归
+        index = np.arange(len(means), dtype=float)
+        
+        def drift(values):
+            ok = np.isfinite(values)
+            if ok.sum() < 2:
+                return 0.0
+            t = index[ok] - index[ok].mean()
+            return float(np.dot(t, values[ok] - values[ok].mean()) / np.dot(t, t))
+        
+        mean_slope, amplitude_slope = drift(means), drift(amplitudes)
+        first_mean = float(means[np.isfinite(means)][0]) if np.isfinite(means).any() else float('nan')
+        return {
+            "cycle_count": int(len(means)),
+            "phase_offset": float(offset),
+            "cycles": {
+                "start": starts[:-1].tolist(),
+                "start_time": format_times(kind, times[starts[:-1]]) if kind else starts[:-1].tolist(),
+                "mean": means.tolist(),
+                "std": stds.tolist(),
+                "min": mins.tolist(),
+                "max": maxs.tolist(),
+                "amplitude": amplitudes.tolist()
+            },
+            "drift": {
+                "mean_slope_per_cycle": mean_slope,
+                "amplitude_slope_per_cycle": amplitude_slope,
+                "mean_change": mean_slope * (len(means) - 1),
+                "relative_change": mean_slope * (len(means) - 1) / abs(first_mean) * 100
+                                   if first_mean and np.isfinite(first_mean) else 0.0
+            }
+        }
     
     def _get_stability_rating(self, stability_index):
         """获取稳定性评级"""
@@ -371,20 +2653,13 @@ class DataAnalyzer:
         else:
             return "需要关注"
     
-    def _assess_data_quality(self, data, columns):
+    def _assess_data_quality(self, data, columns, ctx=None):
         """评估数据质量"""
         if columns is None:
             # 使用相同的逻辑选择有效的数值列
-            columns = []
-            for col in data.columns:
-                if col.startswith('Unnamed:'):
-                    continue
-                try:
-                    series = pd.to_numeric(data[col], errors='coerce').dropna()
-                    if len(series) > 0:
-                        columns.append(col)
-                except:
-                    continue
+            if ctx is None:
+                ctx = AnalysisContext(data)
+            columns = ctx.columns
         
         total_points = len(data)
         missing_counts = {}
@@ -406,14 +2681,18 @@ class DataAnalyzer:
             "quality_rating": "优秀" if avg_completeness >= 95 else "良好" if avg_completeness >= 85 else "一般" if avg_completeness >= 70 else "较差"
         }
     
-    def _generate_summary(self, data, columns):
-        """生成分析摘要"""
+    def _generate_summary(self, data, columns, ctx=None):
+        """生成分析摘要（传入ctx时直接复用已缓存的逐列分析结果）"""
         if columns is None:
             columns = data.select_dtypes(include=[np.number]).columns.tolist()
+        if ctx is None:
+            ctx = AnalysisContext(data, columns)
         
-        stats = self.basic_statistics(data, columns)
-        stability = self.stability_analysis(data, columns)
-        trends = self.trend_analysis(data, columns)
+        # 摘要只关注前5个指标，仅取这些列的结果（已计算过的直接命中缓存）
+        key_columns = columns[:5]
+        stats = self._basic_statistics(ctx, key_columns)
+        stability = self._stability_analysis(ctx, key_columns)
+        trends = self._trend_analysis(ctx, key_columns)
         
         summary = {
             "analyzed_columns": len(columns),
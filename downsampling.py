@@ -0,0 +1,101 @@
+# downsampling.py
+# 曲线降采样：把任意长度的序列压缩到给定点数，保留整体形状（峰谷、突变）并覆盖完整时间范围
+# 降采样只用于绘图和模型输入，统计指标仍在全部数据上计算
+
+import numpy as np
+
+def minmax_indices(y, n_out):
+    """
+    最小/最大值分桶降采样：等分为 n_out/2 个桶，每桶保留最小值和最大值所在位置（全向量化）
+
+    参数:
+        y (ndarray): 一维数值序列（不含NaN）
+        n_out (int): 目标点数
+
+    返回:
+        ndarray: 升序的保留位置，始终包含首尾两点
+    """
+    n = len(y)
+    if n <= n_out:
+        return np.arange(n)
+    if n_out < 4:
+        return _endpoints(n, n_out)
+    buckets = (n_out - 2) // 2
+    size = -(-n // buckets)
+    buckets = -(-n // size)
+    padded_min = np.full(buckets * size, np.inf)
+    padded_max = np.full(buckets * size, -np.inf)
+    padded_min[:n] = y
+    padded_max[:n] = y
+    offsets = np.arange(buckets) * size
+    lows = offsets + padded_min.reshape(buckets, size).argmin(axis=1)
+    highs = offsets + padded_max.reshape(buckets, size).argmax(axis=1)
+    return np.unique(np.concatenate(([0, n - 1], lows, highs)))
+
+def _endpoints(n, n_out):
+    """点数过少无法分桶时均匀取点（含首尾）"""
+    return np.unique(np.linspace(0, n - 1, max(n_out, 2)).round().astype(int))
+
+def lttb_indices(x, y, n_out):
+    """
+    最大三角形三桶（LTTB）降采样：首尾两点固定，中间等分为 n_out-2 个桶，
+    每桶选取与上一选中点、下一桶均值点构成三角形面积最大的点
+
+    桶均值由累加和一次算出，每个桶内的面积计算向量化，只有桶间的依赖按顺序循环
+
+    参数:
+        x (ndarray): 一维横坐标（单调，如行号或时间戳）
+        y (ndarray): 一维数值序列（不含NaN），与 x 等长
+        n_out (int): 目标点数
+
+    返回:
+        ndarray: 升序的保留位置，共 min(n_out, len(y)) 个
+    """
+    n = len(y)
+    if n <= n_out:
+        return np.arange(n)
+    if n_out < 3:
+        return _endpoints(n, n_out)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    # 第 i 个桶为 [edges[i], edges[i+1])，覆盖除首尾外的全部点，每桶至少1个点
+    edges = (np.arange(n_out - 1) * (n - 2) / (n_out - 2)).astype(np.intp) + 1
+    cum_x = np.concatenate(([0.0], np.cumsum(x)))
+    cum_y = np.concatenate(([0.0], np.cumsum(y)))
+    counts = np.diff(edges)
+    # next_x[i]/next_y[i] 为第 i 个桶的下一桶均值，最后一个桶的下一桶即末点
+    next_x = np.append((cum_x[edges[2:]] - cum_x[edges[1:-1]]) / counts[1:], x[-1])
+    next_y = np.append((cum_y[edges[2:]] - cum_y[edges[1:-1]]) / counts[1:], y[-1])
+
+    selected = np.empty(n_out, dtype=np.intp)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        ax, ay = x[a], y[a]
+        # 三角形面积的2倍（比较大小时省去常数）
+        area = np.abs((ax - next_x[i]) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (next_y[i] - ay))
+        a = lo + int(area.argmax())
+        selected[i + 1] = a
+    return selected
+
+def downsample_indices(y, n_out, x=None, method='lttb'):
+    """
+    按方法选择降采样位置
+
+    参数:
+        y (ndarray): 一维数值序列（不含NaN）
+        n_out (int): 目标点数
+        x (ndarray): 横坐标，None 时用位置序号（仅 LTTB 使用）
+        method (str): 'lttb' 保形降采样 或 'minmax' 每桶保留极值
+
+    返回:
+        ndarray: 升序的保留位置
+    """
+    y = np.asarray(y, dtype=float)
+    if method == 'lttb':
+        return lttb_indices(np.arange(len(y)) if x is None else x, y, n_out)
+    if method == 'minmax':
+        return minmax_indices(y, n_out)
+    raise ValueError(f"❌ 未知降采样方法: {method}")
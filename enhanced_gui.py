@@ -19,6 +19,9 @@ from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
 from PyQt5.QtCore import Qt, QThread, pyqtSignal, QTimer
 from PyQt5.QtGui import QFont, QPalette, QColor, QIcon
 from gpt_dispatcher import dispatch_gpt_response
+from shared_data import data_plane
+from parallel_analysis import shutdown_pool
+from series_pyramid import SeriesPyramid
 from gpt_api import ask_gpt
 from format_fixer import FormatFixer
 
@@ -106,6 +109,11 @@ class PlotCanvas(FigureCanvas):
         # 设置样式
         sns.set_style("whitegrid")
         sns.set_palette("husl")
+        
+        # 时间序列滚轮缩放：可缩放的子图及其曲线，数据来自多分辨率金字塔
+        self._pyramid = None
+        self._zoom_axes = {}
+        self.mpl_connect('scroll_event', self._on_time_series_scroll)
     
     def setup_chinese_font(self):
         """设置中文字体支持"""
@@ -518,6 +526,11 @@ class PlotCanvas(FigureCanvas):
         n_cols = 2 if n_plots > 1 else 1
         n_rows = (n_plots + n_cols - 1) // n_cols
         
+        # 有金字塔时横坐标为原始行位置，滚轮缩放只读取可见区间的 O(像素) 个桶
+        pyramid_path = time_series_data.get('pyramid_path')
+        self._pyramid = SeriesPyramid.open(pyramid_path) if pyramid_path else None
+        self._zoom_axes = {}
+        
         for i, metric in enumerate(metrics):
             data = series_analysis[metric]
             values = data.get('values', [])
@@ -533,17 +546,28 @@ class PlotCanvas(FigureCanvas):
                 
             ax = self.fig.add_subplot(n_rows, n_cols, i + 1)
             
-            # 绘制折线图
-            ax.plot(time_points, values, 'b-', linewidth=2, marker='o', 
-                   markersize=4, alpha=0.8, label=metric)
+            x_values = time_points
+            if self._pyramid is not None and 'sample_positions' in data:
+                x_values = data['sample_positions'][:min_len]
             
-            # 添加趋势线
-            if len(values) > 2:
-                import numpy as np
-                x_trend = np.arange(len(values))
+            # 绘制折线图（区间查询结果每个点为一个桶的均值，并画出桶内最小/最大值包络）
+            envelope = None
+            if 'min_values' in data:
+                line, = ax.plot(x_values, values, 'b-', linewidth=1.5, alpha=0.8, label=metric)
+                envelope = ax.fill_between(x_values, data['min_values'][:min_len], data['max_values'][:min_len],
+                                           color='b', alpha=0.2, label='最小/最大值')
+            else:
+                line, = ax.plot(x_values, values, 'b-', linewidth=2, marker='o', 
+                               markersize=4, alpha=0.8, label=metric)
+            if self._pyramid is not None and metric in self._pyramid.columns:
+                self._zoom_axes[ax] = {"metric": metric, "line": line, "envelope": envelope}
+            
+            # 添加趋势线（降采样点不等间隔，按原始行位置拟合）
+            if len(values) > 2 and 'min_values' not in data:
+                x_trend = np.asarray(data.get('sample_positions', range(len(values)))[:min_len], dtype=float)
                 z = np.polyfit(x_trend, values, 1)
                 p = np.poly1d(z)
-                ax.plot(time_points, p(x_trend), "r--", alpha=0.7, linewidth=1.5, label='趋势线')
+                ax.plot(x_values, p(x_trend), "r--", alpha=0.7, linewidth=1.5, label='趋势线')
             
             # 设置标题和标签
             trend_direction = data.get('trend_direction', '稳定')
@@ -558,11 +582,84 @@ class PlotCanvas(FigureCanvas):
         for i in range(n_plots):
             if i >= (n_rows - 1) * n_cols:
                 ax = self.fig.axes[i]
-                ax.set_xlabel('时间点', fontsize=14, fontproperties=font_prop)
+                ax.set_xlabel('数据行号（滚轮缩放）' if self._zoom_axes else '时间点', fontsize=14, fontproperties=font_prop)
+        
+        self.fig.tight_layout()
+        self.draw()
+    
+    def plot_spectral_charts(self, spectral_data):
+        """绘制各通道的功率谱密度（对数纵轴），并标出主频"""
+        if not spectral_data or spectral_data.get('analysis_type') != 'spectral':
+            return
+        
+        self.fig.clear()
+        self._zoom_axes = {}
+        font_prop = self.get_chinese_font_prop()
+        self.fig.suptitle('功率谱密度（Welch）', fontsize=18, fontweight='bold', fontproperties=font_prop)
+        
+        freqs = spectral_data.get('frequencies', [])
+        spectra = spectral_data.get('spectra', {})
+        channels = spectral_data.get('channels', {})
+        metrics = list(spectra.keys())[:6]  # 最多显示6个通道
+        if not metrics or len(freqs) < 2:
+            self.draw()
+            return
+        
+        n_cols = 2 if len(metrics) > 1 else 1
+        n_rows = (len(metrics) + n_cols - 1) // n_cols
+        unit = spectral_data.get('frequency_unit', 'Hz')
+        for i, metric in enumerate(metrics):
+            ax = self.fig.add_subplot(n_rows, n_cols, i + 1)
+            psd = np.asarray(spectra[metric], dtype=float)
+            # 直流分量不参与对数坐标显示
+            ax.semilogy(freqs[1:], np.maximum(psd[1:], np.finfo(float).tiny), 'b-', linewidth=1.2, label=metric)
+            peaks = channels.get(metric, {}).get('dominant_frequencies', [])[:3]
+            if peaks:
+                ax.plot([peak['frequency'] for peak in peaks], [peak['psd'] for peak in peaks], 'rv',
+                        markersize=7, label='主频')
+                for peak in peaks:
+                    ax.annotate(f"{peak['frequency']:.1f}", (peak['frequency'], peak['psd']),
+                                textcoords='offset points', xytext=(0, 6), ha='center', fontsize=9)
+            rms = channels.get(metric, {}).get('rms')
+            title = f'{metric} - RMS {rms:.4g}' if rms is not None else metric
+            ax.set_title(title, fontsize=16, fontproperties=font_prop)
+            ax.set_ylabel('PSD', fontsize=14, fontproperties=font_prop)
+            ax.grid(True, alpha=0.3, which='both')
+            ax.legend(fontsize=11, prop=font_prop)
+            if i >= (n_rows - 1) * n_cols:
+                ax.set_xlabel(f'频率（{unit}）', fontsize=14, fontproperties=font_prop)
         
         self.fig.tight_layout()
         self.draw()
     
+    def _on_time_series_scroll(self, event):
+        """滚轮缩放时间序列曲线：以光标为中心缩放横轴，并从金字塔取可见区间的曲线"""
+        zoom = self._zoom_axes.get(event.inaxes)
+        if zoom is None or event.xdata is None:
+            return
+        ax = event.inaxes
+        factor = 0.8 if event.button == 'up' else 1.25
+        left, right = ax.get_xlim()
+        left = max(event.xdata - (event.xdata - left) * factor, 0)
+        right = min(event.xdata + (right - event.xdata) * factor, self._pyramid.rows)
+        if right - left < 2:
+            return
+        
+        curve = self._pyramid.query([zoom["metric"]], int(left), int(np.ceil(right)), int(ax.bbox.width))
+        series = curve["series"][zoom["metric"]]
+        zoom["line"].set_data(curve["positions"], series["mean"])
+        zoom["line"].set_marker('')
+        if zoom["envelope"] is not None:
+            zoom["envelope"].remove()
+        zoom["envelope"] = ax.fill_between(curve["positions"], series["min"], series["max"], color='b', alpha=0.2)
+        
+        ax.set_xlim(left, right)
+        low, high = np.nanmin(series["min"]), np.nanmax(series["max"])
+        if np.isfinite(low) and np.isfinite(high):
+            margin = (high - low) * 0.05 or 1.0
+            ax.set_ylim(low - margin, high + margin)
+        self.draw_idle()
+    
     def _plot_stability_trend_lines(self, data, font_prop):
         """绘制稳定性趋势折线图（包括均值趋势）"""
         stability_trends = data.get('stability_trends', {})
@@ -1196,7 +1293,8 @@ class DataDetailsPanel(QWidget):
             "异常检测图表",
             "多批次对比图表",
             "多批次趋势折线图",
-            "时间序列折线图"
+            "时间序列折线图",
+            "频谱图"
         ])
         self.chart_type_combo.currentTextChanged.connect(self.on_chart_type_changed)
         
@@ -1267,6 +1365,10 @@ class DataDetailsPanel(QWidget):
             self.update_multi_batch_table(analysis_data)
             # 切换到多批次对比标签页
             self.tab_widget.setCurrentWidget(self.comparison_tab)
+        # 检查是否是多批次显著性对比结果
+        elif self._is_multi_batch_significance_result(analysis_data):
+            self.update_significance_table(analysis_data)
+            self.tab_widget.setCurrentWidget(self.comparison_tab)
         # 检查是否是时间序列分析结果
         elif self._is_time_series_result(analysis_data):
             print("🔧 [DEBUG] GUI识别到时间序列分析结果")
@@ -1275,6 +1377,14 @@ class DataDetailsPanel(QWidget):
             self.tab_widget.setCurrentWidget(self.visualization_tab)
             # 确保自动选择正确的图表类型
             self.auto_select_chart()
+        # 检查是否是频谱分析结果
+        elif self._is_spectral_result(analysis_data):
+            self.tab_widget.setCurrentWidget(self.visualization_tab)
+            self.auto_select_chart()
+        # 检查是否是 SPC 控制图结果
+        elif self._is_spc_result(analysis_data):
+            self.update_spc_table(analysis_data)
+            self.tab_widget.setCurrentWidget(self.comparison_tab)
         # 检查是否是批次对比结果
         elif self._is_batch_comparison_result(analysis_data):
             self.update_comparison_table(analysis_data)
@@ -1485,6 +1595,68 @@ class DataDetailsPanel(QWidget):
                 self.comparison_table.setItem(row, 6, QTableWidgetItem(data.get('improvement', '')))
                 self.comparison_table.setItem(row, 7, QTableWidgetItem(f"{data.get('t_p_value', 0):.4f}"))
     
+    def update_significance_table(self, significance_data):
+        """更新多批次显著性对比表格（ANOVA / Kruskal-Wallis 及两两比较结论）"""
+        comparison = significance_data.get("comparison", {})
+        names = significance_data.get("batch_names", [])
+        pairwise_alpha = significance_data.get("pairwise_alpha", 0.05)
+        
+        self.comparison_table.setColumnCount(8)
+        self.comparison_table.setHorizontalHeaderLabels([
+            "指标", "ANOVA F", "ANOVA P值", "K-W H", "K-W P值", "整体显著", "显著批次对", "差异最大批次对"
+        ])
+        self.comparison_table.setRowCount(len(comparison))
+        
+        for row, (metric, data) in enumerate(comparison.items()):
+            anova = data.get("anova", {})
+            kruskal = data.get("kruskal_wallis", {})
+            p_values = np.array(data["pairwise"]["p_value"], dtype=float)
+            effects = np.abs(np.array(data["pairwise"]["cohens_d"], dtype=float))
+            upper_i, upper_j = np.triu_indices(len(names), k=1)
+            significant_pairs = int((p_values[upper_i, upper_j] < pairwise_alpha).sum())
+            largest = ""
+            if len(upper_i):
+                k = int(np.argmax(np.nan_to_num(effects[upper_i, upper_j], nan=-1)))
+                largest = f"{names[upper_i[k]]} vs {names[upper_j[k]]} (d={effects[upper_i[k], upper_j[k]]:.2f})"
+            
+            self.comparison_table.setItem(row, 0, QTableWidgetItem(metric))
+            self.comparison_table.setItem(row, 1, QTableWidgetItem(f"{anova.get('f_statistic', 0):.4f}"))
+            self.comparison_table.setItem(row, 2, QTableWidgetItem(f"{anova.get('p_value', 1):.4g}"))
+            self.comparison_table.setItem(row, 3, QTableWidgetItem(f"{kruskal.get('h_statistic', 0):.4f}"))
+            self.comparison_table.setItem(row, 4, QTableWidgetItem(f"{kruskal.get('p_value', 1):.4g}"))
+            self.comparison_table.setItem(row, 5, QTableWidgetItem(
+                "是" if anova.get("significant") or kruskal.get("significant") else "否"))
+            self.comparison_table.setItem(row, 6, QTableWidgetItem(f"{significant_pairs}/{len(upper_i)}"))
+            self.comparison_table.setItem(row, 7, QTableWidgetItem(largest))
+    
+    def update_spc_table(self, spc_data):
+        """更新 SPC 控制图表格（每个通道的中心线、EWMA 控制限、报警次数、过程能力及失控批次）"""
+        channels = spc_data.get("channels", {})
+        
+        self.comparison_table.setColumnCount(9)
+        self.comparison_table.setHorizontalHeaderLabels([
+            "通道", "中心线", "σ(组内)", "EWMA 控制限", "EWMA 报警", "CUSUM 报警", "Cp", "Cpk", "失控批次"
+        ])
+        self.comparison_table.setRowCount(len(channels))
+        
+        for row, (col, channel) in enumerate(channels.items()):
+            self.comparison_table.setItem(row, 0, QTableWidgetItem(col))
+            if "error" in channel:
+                self.comparison_table.setItem(row, 8, QTableWidgetItem(channel["error"]))
+                continue
+            ewma = channel["ewma"]
+            capability = channel.get("capability") or {}
+            self.comparison_table.setItem(row, 1, QTableWidgetItem(f"{channel['center']:.4f}"))
+            self.comparison_table.setItem(row, 2, QTableWidgetItem(f"{channel['sigma_within']:.4g}"))
+            self.comparison_table.setItem(row, 3, QTableWidgetItem(f"[{ewma['lcl']:.4f}, {ewma['ucl']:.4f}]"))
+            self.comparison_table.setItem(row, 4, QTableWidgetItem(str(ewma["alarms"])))
+            self.comparison_table.setItem(row, 5, QTableWidgetItem(str(channel["cusum"]["alarms"])))
+            for column, key in ((6, "cp"), (7, "cpk")):
+                value = capability.get(key)
+                self.comparison_table.setItem(row, column, QTableWidgetItem("-" if value is None else f"{value:.3f}"))
+            self.comparison_table.setItem(row, 8, QTableWidgetItem(
+                ", ".join(channel.get("out_of_control_batches", [])) or "无"))
+    
     def update_multi_batch_table(self, multi_batch_data):
         """更新多批次对比表格"""
         # 显示控制面板
@@ -1624,6 +1796,8 @@ class DataDetailsPanel(QWidget):
             self.plot_multi_batch_trend_chart()
         elif chart_type == "时间序列折线图":
             self.plot_time_series_chart()
+        elif chart_type == "频谱图":
+            self.plot_spectral_chart()
     
     def auto_select_chart(self):
         """自动选择合适的图表类型"""
@@ -1640,6 +1814,9 @@ class DataDetailsPanel(QWidget):
         elif self._is_time_series_result(self.current_data):
             self.plot_time_series_chart()
             self.chart_type_combo.setCurrentText("时间序列折线图")
+        elif self._is_spectral_result(self.current_data):
+            self.plot_spectral_chart()
+            self.chart_type_combo.setCurrentText("频谱图")
         elif self._is_batch_comparison_result(self.current_data):
             self.plot_comparison_chart()
             self.chart_type_combo.setCurrentText("多批次对比图表")
@@ -1744,10 +1921,22 @@ class DataDetailsPanel(QWidget):
             data.get('analysis_type') in ['multi_batch_stability_trend', 'multi_batch_outlier_detection', 'multi_batch_comprehensive']
         )
     
+    def _is_multi_batch_significance_result(self, data):
+        """判断是否是多批次显著性对比结果"""
+        return isinstance(data, dict) and data.get('analysis_type') == 'multi_batch_significance'
+    
     def _is_time_series_result(self, data):
         """判断是否是时间序列分析结果"""
         return isinstance(data, dict) and data.get('analysis_type') == 'time_series'
     
+    def _is_spectral_result(self, data):
+        """判断是否是频谱分析结果"""
+        return isinstance(data, dict) and data.get('analysis_type') == 'spectral'
+    
+    def _is_spc_result(self, data):
+        """判断是否是 SPC 控制图结果"""
+        return isinstance(data, dict) and data.get('analysis_type') == 'spc'
+    
     def plot_multi_batch_trend_chart(self):
         """绘制多批次趋势折线图"""
         if self._is_multi_batch_result(self.current_data):
@@ -1761,6 +1950,11 @@ class DataDetailsPanel(QWidget):
         """绘制时间序列折线图"""
         if self._is_time_series_result(self.current_data):
             self.plot_canvas.plot_time_series_charts(self.current_data)
+    
+    def plot_spectral_chart(self):
+        """绘制频谱图"""
+        if self._is_spectral_result(self.current_data):
+            self.plot_canvas.plot_spectral_charts(self.current_data)
 
 class GPTWorker(QThread):
     response_ready = pyqtSignal(str)
@@ -2062,6 +2256,33 @@ class EnhancedMCPAssistant(QMainWindow):
                         tool_summary += f"📊 分析类型: {analysis_type}\n"
                         tool_summary += f"🗂️ 分析批次数: {total_batches}\n"
                         tool_summary += f"📈 多批次趋势图表已显示在右侧面板"
+                    elif tool_name == "multi_batch_comparison":
+                        # 多批次显著性对比的特殊显示
+                        summary = tool_data.get("comparison_summary", {})
+                        tool_summary += f"🗂️ 对比批次数: {tool_data.get('total_batches', 0)}\n"
+                        tool_summary += f"📊 存在显著差异的指标: {len(summary.get('significant_metrics', []))}/{summary.get('total_metrics', 0)}\n"
+                        tool_summary += f"💾 两两比较矩阵已显示在右侧面板"
+                    elif tool_name == "spectral_analysis":
+                        # 频谱分析的特殊显示
+                        summary = tool_data.get("spectral_summary", {})
+                        tool_summary += f"📁 文件: {tool_data.get('file_metadata', {}).get('filename', '未知')}\n"
+                        tool_summary += f"📊 采样率: {summary.get('sample_rate', 0):g} {summary.get('frequency_unit', '')}（{len(summary.get('channels', {}))} 个通道）\n"
+                        tool_summary += f"📈 功率谱已显示在右侧面板"
+                    elif tool_name == "spc_analysis":
+                        # SPC 控制图分析的特殊显示
+                        channels = tool_data.get("spc_summary", {}).get("channels", {})
+                        flagged = sorted({name for channel in channels.values()
+                                          for name in channel.get("out_of_control_batches", [])})
+                        tool_summary += f"🗂️ 分析批次数: {tool_data.get('total_batches', 0)}（{len(channels)} 个通道）\n"
+                        tool_summary += f"🚨 失控批次: {', '.join(flagged) or '无'}\n"
+                        tool_summary += f"💾 逐批次控制图结果已显示在右侧面板"
+                    elif tool_name == "similar_batches":
+                        # 相似批次检索的特殊显示
+                        query = tool_data.get("query_batch", {})
+                        similar = tool_data.get("similar_batches", [])
+                        tool_summary += f"📁 检索批次: {query.get('name', '未知')}\n"
+                        tool_summary += f"🗂️ 索引批次数: {tool_data.get('index_size', 0)}（本次新增 {tool_data.get('newly_indexed', 0)}）\n"
+                        tool_summary += f"🔍 最相似: {', '.join(item['name'] for item in similar) or '无'}"
                     elif tool_name == "time_series_analysis":
                         # 时间序列分析的特殊显示
                         file_metadata = tool_data.get("file_metadata", {})
@@ -2078,9 +2299,14 @@ class EnhancedMCPAssistant(QMainWindow):
                     
                     self.add_message("🛠️ 分析工具", tool_summary, "tool")
                     
-                    # 继续GPT分析
+                    # 继续GPT分析（两两比较矩阵、完整功率谱只在右侧面板显示，模型只接收精简结果）
+                    gpt_data = tool_data
+                    if tool_name in ("multi_batch_comparison", "spectral_analysis", "spc_analysis"):
+                        gpt_data = {key: value for key, value in tool_data.items() if key != "analysis_results"}
+                    elif tool_name == "batch_comparison":
+                        gpt_data = {key: value for key, value in tool_data.items() if key != "alignment_results"}
                     enhanced_message = f"""这是 {tool_name} 工具的返回结果：
-{json.dumps(tool_data, ensure_ascii=False, indent=2)}
+{json.dumps(gpt_data, ensure_ascii=False, indent=2)}
 
 ⚠️ 重要提醒：请分析以上数据并严格按照JSON格式返回分析结果：
 {{"action": "analysis_complete", "analysis_summary": {{"data_source": "...", "key_findings": [...], "overall_assessment": "...", "recommendations": [...]}}}}
@@ -2163,6 +2389,10 @@ if __name__ == '__main__':
     app.setApplicationName("数据挖掘系统")
     app.setApplicationVersion("2.1")
     
+    # 退出时关闭分析进程池并释放共享内存段
+    app.aboutToQuit.connect(shutdown_pool)
+    app.aboutToQuit.connect(data_plane.shutdown)
+    
     window = EnhancedMCPAssistant()
     window.show()
     
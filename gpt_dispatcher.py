@@ -1,11 +1,17 @@
 # gpt_dispatcher.py
 # 工具调用响应调度器，仅负责解析 GPT 指令并执行对应工具
 
+import os
 import json
 from scan import scan_directory
-from csv_reader import read_csv_clean
+from csv_reader import read_csv_clean, read_csv_chunks, read_csv_shared, read_csv_sample
+from shared_data import data_plane
 from cache_utils import save_cache, load_cache
 from data_analyzer import DataAnalyzer
+from batch_index import BatchIndex
+from downsampling import downsample_indices
+from series_pyramid import SeriesPyramid, pyramid_folder
+from time_utils import parse_time, elapsed_seconds
 
 def dispatch_gpt_response(gpt_reply: str):
     """
@@ -81,42 +87,150 @@ def dispatch_gpt_response(gpt_reply: str):
             if not file_path:
                 return {"type": "error", "content": "data_analysis 工具需要 file_path 参数"}
             
+            shared_key = None
             try:
-                # 读取数据
-                df, meta = read_csv_clean(file_path)
+                # 流式模式：统计/趋势分析逐块累加，不把整个文件读入内存
+                if args.get("streaming") and analysis_type in ("statistics", "trend"):
+                    chunks = read_csv_chunks(file_path, chunksize=args.get("chunk_size", 100000))
+                    quantile_error = args.get("quantile_error", 0.01) if args.get("quantile_mode") == "approx" else None
+                    result = analyzer.streaming_analysis(chunks, columns, time_column, quantile_error)
+                    if analysis_type == "statistics":
+                        simplified_result = _simplify_statistics(result["basic_statistics"])
+                    else:
+                        simplified_result = _simplify_trend_analysis(result["trend_analysis"])
+                    return {
+                        "type": "tool_result",
+                        "tool": "data_analysis",
+                        "data": {
+                            "analysis_type": analysis_type,
+                            "file_path": file_path,
+                            "file_metadata": {
+                                "rows": result["rows_processed"],
+                                "chunks": result["chunks_processed"],
+                                "filename": os.path.basename(file_path)
+                            },
+                            "analysis_mode": "streaming",
+                            "analysis_results": simplified_result
+                        }
+                    }
+                
+                sampling = args.get("sampling")
+                if sampling and analysis_type not in _SAMPLED_ANALYSIS_TYPES:
+                    return {"type": "error", "content": f"抽样模式不支持 {analysis_type} 分析：该分析依赖相邻行或行位置，"
+                                                        f"抽样数据上的结果不是原文件指标的估计，无法给出误差范围；"
+                                                        f"请去掉 sampling 做精确分析"}
+                if sampling and analysis_type == "outlier" and args.get("method", "iqr") not in _SAMPLED_OUTLIER_METHODS:
+                    return {"type": "error", "content": f"抽样模式不支持 {args.get('method')} 异常检测：该方法按相邻行的滚动窗口判定，"
+                                                        f"抽样数据上的结果不是原文件的估计；请改用 iqr/zscore/mad，"
+                                                        f"或去掉 sampling 做精确分析"}
+                if sampling:
+                    # 抽样模式：只读取代表性样本跑同样的分析，结果附带样本量和误差范围
+                    method = sampling if sampling in ("stratified", "reservoir") else "stratified"
+                    df, meta = read_csv_sample(file_path, args.get("sample_rows", 20000), method)
+                else:
+                    # 读取数据（数值列发布到共享内存，并行分析时工作进程直接挂载）
+                    df, meta, shared_key = read_csv_shared(file_path)
+                workers = args.get("workers", 1)
                 
                 # 根据分析类型调用相应方法
                 if analysis_type == "comprehensive":
-                    result = analyzer.comprehensive_analysis(df, columns, time_column)
+                    result = analyzer.comprehensive_analysis(df, columns, time_column, workers)
+                    if sampling:
+                        # 稳定性（滚动窗口、相邻变化率）及由其得出的摘要依赖相邻行，抽样模式不输出
+                        result.pop("stability_analysis", None)
+                        result.pop("summary", None)
+                        if not time_column:
+                            result["trend_analysis"] = _sampled_row_trend(analyzer, df, columns)
                     # 精简综合分析结果
                     simplified_result = _simplify_comprehensive_analysis(result)
+                    if sampling:
+                        del simplified_result["summary"], simplified_result["key_metrics_stability"]
                 elif analysis_type == "statistics":
-                    result = analyzer.basic_statistics(df, columns)
+                    result = analyzer.basic_statistics(df, columns, args.get("quantile_mode", "exact"),
+                                                       args.get("quantile_error", 0.01), workers)
                     simplified_result = _simplify_statistics(result)
+                    if args.get("confidence_intervals") and not sampling:
+                        # 抽样模式下置信区间在下方统一计算并附加，这里不重复计算
+                        intervals = analyzer.bootstrap_confidence_intervals(
+                            df, columns, resamples=args.get("resamples", DataAnalyzer.BOOTSTRAP_RESAMPLES),
+                            confidence=args.get("confidence", 0.95))
+                        _attach_confidence_intervals(simplified_result, intervals)
                 elif analysis_type == "stability":
-                    result = analyzer.stability_analysis(df, columns)
-                    simplified_result = _simplify_stability_analysis(result)
+                    if args.get("window_sizes"):
+                        # 多窗口对比：一次遍历得到各窗口下的稳定性
+                        result = analyzer.multi_window_stability(df, columns, args["window_sizes"], workers)
+                        simplified_result = _simplify_stability_analysis({
+                            f"{metric}[窗口{window}]": data
+                            for metric, per_window in result.items()
+                            for window, data in per_window.items()
+                        })
+                    else:
+                        result = analyzer.stability_analysis(df, columns, args.get("window_size", 10), workers)
+                        simplified_result = _simplify_stability_analysis(result)
                 elif analysis_type == "trend":
-                    result = analyzer.trend_analysis(df, columns, time_column)
+                    if sampling and not time_column:
+                        result = _sampled_row_trend(analyzer, df, columns)
+                    else:
+                        result = analyzer.trend_analysis(df, columns, time_column, workers)
                     simplified_result = _simplify_trend_analysis(result)
                 elif analysis_type == "outlier":
-                    result = analyzer.outlier_detection(df, columns)
+                    result = analyzer.outlier_detection(df, columns, args.get("method", "iqr"), args.get("threshold"),
+                                                        args.get("quantile_mode", "exact"), args.get("quantile_error", 0.01),
+                                                        args.get("window_size", 7), workers)
                     simplified_result = _simplify_outlier_detection(result)
+                elif analysis_type == "changepoint":
+                    result = analyzer.change_point_detection(df, columns, time_column, args.get("model", "linear"),
+                                                             args.get("penalty"), args.get("min_size"),
+                                                             args.get("max_change_points", 20))
+                    simplified_result = _simplify_change_points(result)
+                elif analysis_type == "correlation":
+                    result = analyzer.correlation_analysis(df, columns, time_column, args.get("top_k", 10),
+                                                           args.get("precision", "float64"), args.get("lag_pairs"),
+                                                           args.get("max_lag"))
+                    simplified_result = _simplify_correlation_analysis(result)
+                elif analysis_type == "periodicity":
+                    result = analyzer.periodicity_analysis(df, columns, time_column, args.get("min_period"),
+                                                           args.get("max_period"), args.get("min_strength", 0.3))
+                    simplified_result = _simplify_periodicity_analysis(result)
                 else:
                     return {"type": "error", "content": f"未识别的分析类型：{analysis_type}"}
                 
+                data = {
+                    "analysis_type": analysis_type,
+                    "file_path": file_path,
+                    "file_metadata": meta,
+                    "analysis_results": simplified_result
+                }
+                if sampling:
+                    intervals = analyzer.bootstrap_confidence_intervals(
+                        df, columns, resamples=args.get("resamples", DataAnalyzer.BOOTSTRAP_RESAMPLES),
+                        confidence=args.get("confidence", 0.95))
+                    confidence = args.get("confidence", 0.95)
+                    data["analysis_mode"] = "sampled"
+                    data["sampling"] = _sampling_summary(meta, intervals)
+                    if analysis_type == "statistics":
+                        _attach_confidence_intervals(simplified_result, intervals)
+                    elif analysis_type == "outlier":
+                        _attach_proportion_intervals(simplified_result.values(), meta["rows"], confidence)
+                    elif analysis_type == "trend":
+                        _attach_slope_intervals(simplified_result, result, confidence)
+                    else:
+                        _attach_confidence_intervals(simplified_result["key_metrics_statistics"], intervals)
+                        _attach_slope_intervals(simplified_result["key_metrics_trends"], result["trend_analysis"],
+                                                confidence)
+                        _attach_proportion_intervals(simplified_result["outlier_summary"]["top_outlier_metrics"],
+                                                     meta["rows"], confidence, key="percentage")
+                        data["sampling"]["omitted"] = ["stability_analysis", "summary"]
                 return {
                     "type": "tool_result",
                     "tool": "data_analysis",
-                    "data": {
-                        "analysis_type": analysis_type,
-                        "file_path": file_path,
-                        "file_metadata": meta,
-                        "analysis_results": simplified_result
-                    }
+                    "data": data
                 }
             except Exception as e:
                 return {"type": "error", "content": f"数据分析失败：{str(e)}"}
+            finally:
+                if shared_key is not None:
+                    data_plane.release(shared_key)
 
         elif tool == "batch_comparison":
             analyzer = DataAnalyzer()
@@ -129,29 +243,45 @@ def dispatch_gpt_response(gpt_reply: str):
             if not batch1_path or not batch2_path:
                 return {"type": "error", "content": "batch_comparison 工具需要 batch1_path 和 batch2_path 参数"}
             
+            shared_keys = []
             try:
                 # 读取两个批次的数据
-                df1, meta1 = read_csv_clean(batch1_path)
-                df2, meta2 = read_csv_clean(batch2_path)
+                df1, meta1, key1 = read_csv_shared(batch1_path)
+                shared_keys.append(key1)
+                df2, meta2, key2 = read_csv_shared(batch2_path)
+                shared_keys.append(key2)
                 
-                # 执行批次对比分析
-                result = analyzer.batch_comparison(df1, df2, columns, batch1_name, batch2_name)
+                # 执行批次对比分析（均值差的自助法置信区间只在要求时计算）
+                resamples = args.get("resamples", DataAnalyzer.BOOTSTRAP_RESAMPLES) if args.get("confidence_intervals") else 0
+                result = analyzer.batch_comparison(df1, df2, columns, batch1_name, batch2_name,
+                                                   resamples, args.get("confidence", 0.95))
                 
                 # 精简批次对比结果用于GPT处理
                 simplified_result = _simplify_batch_comparison(result)
                 
+                data = {
+                    "batch1_metadata": {"filename": meta1.get("filename", ""), "rows": meta1.get("rows", 0)},
+                    "batch2_metadata": {"filename": meta2.get("filename", ""), "rows": meta2.get("rows", 0)},
+                    "analysis_results": result,  # 完整结果用于右侧面板显示
+                    "comparison_results": simplified_result  # 精简结果用于GPT分析
+                }
+                # 曲线对齐：DTW 规整后逐点对比，完整路径和逐点差值只用于右侧面板
+                if args.get("align"):
+                    alignment = analyzer.batch_alignment(df1, df2, columns, args.get("time_column"), batch1_name,
+                                                         batch2_name, args.get("grid_points", 2000), args.get("band", 0.1))
+                    data["alignment_results"] = alignment
+                    simplified_result["curve_alignment"] = _simplify_batch_alignment(alignment)
+                
                 return {
                     "type": "tool_result",
                     "tool": "batch_comparison",
-                    "data": {
-                        "batch1_metadata": {"filename": meta1.get("filename", ""), "rows": meta1.get("rows", 0)},
-                        "batch2_metadata": {"filename": meta2.get("filename", ""), "rows": meta2.get("rows", 0)},
-                        "analysis_results": result,  # 完整结果用于右侧面板显示
-                        "comparison_results": simplified_result  # 精简结果用于GPT分析
-                    }
+                    "data": data
                 }
             except Exception as e:
                 return {"type": "error", "content": f"批次对比分析失败：{str(e)}"}
+            finally:
+                for key in shared_keys:
+                    data_plane.release(key)
 
         elif tool == "multi_batch_analysis":
             analyzer = DataAnalyzer()
@@ -164,13 +294,15 @@ def dispatch_gpt_response(gpt_reply: str):
             if not batch_paths or len(batch_paths) < 2:
                 return {"type": "error", "content": "multi_batch_analysis 工具需要至少2个批次路径"}
             
+            shared_keys = []
             try:
                 # 读取所有批次数据
                 batch_data = []
                 batch_metadata = []
                 
                 for i, path in enumerate(batch_paths):
-                    df, meta = read_csv_clean(path)
+                    df, meta, key = read_csv_shared(path)
+                    shared_keys.append(key)
                     batch_name = batch_names[i] if i < len(batch_names) else f"批次{i+1}"
                     batch_data.append((df, batch_name))
                     batch_metadata.append({
@@ -182,13 +314,15 @@ def dispatch_gpt_response(gpt_reply: str):
                 # 执行多批次分析
                 if analysis_type == "stability_trend":
                     # 分析所有批次的稳定性变化趋势（使用全面对比分析）
-                    result = _analyze_multi_batch_comprehensive_comparison(analyzer, batch_data, columns)
+                    result = _analyze_multi_batch_comprehensive_comparison(analyzer, batch_data, columns,
+                                                                           args.get("workers", 1))
                 elif analysis_type == "outlier_detection":
                     # 找出异常批次
-                    result = _analyze_multi_batch_outliers(analyzer, batch_data, columns)
+                    result = _analyze_multi_batch_outliers(analyzer, batch_data, columns, args.get("top_k", 3))
                 elif analysis_type == "comprehensive":
                     # 全面分析所有批次（包括所有统计指标对比）
-                    result = _analyze_multi_batch_comprehensive_comparison(analyzer, batch_data, columns)
+                    result = _analyze_multi_batch_comprehensive_comparison(analyzer, batch_data, columns,
+                                                                           args.get("workers", 1))
                 else:
                     return {"type": "error", "content": f"未识别的多批次分析类型：{analysis_type}"}
                 
@@ -204,6 +338,98 @@ def dispatch_gpt_response(gpt_reply: str):
                 }
             except Exception as e:
                 return {"type": "error", "content": f"多批次分析失败：{str(e)}"}
+            finally:
+                for key in shared_keys:
+                    data_plane.release(key)
+
+        elif tool == "multi_batch_comparison":
+            analyzer = DataAnalyzer()
+            batch_paths = args.get("batch_paths", [])
+            batch_names = args.get("batch_names", [])
+            columns = args.get("columns")
+            alpha = args.get("alpha", 0.05)
+            
+            if not batch_paths or len(batch_paths) < 2:
+                return {"type": "error", "content": "multi_batch_comparison 工具需要至少2个批次路径"}
+            
+            shared_keys = []
+            try:
+                # 每个批次只读取一次
+                batch_data = []
+                batch_metadata = []
+                for i, path in enumerate(batch_paths):
+                    df, meta, key = read_csv_shared(path)
+                    shared_keys.append(key)
+                    batch_name = batch_names[i] if i < len(batch_names) else f"批次{i+1}"
+                    batch_data.append((df, batch_name))
+                    batch_metadata.append({
+                        "filename": meta.get("filename", ""),
+                        "rows": meta.get("rows", 0),
+                        "batch_name": batch_name
+                    })
+                
+                result = analyzer.multi_batch_comparison(batch_data, columns, alpha)
+                
+                return {
+                    "type": "tool_result",
+                    "tool": "multi_batch_comparison",
+                    "data": {
+                        "batch_metadata": batch_metadata,
+                        "total_batches": len(batch_paths),
+                        "analysis_results": result,  # 完整两两矩阵用于右侧面板显示
+                        "comparison_summary": _simplify_multi_batch_comparison(result)  # 精简结果用于GPT分析
+                    }
+                }
+            except Exception as e:
+                return {"type": "error", "content": f"多批次显著性对比失败：{str(e)}"}
+            finally:
+                for key in shared_keys:
+                    data_plane.release(key)
+
+        elif tool == "spc_analysis":
+            analyzer = DataAnalyzer()
+            batch_paths = args.get("batch_paths") or ([args["file_path"]] if args.get("file_path") else [])
+            batch_names = args.get("batch_names", [])
+            
+            if not batch_paths:
+                return {"type": "error", "content": "spc_analysis 工具需要 batch_paths 或 file_path 参数"}
+            
+            shared_keys = []
+            try:
+                # 每个批次只读取一次，按给出的顺序首尾相接构成控制图序列
+                batch_data = []
+                batch_metadata = []
+                for i, path in enumerate(batch_paths):
+                    df, meta, key = read_csv_shared(path)
+                    shared_keys.append(key)
+                    batch_name = batch_names[i] if i < len(batch_names) else f"批次{i+1}"
+                    batch_data.append((df, batch_name))
+                    batch_metadata.append({
+                        "filename": meta.get("filename", ""),
+                        "rows": meta.get("rows", 0),
+                        "batch_name": batch_name
+                    })
+                
+                result = analyzer.spc_analysis(batch_data, args.get("columns"), args.get("spec_limits"),
+                                               args.get("ewma_lambda", 0.2), args.get("ewma_width", 3.0),
+                                               args.get("cusum_k", 0.5), args.get("cusum_h", 5.0),
+                                               args.get("baseline_batches"), args.get("alarm_tolerance", 0.05))
+                
+                return {
+                    "type": "tool_result",
+                    "tool": "spc_analysis",
+                    "data": {
+                        "batch_metadata": batch_metadata,
+                        "total_batches": len(batch_paths),
+                        "analysis_results": result,  # 逐批次完整结果用于右侧面板显示
+                        "spc_summary": _simplify_spc_analysis(result)  # 精简结果用于GPT分析
+                    }
+                }
+            except Exception as e:
+                return {"type": "error", "content": f"SPC 控制图分析失败：{str(e)}"}
+            finally:
+                for key in shared_keys:
+                    data_plane.release(key)
 
         elif tool == "time_series_analysis":
             print("🔧 [DEBUG] 开始时间序列分析")
@@ -219,17 +445,44 @@ def dispatch_gpt_response(gpt_reply: str):
             if not file_path:
                 return {"type": "error", "content": "time_series_analysis 工具需要 file_path 参数"}
             
+            # 区间查询：由预先计算的多分辨率金字塔提供，已构建时不再读取 CSV
+            if args.get("row_range") or args.get("time_range"):
+                try:
+                    pyramid = _ensure_pyramid(file_path, time_column)
+                    result = _time_series_range(pyramid, columns, args.get("row_range"), args.get("time_range"),
+                                                args.get("max_points", 100))
+                    return {
+                        "type": "tool_result",
+                        "tool": "time_series_analysis",
+                        "data": {
+                            "file_path": file_path,
+                            "file_metadata": {"filename": os.path.basename(file_path), "rows": pyramid.rows},
+                            "analysis_results": result
+                        }
+                    }
+                except Exception as e:
+                    return {"type": "error", "content": f"时间序列区间查询失败：{str(e)}"}
+            
+            shared_key = None
             try:
                 # 读取数据
                 print(f"🔧 [DEBUG] 正在读取文件: {file_path}")
-                df, meta = read_csv_clean(file_path)
+                df, meta, shared_key = read_csv_shared(file_path)
                 print(f"🔧 [DEBUG] 数据读取成功，形状: {df.shape}")
                 
                 # 时间序列分析
                 print("🔧 [DEBUG] 开始执行时间序列分析")
-                result = _analyze_time_series(analyzer, df, columns, time_column)
+                result = _analyze_time_series(analyzer, df, columns, time_column,
+                                              args.get("max_points", 100), args.get("downsample", "lttb"),
+                                              args.get("resample"))
                 print(f"🔧 [DEBUG] 时间序列分析完成，分析结果数量: {len(result.get('series_analysis', {}))}")
                 
+                # 顺带构建金字塔，之后的区间缩放直接读取金字塔（失败不影响本次分析）
+                try:
+                    result['pyramid_path'] = _ensure_pyramid(file_path, time_column, df, shared_key).folder
+                except Exception as e:
+                    print(f"🔧 [DEBUG] 金字塔构建失败: {str(e)}")
+                
                 print("🔧 [DEBUG] 返回时间序列分析结果")
                 return {
                     "type": "tool_result",
@@ -243,6 +496,86 @@ def dispatch_gpt_response(gpt_reply: str):
             except Exception as e:
                 print(f"🔧 [DEBUG] 时间序列分析异常: {str(e)}")
                 return {"type": "error", "content": f"时间序列分析失败：{str(e)}"}
+            finally:
+                if shared_key is not None:
+                    data_plane.release(shared_key)
+
+        elif tool == "spectral_analysis":
+            analyzer = DataAnalyzer()
+            file_path = args.get("file_path")
+            columns = args.get("columns")
+            time_column = args.get("time_column")
+            
+            if not file_path:
+                return {"type": "error", "content": "spectral_analysis 工具需要 file_path 参数"}
+            
+            options = {
+                "sample_rate": args.get("sample_rate"),
+                "nperseg": args.get("nperseg", 1024),
+                "bands": args.get("bands"),
+                "peak_count": args.get("peak_count", 5)
+            }
+            shared_key = None
+            try:
+                if args.get("streaming"):
+                    # 流式模式：逐块累加周期图，不把整个文件读入内存
+                    chunks = read_csv_chunks(file_path, chunksize=args.get("chunk_size", 100000))
+                    result = analyzer.streaming_spectral_analysis(chunks, columns, time_column, **options)
+                    meta = {"filename": os.path.basename(file_path), "rows": result["rows_processed"]}
+                else:
+                    df, meta, shared_key = read_csv_shared(file_path)
+                    result = analyzer.spectral_analysis(df, columns, time_column, **options)
+                
+                return {
+                    "type": "tool_result",
+                    "tool": "spectral_analysis",
+                    "data": {
+                        "file_path": file_path,
+                        "file_metadata": meta,
+                        "analysis_results": result,  # 完整功率谱用于右侧面板绘图
+                        "spectral_summary": _simplify_spectral_analysis(result)  # 精简峰值摘要用于GPT分析
+                    }
+                }
+            except Exception as e:
+                return {"type": "error", "content": f"频谱分析失败：{str(e)}"}
+            finally:
+                if shared_key is not None:
+                    data_plane.release(shared_key)
+
+        elif tool == "similar_batches":
+            analyzer = DataAnalyzer()
+            file_path = args.get("file_path")
+            columns = args.get("columns")
+            time_column = args.get("time_column")
+            
+            if not file_path:
+                return {"type": "error", "content": "similar_batches 工具需要 file_path 参数"}
+            
+            try:
+                index = BatchIndex()
+                # 历史批次：显式列出的文件与目录下的 CSV，已索引且未修改的文件不再重复计算指纹
+                history = list(args.get("history_paths", []))
+                if args.get("history_dir"):
+                    history += [info["file_path"] for info in scan_directory(args["history_dir"])
+                                if info["extension"] == ".csv"]
+                newly_indexed = _index_batches(analyzer, index, history + [file_path], columns, time_column)
+                
+                i = index.find(file_path)
+                query = index.batches[i]
+                similar = index.search(_stored_fingerprint(index, i), args.get("k", 5), exclude_path=file_path)
+                
+                return {
+                    "type": "tool_result",
+                    "tool": "similar_batches",
+                    "data": {
+                        "query_batch": {"name": query["name"], "path": query["path"], "rows": query["rows"]},
+                        "index_size": len(index),
+                        "newly_indexed": newly_indexed,
+                        "similar_batches": similar
+                    }
+                }
+            except Exception as e:
+                return {"type": "error", "content": f"相似批次检索失败：{str(e)}"}
 
         elif tool == "noop":
             return {"type": "noop", "content": data.get("reply", "")}
@@ -252,6 +585,34 @@ def dispatch_gpt_response(gpt_reply: str):
     except Exception as e:
         return {"type": "error", "content": f"工具调用异常：{str(e)}"}
 
+def _index_batches(analyzer, index, paths, columns=None, time_column=None):
+    """为未索引或已修改的文件计算批次指纹并写入索引，返回新登记的文件数"""
+    added = 0
+    for path in dict.fromkeys(paths):
+        if index.is_current(path):
+            continue
+        df, meta, key = read_csv_shared(path)
+        try:
+            fingerprint = analyzer.batch_fingerprint(df, columns, time_column)
+        finally:
+            data_plane.release(key)
+        name = os.path.splitext(os.path.basename(path))[0]
+        index.add(name, path, fingerprint, meta.get("rows", len(df)))
+        added += 1
+    if added:
+        index.save()
+    return added
+
+def _stored_fingerprint(index, i):
+    """从索引矩阵取回第 i 个批次的指纹 {列名: {特征名: 值}}（缺失的特征跳过）"""
+    import numpy as np
+    row = index.matrix()[i]
+    fingerprint = {}
+    for (col, feature), value in zip(index.features, row):
+        if not np.isnan(value):
+            fingerprint.setdefault(col, {})[feature] = float(value)
+    return fingerprint
+
 def _simplify_comprehensive_analysis(result):
     """精简综合分析结果，保留关键信息"""
     simplified = {
@@ -337,6 +698,79 @@ def _simplify_statistics(result):
             "cv": round(data.get("cv", 0), 4),
             "range": [data.get("min", 0), data.get("max", 0)]
         }
+        if "quantile_mode" in data:
+            simplified[metric]["median"] = round(data.get("median", 0), 4)
+            simplified[metric]["quantile_mode"] = data["quantile_mode"]
+            simplified[metric]["quantile_rank_error"] = round(data.get("quantile_rank_error", 0), 4)
+    return simplified
+
+def _attach_confidence_intervals(simplified, intervals):
+    """把自助法置信区间并入精简统计结果：{列名: {..., "ci": {统计量: [下限, 上限]}}}"""
+    for metric, data in intervals.items():
+        if metric in simplified:
+            simplified[metric]["ci"] = {name: [round(data[name]["lower"], 4), round(data[name]["upper"], 4)]
+                                        for name in ("mean", "median", "cv") if name in data}
+            simplified[metric]["ci_confidence"] = data["confidence"]
+    return simplified
+
+# 抽样模式能为结果给出误差范围的分析类型（稳定性、变点、相关滞后、周期依赖相邻行或行位置）
+_SAMPLED_ANALYSIS_TYPES = ("comprehensive", "statistics", "trend", "outlier")
+# 抽样模式可用的逐点异常检测方法（hampel 依赖相邻行的滚动窗口；comprehensive 的异常段固定为 iqr）
+_SAMPLED_OUTLIER_METHODS = ("iqr", "zscore", "mad")
+# 抽样趋势按原文件行号回归时临时加入的横坐标列
+_SAMPLE_ROW_COLUMN = "__原文件行号__"
+
+def _sampling_summary(meta, intervals):
+    """抽样分析的说明：样本量、总行数（分层抽样为估计值）、抽样比例，以及各列均值/中位数/变异系数的置信区间"""
+    return {
+        "method": meta["sample_method"],
+        "sample_rows": meta["rows"],
+        "total_rows": meta["total_rows"],
+        "total_rows_estimated": meta["total_rows_estimated"],
+        "sampling_fraction": round(meta["sampling_fraction"], 6),
+        "error_bounds": {
+            metric: {name: [round(data[name]["lower"], 4), round(data[name]["upper"], 4)]
+                     for name in ("mean", "median", "cv") if name in data}
+            for metric, data in intervals.items()
+        },
+        "confidence": next(iter(intervals.values()))["confidence"] if intervals else None,
+        "note": "结果基于抽样数据，为近似值，出现频率极低的极端值可能未被抽到；去掉 sampling 参数即可对全量数据做精确分析"
+    }
+
+def _attach_proportion_intervals(entries, sample_rows, confidence, key="outlier_percentage"):
+    """抽样异常检测：异常占比（百分比，字段名 key）按 Wilson 得分区间给出置信区间 [下限, 上限]，写入 {key}_interval
+    （样本中没有异常点时仍给出非零上限，约为 z²/n）"""
+    from statistics import NormalDist
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    n = max(sample_rows, 1)
+    for data in entries:
+        p = data[key] / 100
+        scale = 1 + z * z / n
+        center = (p + z * z / (2 * n)) / scale
+        half = z / scale * (p * (1 - p) / n + z * z / (4 * n * n)) ** 0.5
+        data[f"{key}_interval"] = [round(100 * max(center - half, 0.0), 4), round(100 * min(center + half, 1.0), 4)]
+    return entries
+
+def _sampled_row_trend(analyzer, df, columns):
+    """抽样数据没有时间列时，以样本行在原文件中的行号（read_csv_sample 的索引）为横坐标做趋势回归"""
+    positioned = df.assign(**{_SAMPLE_ROW_COLUMN: df.index.to_numpy(dtype=float)})
+    result = analyzer.trend_analysis(positioned, columns, _SAMPLE_ROW_COLUMN)
+    for data in result.values():
+        data["slope_unit"] = "每行"
+    return result
+
+def _attach_slope_intervals(simplified, trends, confidence):
+    """抽样趋势分析：由样本回归的标准误给出斜率及其置信区间（正态近似，样本量通常上千）"""
+    from statistics import NormalDist
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    for metric, data in simplified.items():
+        trend = trends.get(metric)
+        if not trend or "slope" not in trend:
+            continue
+        slope, std_err = trend["slope"], trend["std_err"]
+        data["slope"] = float(f"{slope:.4g}")
+        data["slope_ci"] = [float(f"{slope - z * std_err:.4g}"), float(f"{slope + z * std_err:.4g}")]
+        data["slope_unit"] = trend.get("slope_unit", "每行")
     return simplified
 
 def _simplify_stability_analysis(result):
@@ -375,6 +809,81 @@ def _simplify_outlier_detection(result):
             "outlier_percentage": round(data.get("outlier_percentage", 0), 2),
             "has_outliers": data.get("outlier_count", 0) > 0
         }
+        if data.get("top_outliers"):
+            # 只保留偏离最大的3个
+            simplified[metric]["top_outliers"] = [
+                {"index": item["index"], "value": round(item["value"], 4)} for item in data["top_outliers"][:3]
+            ]
+        if "quantile_mode" in data:
+            simplified[metric]["quantile_mode"] = data["quantile_mode"]
+            simplified[metric]["quantile_rank_error"] = round(data.get("quantile_rank_error", 0), 4)
+    return simplified
+
+def _simplify_change_points(result):
+    """精简变点检测结果：变点位置/时间与主要贡献通道，各段的阶段类型、均值、标准差和斜率"""
+    return {
+        "model": result["model"],
+        "slope_unit": result["slope_unit"],
+        "change_point_count": len(result["change_points"]),
+        "change_points": [{
+            "position": point["position"],
+            "time": point["time"],
+            "main_channels": [col for col, share in sorted(point["contributions"].items(),
+                                                           key=lambda item: -item[1])[:3] if share > 0]
+        } for point in result["change_points"]],
+        "segments": [{
+            "segment": segment["segment"],
+            "start_time": segment["start_time"],
+            "end_time": segment["end_time"],
+            "duration": round(segment["duration"], 2),
+            "channels": {col: {
+                "phase": data["phase"],
+                "mean": round(data["mean"], 4),
+                "std": round(data["std"], 4),
+                "slope": float(f"{data['slope']:.4g}")
+            } for col, data in segment["channels"].items()}
+        } for segment in result["segments"]]
+    }
+
+def _simplify_correlation_analysis(result):
+    """精简相关分析结果：只保留最强的通道对和滞后估计（不含完整相关矩阵）"""
+    return {
+        "channel_count": len(result["columns"]),
+        "top_pairs": [{"pair": item["pair"], "correlation": round(item["correlation"], 4)}
+                      for item in result["top_pairs"]],
+        "lags": [{
+            "pair": item["pair"],
+            "lag": item["lag"],
+            "lag_seconds": round(item["lag_seconds"], 4) if item["lag_seconds"] is not None else None,
+            "correlation_at_lag": round(item["correlation_at_lag"], 4),
+            "zero_lag_correlation": round(item["zero_lag_correlation"], 4)
+        } for item in result["lags"]]
+    }
+
+def _simplify_periodicity_analysis(result):
+    """精简周期性分析结果：每个通道的周期、强度、循环数、首末循环均值/幅值和循环间漂移（不含逐循环明细）"""
+    simplified = {}
+    for col, data in result["channels"].items():
+        if "error" in data:
+            simplified[col] = {"error": data["error"]}
+            continue
+        item = {
+            "periodic": data["periodic"],
+            "period_rows": round(data["period"], 2) if data["period"] is not None else None,
+            "period_seconds": round(data["period_seconds"], 2) if data["period_seconds"] is not None else None,
+            "strength": round(data["strength"], 4)
+        }
+        if data.get("cycle_count"):
+            cycles, drift = data["cycles"], data["drift"]
+            item.update({
+                "cycle_count": data["cycle_count"],
+                "first_cycle": {"mean": round(cycles["mean"][0], 4), "amplitude": round(cycles["amplitude"][0], 4)},
+                "last_cycle": {"mean": round(cycles["mean"][-1], 4), "amplitude": round(cycles["amplitude"][-1], 4)},
+                "mean_drift_per_cycle": float(f"{drift['mean_slope_per_cycle']:.4g}"),
+                "amplitude_drift_per_cycle": float(f"{drift['amplitude_slope_per_cycle']:.4g}"),
+                "relative_change": round(drift["relative_change"], 2)
+            })
+        simplified[col] = item
     return simplified
 
 def _simplify_batch_comparison(result):
@@ -408,8 +917,11 @@ def _simplify_batch_comparison(result):
                 "mean_change_percent": round(data.get("mean_change_percent", 0), 2),
                 "stability_comparison": data.get("stability_comparison", ""),
                 "improvement": improvement,
-                "significant": data.get("significant_difference", False)
+                "significant": data.get("significant_difference", False),
+                "effect_size": data.get("effect_size", "")
             })
+            if "mean_difference_ci" in data:
+                key_metrics[-1]["mean_difference_ci"] = [float(f"{bound:.4g}") for bound in data["mean_difference_ci"]]
     
     simplified["comparison_summary"] = {
         "total_metrics": len(comparison),
@@ -421,30 +933,127 @@ def _simplify_batch_comparison(result):
     
     return simplified
 
-def _analyze_multi_batch_comprehensive_comparison(analyzer, batch_data, columns):
+def _simplify_batch_alignment(result):
+    """精简曲线对齐结果：时间偏移和各通道对齐后/未对齐的差值（不含路径和逐点差值）"""
+    simplified = {
+        "dtw_distance": round(result["dtw_distance"], 4),
+        "row_shift": dict(result["row_shift"], mean=round(result["row_shift"]["mean"], 2)),
+        "columns": {col: {
+            "mean_delta": round(data["mean_delta"], 4),
+            "rms_delta": round(data["rms_delta"], 4),
+            "max_abs_delta": round(data["max_abs_delta"], 4),
+            "unaligned_rms_delta": round(data["unaligned_rms_delta"], 4)
+        } for col, data in result["columns"].items()}
+    }
+    if "time_shift_seconds" in result:
+        simplified["time_shift_seconds"] = round(result["time_shift_seconds"], 2)
+    return simplified
+
+def _simplify_multi_batch_comparison(result, top_pairs=3):
+    """精简多批次显著性对比结果：每个指标只保留检验结论和差异最大的几对批次"""
+    import numpy as np
+    
+    names = result.get("batch_names", [])
+    pairwise_alpha = result.get("pairwise_alpha", 0.05)
+    simplified = {
+        "batch_names": names,
+        "pairwise_alpha": round(pairwise_alpha, 6),
+        "metrics": {},
+        "significant_metrics": []
+    }
+    
+    for metric, data in result.get("comparison", {}).items():
+        anova = data.get("anova", {})
+        kruskal = data.get("kruskal_wallis", {})
+        p_values = np.array(data["pairwise"]["p_value"], dtype=float)
+        effects = np.array(data["pairwise"]["cohens_d"], dtype=float)
+        
+        # 上三角的两两比较，按效应量绝对值取差异最大的几对
+        upper_i, upper_j = np.triu_indices(len(names), k=1)
+        magnitude = np.nan_to_num(np.abs(effects[upper_i, upper_j]), nan=-1)
+        order = np.argsort(-magnitude, kind='stable')[:top_pairs]
+        pairs = [{
+            "batches": [names[upper_i[k]], names[upper_j[k]]],
+            "cohens_d": round(float(effects[upper_i[k], upper_j[k]]), 3),
+            "significant": bool(p_values[upper_i[k], upper_j[k]] < pairwise_alpha)
+        } for k in order]
+        
+        simplified["metrics"][metric] = {
+            "anova_p": round(anova.get("p_value", float("nan")), 6),
+            "kruskal_p": round(kruskal.get("p_value", float("nan")), 6),
+            "significant": bool(anova.get("significant") or kruskal.get("significant")),
+            "significant_pairs": int((p_values[upper_i, upper_j] < pairwise_alpha).sum()),
+            "largest_differences": pairs
+        }
+        if simplified["metrics"][metric]["significant"]:
+            simplified["significant_metrics"].append(metric)
+    
+    simplified["total_metrics"] = len(simplified["metrics"])
+    return simplified
+
+# 多批次指标：(输出名称, 分析段, 字段, 优劣方向)，方向 1 为越大越好、-1 为越小越好、None 不评优劣
+_MULTI_BATCH_METRICS = [
+    ('mean', 'basic_statistics', 'mean', 1),
+    ('std', 'basic_statistics', 'std', -1),  # 标准差越小越好
+    ('cv', 'basic_statistics', 'cv', -1),  # 变异系数越小越好
+    ('min', 'basic_statistics', 'min', None),
+    ('max', 'basic_statistics', 'max', None),
+    ('stability_index', 'stability_analysis', 'stability_index', 1),
+    ('outlier_count', 'outlier_detection', 'outlier_count', -1)  # 异常值越少越好
+]
+
+def _simplify_spectral_analysis(result, top_peaks=3):
+    """精简频谱分析结果：每个通道的 RMS、前几个主频和能量占比最高的频带（不含完整功率谱）"""
+    simplified = {
+        "sample_rate": round(result["sample_rate"], 4),
+        "sample_rate_source": result["sample_rate_source"],
+        "frequency_unit": result["frequency_unit"],
+        "frequency_resolution": round(result["frequency_resolution"], 6),
+        "channels": {}
+    }
+    for col, channel in result["channels"].items():
+        bands = channel["band_energy"]
+        main_band = max(bands, key=lambda band: band["ratio"]) if bands else None
+        simplified["channels"][col] = {
+            "rms": round(channel["rms"], 4),
+            "peaks": [{"frequency": round(peak["frequency"], 3), "psd": float(f"{peak['psd']:.4g}")}
+                      for peak in channel["dominant_frequencies"][:top_peaks]],
+            "main_band": {"band": [round(edge, 3) for edge in main_band["band"]],
+                          "ratio": round(main_band["ratio"], 4)} if main_band else None
+        }
+    return simplified
+
+def _simplify_spc_analysis(result):
+    """精简 SPC 结果：每个通道的中心线、σ、过程能力、报警次数和失控批次（不含逐批次明细）"""
+    simplified = {"total_rows": result["rows_processed"], "channels": {}}
+    for col, channel in result["channels"].items():
+        if "error" in channel:
+            simplified["channels"][col] = channel
+            continue
+        capability = channel["capability"]
+        simplified["channels"][col] = {
+            "center": round(channel["center"], 4),
+            "sigma": float(f"{channel['sigma_within']:.4g}"),
+            "ewma_alarms": channel["ewma"]["alarms"],
+            "cusum_alarms": channel["cusum"]["alarms"],
+            "first_alarm": channel["cusum"]["first_alarm"] or channel["ewma"]["first_alarm"],
+            "rules": channel["rules"],
+            "capability": {key: round(capability[key], 3) for key in ("cp", "cpk", "pp", "ppk")
+                           if capability[key] is not None} if capability else None,
+            "out_of_control_batches": channel["out_of_control_batches"]
+        }
+    return simplified
+
+def _analyze_multi_batch_comprehensive_comparison(analyzer, batch_data, columns, workers=1):
     """全面的多批次对比分析（支持所有统计指标）"""
     import numpy as np
     
     batch_comprehensive_data = {}
     multi_metrics_trends = {}
     
-    # 为每个批次进行全面分析
+    # 为每个批次计算四个分析段（不需要数据质量与摘要）
     for df, batch_name in batch_data:
-        # 获取全面的分析结果
-        comprehensive_result = analyzer.comprehensive_analysis(df, columns, None)
-        
-        # 提取各类指标
-        basic_stats = comprehensive_result.get('basic_statistics', {})
-        stability_analysis = comprehensive_result.get('stability_analysis', {})
-        trend_analysis = comprehensive_result.get('trend_analysis', {})
-        outlier_detection = comprehensive_result.get('outlier_detection', {})
-        
-        batch_comprehensive_data[batch_name] = {
-            'basic_statistics': basic_stats,
-            'stability_analysis': stability_analysis,
-            'trend_analysis': trend_analysis,
-            'outlier_detection': outlier_detection
-        }
+        batch_comprehensive_data[batch_name] = analyzer.section_analysis(df, columns, None, workers)
     
     # 获取要分析的列
     if columns:
@@ -452,123 +1061,53 @@ def _analyze_multi_batch_comprehensive_comparison(analyzer, batch_data, columns)
     else:
         target_columns = [col for col in batch_data[0][0].columns if batch_data[0][0][col].dtype in ['int64', 'float64']][:10]
     
-    # 对每个指标进行多批次对比分析
-    for column in target_columns:
-        batch_names = []
-        
-        # 收集各类指标数据
-        means = []
-        stds = []
-        mins = []
-        maxs = []
-        cvs = []
-        stability_indices = []
-        outlier_counts = []
-        trend_correlations = []
-        
-        for df, batch_name in batch_data:
-            batch_data_item = batch_comprehensive_data[batch_name]
-            
-            # 基础统计数据
-            basic_stats = batch_data_item['basic_statistics']
-            stability_data = batch_data_item['stability_analysis']
-            trend_data = batch_data_item['trend_analysis']
-            outlier_data = batch_data_item['outlier_detection']
-            
-            if column in basic_stats:
-                batch_names.append(batch_name)
-                means.append(basic_stats[column].get('mean', 0))
-                stds.append(basic_stats[column].get('std', 0))
-                mins.append(basic_stats[column].get('min', 0))
-                maxs.append(basic_stats[column].get('max', 0))
-                cvs.append(basic_stats[column].get('cv', 0))
-                
-                # 稳定性数据
-                if column in stability_data:
-                    stability_indices.append(stability_data[column].get('stability_index', 0))
-                else:
-                    stability_indices.append(0)
-                
-                # 异常检测数据
-                if column in outlier_data:
-                    outlier_counts.append(outlier_data[column].get('outlier_count', 0))
-                else:
-                    outlier_counts.append(0)
-                
-                # 趋势数据
-                if column in trend_data and 'error' not in trend_data[column]:
-                    trend_correlations.append(trend_data[column].get('correlation', 0))
-                else:
-                    trend_correlations.append(0)
+    # 汇总为 (批次数 × 列数 × 指标数) 数组；批次缺少该列基础统计时不参与该列的对比
+    all_names = [batch_name for _, batch_name in batch_data]
+    values = np.zeros((len(all_names), len(target_columns), len(_MULTI_BATCH_METRICS)))
+    present = np.zeros((len(all_names), len(target_columns)), dtype=bool)
+    for b, batch_name in enumerate(all_names):
+        sections = batch_comprehensive_data[batch_name]
+        for c, column in enumerate(target_columns):
+            if column not in sections['basic_statistics']:
+                continue
+            present[b, c] = True
+            for m, (_, section, field, _) in enumerate(_MULTI_BATCH_METRICS):
+                # 稳定性、异常检测缺失时按0处理
+                values[b, c, m] = sections[section].get(column, {}).get(field, 0)
+    
+    trends = _multi_batch_metric_trends(values, present)
+    
+    for c, column in enumerate(target_columns):
+        rows = np.flatnonzero(present[:, c])
+        if len(rows) < 2:
+            continue
+        batch_names = [all_names[b] for b in rows]
+        metrics = {}
+        for m, (name, _, _, better) in enumerate(_MULTI_BATCH_METRICS):
+            slope = trends['slope'][c, m]
+            column_values = values[rows, c, m]
+            if name == 'outlier_count':
+                metric = {'values': [int(v) for v in column_values]}
+                value_range = int(trends['range'][c, m])
+            else:
+                metric = {'values': [round(float(v), 4) for v in column_values]}
+                value_range = round(float(trends['range'][c, m]), 4)
+            metric.update({
+                'trend_slope': round(float(slope), 6),
+                'trend_direction': _get_trend_direction(slope),
+                'change_percent': round(float(trends['change_percent'][c, m]), 2),
+                'range': value_range
+            })
+            if better is not None:
+                high, low = all_names[trends['argmax'][c, m]], all_names[trends['argmin'][c, m]]
+                metric['best_batch'] = high if better > 0 else low
+                metric['worst_batch'] = low if better > 0 else high
+            metrics[name] = metric
         
-        if len(batch_names) >= 2:
-            # 计算各指标的趋势
-            x = np.arange(len(batch_names))
-            
-            multi_metrics_trends[column] = {
-                'batch_names': batch_names,
-                'metrics': {
-                    'mean': {
-                        'values': [round(v, 4) for v in means],
-                        'trend_slope': round(np.polyfit(x, means, 1)[0], 6) if len(means) > 1 else 0,
-                        'trend_direction': _get_trend_direction(np.polyfit(x, means, 1)[0]) if len(means) > 1 else '稳定',
-                        'change_percent': round(((means[-1] - means[0]) / means[0] * 100), 2) if means[0] != 0 else 0,
-                        'range': round(max(means) - min(means), 4),
-                        'best_batch': batch_names[np.argmax(means)] if means else '',
-                        'worst_batch': batch_names[np.argmin(means)] if means else ''
-                    },
-                    'std': {
-                        'values': [round(v, 4) for v in stds],
-                        'trend_slope': round(np.polyfit(x, stds, 1)[0], 6) if len(stds) > 1 else 0,
-                        'trend_direction': _get_trend_direction(np.polyfit(x, stds, 1)[0]) if len(stds) > 1 else '稳定',
-                        'change_percent': round(((stds[-1] - stds[0]) / stds[0] * 100), 2) if stds[0] != 0 else 0,
-                        'range': round(max(stds) - min(stds), 4),
-                        'best_batch': batch_names[np.argmin(stds)] if stds else '',  # 标准差越小越好
-                        'worst_batch': batch_names[np.argmax(stds)] if stds else ''
-                    },
-                    'cv': {
-                        'values': [round(v, 4) for v in cvs],
-                        'trend_slope': round(np.polyfit(x, cvs, 1)[0], 6) if len(cvs) > 1 else 0,
-                        'trend_direction': _get_trend_direction(np.polyfit(x, cvs, 1)[0]) if len(cvs) > 1 else '稳定',
-                        'change_percent': round(((cvs[-1] - cvs[0]) / cvs[0] * 100), 2) if cvs[0] != 0 else 0,
-                        'range': round(max(cvs) - min(cvs), 4),
-                        'best_batch': batch_names[np.argmin(cvs)] if cvs else '',  # 变异系数越小越好
-                        'worst_batch': batch_names[np.argmax(cvs)] if cvs else ''
-                    },
-                    'min': {
-                        'values': [round(v, 4) for v in mins],
-                        'trend_slope': round(np.polyfit(x, mins, 1)[0], 6) if len(mins) > 1 else 0,
-                        'trend_direction': _get_trend_direction(np.polyfit(x, mins, 1)[0]) if len(mins) > 1 else '稳定',
-                        'change_percent': round(((mins[-1] - mins[0]) / mins[0] * 100), 2) if mins[0] != 0 else 0,
-                        'range': round(max(mins) - min(mins), 4)
-                    },
-                    'max': {
-                        'values': [round(v, 4) for v in maxs],
-                        'trend_slope': round(np.polyfit(x, maxs, 1)[0], 6) if len(maxs) > 1 else 0,
-                        'trend_direction': _get_trend_direction(np.polyfit(x, maxs, 1)[0]) if len(maxs) > 1 else '稳定',
-                        'change_percent': round(((maxs[-1] - maxs[0]) / maxs[0] * 100), 2) if maxs[0] != 0 else 0,
-                        'range': round(max(maxs) - min(maxs), 4)
-                    },
-                    'stability_index': {
-                        'values': [round(v, 4) for v in stability_indices],
-                        'trend_slope': round(np.polyfit(x, stability_indices, 1)[0], 6) if len(stability_indices) > 1 else 0,
-                        'trend_direction': _get_trend_direction(np.polyfit(x, stability_indices, 1)[0]) if len(stability_indices) > 1 else '稳定',
-                        'change_percent': round(((stability_indices[-1] - stability_indices[0]) / stability_indices[0] * 100), 2) if stability_indices[0] != 0 else 0,
-                        'range': round(max(stability_indices) - min(stability_indices), 4),
-                        'best_batch': batch_names[np.argmax(stability_indices)] if stability_indices else '',
-                        'worst_batch': batch_names[np.argmin(stability_indices)] if stability_indices else ''
-                    },
-                    'outlier_count': {
-                        'values': outlier_counts,
-                        'trend_slope': round(np.polyfit(x, outlier_counts, 1)[0], 6) if len(outlier_counts) > 1 else 0,
-                        'trend_direction': _get_trend_direction(np.polyfit(x, outlier_counts, 1)[0]) if len(outlier_counts) > 1 else '稳定',
-                        'change_percent': round(((outlier_counts[-1] - outlier_counts[0]) / outlier_counts[0] * 100), 2) if outlier_counts[0] != 0 else 0,
-                        'range': max(outlier_counts) - min(outlier_counts) if outlier_counts else 0,
-                        'best_batch': batch_names[np.argmin(outlier_counts)] if outlier_counts else '',  # 异常值越少越好
-                        'worst_batch': batch_names[np.argmax(outlier_counts)] if outlier_counts else ''
-                    }
-                }
-            }
+        multi_metrics_trends[column] = {
+            'batch_names': batch_names,
+            'metrics': metrics
+        }
     
     return {
         'analysis_type': 'multi_batch_comprehensive',
@@ -577,10 +1116,54 @@ def _analyze_multi_batch_comprehensive_comparison(analyzer, batch_data, columns)
         'summary': {
             'total_batches': len(batch_data),
             'analyzed_metrics': len(multi_metrics_trends),
-            'available_metric_types': ['mean', 'std', 'cv', 'min', 'max', 'stability_index', 'outlier_count']
+            'available_metric_types': [name for name, _, _, _ in _MULTI_BATCH_METRICS]
         }
     }
 
+def _multi_batch_metric_trends(values, present):
+    """
+    对 (批次数 × 列数 × 指标数) 的指标数组一次性计算各列各指标的跨批次趋势
+
+    横坐标为该列有数据的批次中的序号；present 为 (批次数 × 列数) 的有效掩码
+
+    返回:
+        dict: slope（最小二乘斜率）、change_percent（末批次相对首批次）、range、
+              argmax/argmin（最大/最小值所在批次下标），均为 (列数 × 指标数) 数组
+    """
+    import numpy as np
+    
+    batches = values.shape[0]
+    weight = present[:, :, None].astype(float)
+    count = present.sum(axis=0)[:, None]
+    position = (np.cumsum(present, axis=0) - 1)[:, :, None].astype(float)
+    
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x_mean = (position * weight).sum(axis=0) / count
+        y_mean = (values * weight).sum(axis=0) / count
+        dx = (position - x_mean) * weight
+        slope = (dx * (values - y_mean)).sum(axis=0) / (dx * dx).sum(axis=0)
+    slope = np.where(count > 1, np.nan_to_num(slope), 0.0)
+    
+    columns = np.arange(values.shape[1])
+    first = np.argmax(present, axis=0)
+    last = batches - 1 - np.argmax(present[::-1], axis=0)
+    first_values = values[first, columns]
+    last_values = values[last, columns]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        change_percent = np.where(first_values != 0, (last_values - first_values) / first_values * 100, 0.0)
+    
+    high = np.where(present[:, :, None], values, -np.inf)
+    low = np.where(present[:, :, None], values, np.inf)
+    value_range = np.where(count > 0, high.max(axis=0) - low.min(axis=0), 0.0)
+    
+    return {
+        'slope': slope,
+        'change_percent': change_percent,
+        'range': value_range,
+        'argmax': np.argmax(high, axis=0),
+        'argmin': np.argmin(low, axis=0)
+    }
+
 def _get_trend_direction(slope):
     """根据斜率判断趋势方向"""
     if slope > 0.001:
@@ -590,71 +1173,27 @@ def _get_trend_direction(slope):
     else:
         return '稳定'
 
-def _analyze_multi_batch_outliers(analyzer, batch_data, columns):
-    """找出异常批次"""
-    import numpy as np
-    from scipy import stats
-    
-    batch_stats = {}
-    outlier_analysis = {}
-    
-    # 计算每个批次的基础统计信息
-    for df, batch_name in batch_data:
-        stats_result = analyzer.basic_statistics(df, columns)
-        batch_stats[batch_name] = stats_result
-    
-    # 分析哪些批次是异常的
-    if columns:
-        target_columns = [col for col in columns if col in batch_data[0][0].columns]
-    else:
-        target_columns = [col for col in batch_data[0][0].columns if batch_data[0][0][col].dtype in ['int64', 'float64']][:10]
-    
-    batch_outlier_scores = {batch_name: 0 for _, batch_name in batch_data}
-    
-    for column in target_columns:
-        means = []
-        stds = []
-        batch_names = []
-        
-        for df, batch_name in batch_data:
-            if column in batch_stats[batch_name]:
-                mean_val = batch_stats[batch_name][column].get('mean', 0)
-                std_val = batch_stats[batch_name][column].get('std', 0)
-                means.append(mean_val)
-                stds.append(std_val)
-                batch_names.append(batch_name)
-        
-        if len(means) >= 3:
-            # 计算Z-score来识别异常批次
-            mean_z_scores = np.abs(stats.zscore(means)) if len(means) > 2 else [0] * len(means)
-            std_z_scores = np.abs(stats.zscore(stds)) if len(stds) > 2 else [0] * len(stds)
-            
-            for i, batch_name in enumerate(batch_names):
-                # 综合评分：均值偏离 + 稳定性偏离
-                outlier_score = mean_z_scores[i] + std_z_scores[i]
-                batch_outlier_scores[batch_name] += outlier_score
-            
-            outlier_analysis[column] = {
-                'batch_means': dict(zip(batch_names, means)),
-                'batch_stds': dict(zip(batch_names, stds)),
-                'mean_z_scores': dict(zip(batch_names, mean_z_scores)),
-                'std_z_scores': dict(zip(batch_names, std_z_scores))
-            }
-    
-    # 排序找出最异常的批次
-    sorted_batches = sorted(batch_outlier_scores.items(), key=lambda x: x[1], reverse=True)
+def _analyze_multi_batch_outliers(analyzer, batch_data, columns, top_k=3):
+    """找出异常批次（所有通道的均值/标准差特征，稳健z分数 + 收缩协方差马氏距离）"""
+    result = analyzer.batch_anomaly_detection(batch_data, columns, top_k)
+    batch_outlier_scores = dict(zip(result["batch_names"], result["scores"]))
+    top_batches = result["top_batches"]
     
     return {
         'analysis_type': 'multi_batch_outlier_detection',
+        'score_method': result["score_method"],
         'batch_outlier_scores': batch_outlier_scores,
-        'outlier_details': outlier_analysis,
-        'ranked_batches': sorted_batches,
-        'most_abnormal_batches': sorted_batches[:3],  # 前3个最异常的批次
+        'robust_scores': dict(zip(result["batch_names"], result["robust_scores"])),
+        'outlier_details': result["top_details"],  # 仅最异常批次的主要偏离特征
+        'ranked_batches': top_batches,
+        'most_abnormal_batches': top_batches[:3],  # 前3个最异常的批次
         'summary': {
             'total_batches': len(batch_data),
-            'analyzed_metrics': len(outlier_analysis),
-            'most_abnormal': sorted_batches[0][0] if sorted_batches else None,
-            'most_normal': sorted_batches[-1][0] if sorted_batches else None
+            'analyzed_metrics': len(result["columns"]),
+            'analyzed_features': result["feature_count"],
+            'covariance_shrinkage': round(result["shrinkage"], 4),
+            'most_abnormal': top_batches[0][0] if top_batches else None,
+            'most_normal': result["most_normal"]
         }
     }
 
@@ -677,8 +1216,14 @@ def _analyze_multi_batch_comprehensive(analyzer, batch_data, columns, time_colum
         'total_batches': len(batch_data)
     }
 
-def _analyze_time_series(analyzer, df, columns, time_column):
-    """时间序列分析，用于单批次变化曲线"""
+def _analyze_time_series(analyzer, df, columns, time_column, max_points=100, downsample="lttb", resample=None):
+    """
+    时间序列分析，用于单批次变化曲线
+
+    统计与趋势在全部数据点上计算；返回的曲线点由 downsampling 降采样到 max_points 个，覆盖整个测试过程
+    downsample 为 'lttb'（保形）或 'minmax'（每段保留极值）
+    时间列可解析时趋势斜率按真实经过的秒数计算；resample 给出间隔（如 '1min'）时附带按时间分箱的聚合
+    """
     import numpy as np
     import pandas as pd
     
@@ -725,6 +1270,13 @@ def _analyze_time_series(analyzer, df, columns, time_column):
     
     print(f"🔧 [DEBUG] 最终目标列: {target_columns}")
     
+    # 时间列只解析一次（格式推断后缓存），趋势横坐标为经过的秒数
+    elapsed = None
+    if time_column != 'time_index':
+        time_kind, parsed_time = parse_time(df[time_column])
+        if time_kind is not None:
+            elapsed = elapsed_seconds(time_kind, parsed_time)
+    
     time_series_analysis = {}
     
     for column in target_columns:
@@ -759,28 +1311,40 @@ def _analyze_time_series(analyzer, df, columns, time_column):
                 changes = values.diff().dropna()
                 max_change = changes.abs().max() if len(changes) > 0 else 0
                 
-                # 趋势分析
-                x = np.arange(len(values))
-                if len(values) > 1:
-                    slope = np.polyfit(x, values, 1)[0]
-                    correlation = np.corrcoef(x, values)[0, 1] if len(values) > 2 else 0
+                # 趋势分析（有真实时间时对经过的秒数回归，否则对序号回归）
+                positions = df.index.get_indexer(temp_df.index)
+                y = values.to_numpy(dtype=float)
+                x = np.arange(len(values), dtype=float)
+                if elapsed is not None:
+                    x = elapsed[positions]
+                    timed = ~np.isnan(x)
+                    x, y = x[timed], y[timed]
+                if len(y) > 1 and np.ptp(x) > 0:
+                    slope = np.polyfit(x, y, 1)[0]
+                    correlation = np.corrcoef(x, y)[0, 1] if len(y) > 2 else 0
                 else:
                     slope = 0
                     correlation = 0
                 
+                # 降采样到目标点数（横坐标为原始行位置，缺失行不压缩时间轴）
+                keep = downsample_indices(values.to_numpy(dtype=float), max_points, positions, downsample)
+                
                 time_series_analysis[column] = {
-                    'values': values.tolist()[:100],  # 限制数据点数量
-                    'time_points': time_values.tolist()[:100],
+                    'values': values.iloc[keep].tolist(),
+                    'time_points': time_values.iloc[keep].tolist(),
+                    'sample_positions': positions[keep].tolist(),
+                    'downsample_method': downsample,
                     'mean': round(mean_val, 4),
                     'std': round(std_val, 4),
                     'max_change': round(max_change, 4),
                     'trend_slope': round(slope, 6),
+                    'slope_unit': '每秒' if elapsed is not None else '每点',
                     'correlation': round(correlation, 4),
                     'trend_direction': '上升' if slope > 0.001 else ('下降' if slope < -0.001 else '稳定'),
                     'data_points': len(values)
                 }
     
-    return {
+    result = {
         'analysis_type': 'time_series',
         'time_column': time_column,
         'series_analysis': time_series_analysis,
@@ -794,6 +1358,81 @@ def _analyze_time_series(analyzer, df, columns, time_column):
             'specified_columns': columns
         }
     }
+    
+    # 按时间间隔分箱聚合（箱数不超过 max_points，数值保留4位小数以压缩结果）
+    if resample and elapsed is not None and time_series_analysis:
+        resampled = analyzer.resample(df, time_column, resample, list(time_series_analysis), max_bins=max_points)
+        for aggregates in resampled["series"].values():
+            for name in ("mean", "min", "max"):
+                aggregates[name] = np.round(aggregates[name], 4).tolist()
+        result['resampled'] = resampled
+    
+    return result
+
+def _ensure_pyramid(file_path, time_column=None, df=None, shared_key=None):
+    """
+    打开文件对应的多分辨率金字塔；不存在或请求的时间列不同时构建（数值矩阵取自共享内存数据平面）
+    时间列无法解析时金字塔记录请求的列名，同一请求不会反复重建
+    """
+    folder = pyramid_folder(file_path)
+    pyramid = SeriesPyramid.open(folder)
+    if pyramid is not None and (not time_column or pyramid.requested_time_column == time_column):
+        return pyramid
+    
+    acquired = shared_key is None
+    if acquired:
+        df, meta, shared_key = read_csv_shared(file_path)
+    try:
+        frame = data_plane.get(shared_key)[2]
+        time_values = df[time_column] if time_column and time_column in df.columns else None
+        return SeriesPyramid.build(frame.matrix, frame.columns, folder, time_values, time_column, file_path)
+    finally:
+        if acquired:
+            data_plane.release(shared_key)
+
+def _time_series_range(pyramid, columns, row_range=None, time_range=None, max_points=100):
+    """
+    从金字塔读取行区间（或时间区间）内的曲线：每个点为一个桶的 最小/最大/均值，
+    点数不超过 max_points；区间统计为精确值
+    """
+    if time_range:
+        start, stop = pyramid.locate_time(*time_range)
+    else:
+        start = row_range[0] if row_range[0] is not None else 0
+        stop = row_range[1] if len(row_range) > 1 and row_range[1] is not None else pyramid.rows
+    if columns:
+        columns = [col for col in columns if col in pyramid.columns]
+    else:
+        columns = [col for col in pyramid.columns if col != pyramid.time_column][:10]
+    
+    curve = pyramid.query(columns, start, stop, max_points)
+    summary = pyramid.summary(columns, start, stop)
+    series_analysis = {}
+    for col in columns:
+        stat = summary[col]
+        if stat["count"] == 0:
+            continue
+        series_analysis[col] = {
+            'values': curve["series"][col]["mean"],
+            'min_values': curve["series"][col]["min"],
+            'max_values': curve["series"][col]["max"],
+            'time_points': curve["time_points"],
+            'sample_positions': curve["positions"],
+            'mean': round(stat["mean"], 4),
+            'min': round(stat["min"], 4),
+            'max': round(stat["max"], 4),
+            'data_points': stat["count"]
+        }
+    
+    return {
+        'analysis_type': 'time_series',
+        'time_column': pyramid.time_column,
+        'series_analysis': series_analysis,
+        'total_data_points': pyramid.rows,
+        'range': [int(start), int(min(stop, pyramid.rows))],
+        'resolution': {'level': curve["level"], 'bucket_size': curve["bucket_size"]},
+        'pyramid_path': pyramid.folder
+    }
 
 def _generate_multi_batch_summary(comprehensive_results):
     """生成多批次对比摘要"""
@@ -0,0 +1,92 @@
+# parallel_analysis.py
+# 按列并行的分析执行器：数值矩阵位于共享内存（shared_data），各工作进程按描述符挂载后计算，避免逐任务序列化数据
+# 各矩阵分析函数的结果按列拼接，合并后与单进程计算结果一致
+
+import atexit
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from shared_data import SharedFrame
+
+_pool = None
+_pool_workers = 0
+
+def get_pool(workers):
+    """返回可复用的进程池（工作进程数变化时重建）"""
+    global _pool, _pool_workers
+    if _pool is None or _pool_workers != workers:
+        shutdown_pool()
+        _pool = ProcessPoolExecutor(max_workers=workers)
+        _pool_workers = workers
+    return _pool
+
+def shutdown_pool():
+    """关闭进程池，程序退出时自动调用"""
+    global _pool, _pool_workers
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+        _pool_workers = 0
+
+atexit.register(shutdown_pool)
+
+def _column_worker(descriptor, positions, func_name, args):
+    """工作进程：按描述符挂载共享矩阵，对指定列调用 DataAnalyzer 的矩阵分析函数"""
+    from data_analyzer import DataAnalyzer
+    frame = SharedFrame.attach(descriptor)
+    try:
+        if positions == list(range(positions[0], positions[-1] + 1)):
+            # 列优先存储，连续列区间的切片本身连续，无需拷贝
+            matrix = frame.matrix[:, positions[0]:positions[-1] + 1]
+        else:
+            matrix = frame.matrix[:, positions]
+        result = getattr(DataAnalyzer(), func_name)(matrix, *args)
+        # 释放对共享缓冲区的引用后才能关闭
+        del matrix
+        return result
+    finally:
+        frame.close()
+
+def _merge_parts(parts):
+    """按列拼接各列区间的结果：列表/数组首尾相接，字典与元组逐项合并，其余取首个"""
+    first = parts[0]
+    if isinstance(first, list):
+        return [item for part in parts for item in part]
+    if isinstance(first, np.ndarray):
+        return np.concatenate(parts, axis=0)
+    if isinstance(first, dict):
+        return {key: _merge_parts([part[key] for part in parts]) for key in first}
+    if isinstance(first, tuple):
+        return tuple(_merge_parts(list(items)) for items in zip(*parts))
+    return first
+
+def run_shared_parallel(func_name, descriptor, positions, workers, *args):
+    """
+    对已发布到共享内存的矩阵，把指定列划分给多个工作进程执行 DataAnalyzer.<func_name>(子矩阵, *args)
+
+    参数:
+        func_name (str): 矩阵分析函数名，结果须按列排列（列表、按列的数组或其组合）
+        descriptor (dict): SharedFrame 描述符
+        positions (list): 参与计算的列在共享矩阵中的位置
+        workers (int): 工作进程数
+
+    返回:
+        与 func_name 在这些列组成的矩阵上计算相同结构的结果
+    """
+    positions = [int(pos) for pos in positions]
+    bounds = np.linspace(0, len(positions), min(workers, len(positions)) + 1).astype(int)
+    pool = get_pool(workers)
+    futures = [
+        pool.submit(_column_worker, descriptor, positions[start:stop], func_name, args)
+        for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start
+    ]
+    return _merge_parts([future.result() for future in futures])
+
+def run_column_parallel(func_name, matrix, workers, *args):
+    """
+    把 (行数 × 列数) 矩阵临时放入共享内存后按列并行执行，见 run_shared_parallel
+    """
+    frame = SharedFrame.create(matrix, range(matrix.shape[1]))
+    try:
+        return run_shared_parallel(func_name, frame.descriptor, range(matrix.shape[1]), workers, *args)
+    finally:
+        frame.close()
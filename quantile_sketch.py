@@ -0,0 +1,140 @@
+# quantile_sketch.py
+# 可合并的近似分位数草图（KLL sketch）：常数内存、可分块/并行/增量更新
+# 用于超大序列的中位数、四分位数和 IQR 异常检测，误差以归一化秩误差表示
+
+import math
+import numpy as np
+
+def kll_k_for_error(rank_error):
+    """
+    由目标归一化秩误差求 KLL 的 k 参数（经验公式，约99%置信度，与 DataSketches 一致）
+    """
+    if not 0 < rank_error < 1:
+        raise ValueError(f"❌ 秩误差需在 (0, 1) 之间: {rank_error}")
+    return max(8, int(math.ceil((2.296 / rank_error) ** (1 / 0.9723))))
+
+def kll_rank_error(k):
+    """给定 k 参数时的归一化秩误差上界"""
+    return 2.296 / k ** 0.9723
+
+class KLLSketch:
+    """
+    单列 KLL 分位数草图
+
+    第 h 层每个元素代表 2^h 个原始值；某层超过容量时排序后隔一取一提升到上一层。
+    两个草图可直接合并，误差界不变。
+    """
+
+    def __init__(self, k=200, seed=0):
+        self.k = int(k)
+        self.n = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    @property
+    def rank_error(self):
+        return kll_rank_error(self.k)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def update(self, values):
+        """加入一批数值（NaN自动忽略），按块写入以避免一次性排序全部数据"""
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        self.n += len(values)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        block = self.k * 8
+        for start in range(0, len(values), block):
+            self.levels[0] = np.concatenate([self.levels[0], values[start:start + block]])
+            self._compress()
+        return self
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) < self._capacity(level):
+                level += 1
+                continue
+            if level + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            items = np.sort(items)
+            # 奇数个时留下一个，保证总权重不变
+            keep = items[:len(items) % 2]
+            items = items[len(items) % 2:]
+            promoted = items[self._rng.integers(2)::2]
+            self.levels[level] = keep
+            self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level = 0
+
+    def merge(self, other):
+        """合并另一个草图（如其他数据块或工作进程的结果），原地更新并返回自身"""
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.k = min(self.k, other.k)
+        self._compress()
+        return self
+
+    def quantiles(self, quantiles):
+        """
+        估计分位数：按权重把元素排列为秩区间，在区间中心之间线性插值
+
+        未发生压缩时所有权重为1，结果与精确线性插值分位数一致
+        """
+        quantiles = np.atleast_1d(np.asarray(quantiles, dtype=float))
+        if self.n == 0:
+            return np.full(len(quantiles), np.nan)
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2.0 ** level) for level, items in enumerate(self.levels)])
+        order = np.argsort(values, kind='mergesort')
+        values, weights = values[order], weights[order]
+        centers = np.cumsum(weights) - (weights + 1) / 2
+        result = np.interp(quantiles * (self.n - 1), centers, values)
+        return np.clip(result, self.min, self.max)
+
+class ColumnSketches:
+    """
+    多列分位数草图：每列一个 KLLSketch，输入为 (行数 × 列数) 浮点矩阵
+    """
+
+    def __init__(self, columns, rank_error=0.01, seed=0):
+        self.columns = list(columns)
+        self.k = kll_k_for_error(rank_error)
+        # 各列使用相同种子，按列划分并行计算时结果与整体计算一致
+        self.sketches = [KLLSketch(self.k, seed=seed) for _ in self.columns]
+
+    @property
+    def rank_error(self):
+        return kll_rank_error(self.k)
+
+    def update(self, matrix):
+        matrix = np.asarray(matrix, dtype=float)
+        if matrix.ndim == 1:
+            matrix = matrix[:, None]
+        for j, sketch in enumerate(self.sketches):
+            sketch.update(matrix[:, j])
+        return self
+
+    def merge(self, other):
+        if other.columns != self.columns:
+            raise ValueError("❌ 草图列不一致，无法合并")
+        for sketch, other_sketch in zip(self.sketches, other.sketches):
+            sketch.merge(other_sketch)
+        return self
+
+    def quantiles(self, quantiles):
+        """返回形状为 (分位数个数 × 列数) 的估计值"""
+        return np.column_stack([sketch.quantiles(quantiles) for sketch in self.sketches]) \
+            if self.sketches else np.empty((len(np.atleast_1d(quantiles)), 0))
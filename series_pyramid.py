@@ -0,0 +1,261 @@
+# series_pyramid.py
+# 时间序列多分辨率金字塔：每个通道预先计算逐层的 最小/最大/求和/计数，持久化到缓存目录
+# 任意行区间、任意缩放级别只读取 O(像素数) 个桶（内存映射按需读盘），缩放曲线无需重新读取 CSV
+
+import os
+import json
+import hashlib
+import shutil
+import numpy as np
+from time_utils import parse_time
+
+PYRAMID_FOLDER = os.path.join("cache", "pyramid")
+FANOUT = 4  # 每层桶大小为上一层的 FANOUT 倍
+
+def pyramid_folder(path, folder=PYRAMID_FOLDER):
+    """源文件对应的金字塔目录（路径、修改时间、大小任一变化即为新目录）"""
+    stat = os.stat(path)
+    key = f"{os.path.abspath(path)}|{stat.st_mtime}|{stat.st_size}"
+    return os.path.join(folder, hashlib.md5(key.encode("utf-8")).hexdigest()[:16])
+
+def _reduce_level(mins, maxs, sums, counts, fanout):
+    """把上一层的桶每 fanout 个合并为一个（末尾不足的部分补空桶）"""
+    n, cols = mins.shape
+    buckets = -(-n // fanout)
+    pad = buckets * fanout - n
+    if pad:
+        mins = np.vstack([mins, np.full((pad, cols), np.nan)])
+        maxs = np.vstack([maxs, np.full((pad, cols), np.nan)])
+        sums = np.vstack([sums, np.zeros((pad, cols))])
+        counts = np.vstack([counts, np.zeros((pad, cols), dtype=counts.dtype)])
+    shape = (buckets, fanout, cols)
+    # fmin/fmax 跳过NaN，整桶无有效值时结果为NaN
+    return (np.fmin.reduce(mins.reshape(shape), axis=1), np.fmax.reduce(maxs.reshape(shape), axis=1),
+            sums.reshape(shape).sum(axis=1), counts.reshape(shape).sum(axis=1))
+
+class SeriesPyramid:
+    """
+    多分辨率金字塔：第0层为原始数据 (行数 × 列数)，第 L 层每个桶覆盖 FANOUT^L 行
+
+    各层以 .npy 保存，读取时内存映射，只有被访问的桶会从磁盘读入
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        with open(os.path.join(folder, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.columns = meta["columns"]
+        self.rows = meta["rows"]
+        self.fanout = meta["fanout"]
+        self.levels = meta["levels"]
+        self.source = meta.get("source")
+        self.time_column = meta.get("time_column")
+        # 构建时请求的时间列（无法解析时 time_column 为None，仍按请求的列名判断是否需要重建）
+        self.requested_time_column = meta.get("requested_time_column", self.time_column)
+        self.time_kind = meta.get("time_kind")
+        self._column_pos = {col: j for j, col in enumerate(self.columns)}
+        self._arrays = {}
+
+    @classmethod
+    def open(cls, folder):
+        """打开已构建的金字塔，不存在返回None"""
+        if not os.path.exists(os.path.join(folder, "meta.json")):
+            return None
+        return cls(folder)
+
+    @classmethod
+    def build(cls, matrix, columns, folder, time_values=None, time_column=None, source=None, fanout=FANOUT):
+        """
+        由 (行数 × 列数) 数值矩阵构建金字塔并写入 folder
+
+        参数:
+            matrix (ndarray): 数值矩阵，缺失值为NaN
+            columns (list): 列名
+            folder (str): 输出目录
+            time_values (Series): 可选，时间列（可解析为时间或数值时保存，用于曲线横坐标和按时间定位区间）
+            time_column (str): 时间列名
+            source (str): 源文件路径（仅记录）
+            fanout (int): 每层合并的桶数
+
+        返回:
+            SeriesPyramid
+        """
+        os.makedirs(folder, exist_ok=True)
+        matrix = np.ascontiguousarray(matrix, dtype=float)
+        np.save(os.path.join(folder, "level0.npy"), matrix)
+
+        valid = ~np.isnan(matrix)
+        mins, maxs = matrix, matrix
+        sums, counts = np.where(valid, matrix, 0.0), valid.astype(np.int32)
+        levels = 0
+        while len(mins) > fanout:
+            mins, maxs, sums, counts = _reduce_level(mins, maxs, sums, counts, fanout)
+            levels += 1
+            for name, array in (("min", mins), ("max", maxs), ("sum", sums), ("count", counts)):
+                np.save(os.path.join(folder, f"level{levels}_{name}.npy"), array)
+
+        time_kind = cls._save_time(folder, time_values)
+        meta = {"columns": [str(col) for col in columns], "rows": int(matrix.shape[0]), "fanout": fanout,
+                "levels": levels, "source": source, "time_column": time_column if time_kind else None,
+                "requested_time_column": time_column, "time_kind": time_kind}
+        # meta.json 最后写入，作为构建完成的标志
+        with open(os.path.join(folder, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        if source:
+            cls._prune_stale(folder, source)
+        return cls(folder)
+
+    @staticmethod
+    def _prune_stale(folder, source):
+        """删除同一源文件旧版本（修改时间或大小不同）留下的金字塔目录"""
+        parent, current = os.path.split(os.path.abspath(folder))
+        for name in os.listdir(parent):
+            meta_path = os.path.join(parent, name, "meta.json")
+            if name == current or not os.path.exists(meta_path):
+                continue
+            try:
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    stale = json.load(f).get("source")
+            except (OSError, ValueError):
+                continue
+            if stale and os.path.abspath(stale) == os.path.abspath(source):
+                shutil.rmtree(os.path.join(parent, name), ignore_errors=True)
+
+    @staticmethod
+    def _save_time(folder, time_values):
+        """时间列可完整解析为数值或时间时保存为 time.npy，返回类型 'numeric'/'datetime'，否则None"""
+        if time_values is None:
+            return None
+        kind, values = parse_time(time_values)
+        if kind == "numeric" and not np.isnan(values).any():
+            np.save(os.path.join(folder, "time.npy"), values)
+            return kind
+        if kind == "datetime" and not np.isnat(values).any():
+            np.save(os.path.join(folder, "time.npy"), values.astype(np.int64))
+            return kind
+        return None
+
+    def _array(self, name):
+        """按需以内存映射方式打开某层数组"""
+        if name not in self._arrays:
+            self._arrays[name] = np.load(os.path.join(self.folder, f"{name}.npy"), mmap_mode='r')
+        return self._arrays[name]
+
+    def bucket_size(self, level):
+        return self.fanout ** level
+
+    def _positions(self, columns):
+        if columns is None:
+            return list(range(len(self.columns)))
+        return [self._column_pos[col] for col in columns if col in self._column_pos]
+
+    def time_at(self, positions):
+        """给定行位置的时间值（datetime 返回 ISO 字符串），未保存时间列时返回行位置本身"""
+        positions = np.asarray(positions, dtype=np.intp)
+        if self.time_kind is None:
+            return positions.tolist()
+        values = np.asarray(self._array("time")[np.clip(positions, 0, self.rows - 1)])
+        if self.time_kind == "datetime":
+            return np.datetime_as_string(values.astype('datetime64[ns]'), unit='s').tolist()
+        return values.tolist()
+
+    def locate_time(self, start_time, stop_time):
+        """
+        按时间值定位行区间 [start, stop)（时间列须单调递增，二分查找只读取 O(log n) 个值）
+        """
+        if self.time_kind is None:
+            raise ValueError("❌ 金字塔未保存可解析的时间列，无法按时间定位")
+        if self.time_kind == "datetime":
+            bounds = [np.datetime64(value, 'ns').astype(np.int64) for value in (start_time, stop_time)]
+        else:
+            bounds = [float(start_time), float(stop_time)]
+        time = self._array("time")
+        return int(np.searchsorted(time, bounds[0], 'left')), int(np.searchsorted(time, bounds[1], 'right'))
+
+    def _level_slice(self, level, lo, hi, positions):
+        """第 level 层第 lo..hi 个桶的 (最小, 最大, 求和, 计数)，第0层由原始值得到"""
+        if level == 0:
+            values = np.asarray(self._array("level0")[lo:hi])[:, positions]
+            valid = ~np.isnan(values)
+            return values, values, np.where(valid, values, 0.0), valid.astype(np.int64)
+        return tuple(np.asarray(self._array(f"level{level}_{name}")[lo:hi])[:, positions]
+                     for name in ("min", "max", "sum", "count"))
+
+    def query(self, columns=None, start=0, stop=None, pixels=1000):
+        """
+        取行区间 [start, stop) 在给定像素宽度下的曲线：选取桶数不超过 pixels 的最细一层
+
+        参数:
+            columns (list): 列名，None为全部列
+            start, stop (int): 行区间，stop 为None表示到末尾
+            pixels (int): 横向点数上限
+
+        返回:
+            dict: level/bucket_size/positions（桶起始行）/time_points 以及
+                  series {列名: {"min", "max", "mean"}}，区间内无有效值的桶为NaN
+        """
+        positions = self._positions(columns)
+        start = max(int(start), 0)
+        stop = self.rows if stop is None else min(int(stop), self.rows)
+        stop = max(stop, start)
+        pixels = max(int(pixels), 1)
+
+        level = 0
+        while level < self.levels and -(-(stop - start) // self.bucket_size(level)) > pixels:
+            level += 1
+        size = self.bucket_size(level)
+        lo, hi = start // size, -(-stop // size)
+        mins, maxs, sums, counts = self._level_slice(level, lo, hi, positions)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+        rows = np.arange(lo, hi) * size
+        return {
+            "level": level,
+            "bucket_size": size,
+            "positions": rows.tolist(),
+            "time_points": self.time_at(rows),
+            "series": {self.columns[p]: {"min": mins[:, j].tolist(), "max": maxs[:, j].tolist(),
+                                         "mean": means[:, j].tolist()}
+                       for j, p in enumerate(positions)}
+        }
+
+    def summary(self, columns=None, start=0, stop=None):
+        """
+        行区间 [start, stop) 内各列的精确 最小/最大/均值/有效数
+
+        按线段树方式分解区间：每层只取两端不足一个上层桶的部分，共读取 O(FANOUT × 层数) 个桶
+        """
+        positions = self._positions(columns)
+        start = max(int(start), 0)
+        stop = self.rows if stop is None else min(int(stop), self.rows)
+        k = len(positions)
+        total_min, total_max = np.full(k, np.nan), np.full(k, np.nan)
+        total_sum, total_count = np.zeros(k), np.zeros(k, dtype=np.int64)
+
+        def take(level, a, b):
+            nonlocal total_min, total_max, total_sum, total_count
+            if b <= a:
+                return
+            mins, maxs, sums, counts = self._level_slice(level, a, b, positions)
+            total_min = np.fmin(total_min, np.fmin.reduce(mins, axis=0))
+            total_max = np.fmax(total_max, np.fmax.reduce(maxs, axis=0))
+            total_sum = total_sum + sums.sum(axis=0)
+            total_count = total_count + counts.sum(axis=0)
+
+        level, lo, hi = 0, start, stop
+        while lo < hi:
+            up = -(-lo // self.fanout) * self.fanout
+            down = hi // self.fanout * self.fanout
+            if level == self.levels or up >= down:
+                take(level, lo, hi)
+                break
+            take(level, lo, up)
+            take(level, down, hi)
+            lo, hi, level = up // self.fanout, down // self.fanout, level + 1
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.where(total_count > 0, total_sum / np.maximum(total_count, 1), np.nan)
+        return {self.columns[p]: {"min": float(total_min[j]), "max": float(total_max[j]),
+                                  "mean": float(means[j]), "count": int(total_count[j])}
+                for j, p in enumerate(positions)}
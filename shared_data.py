@@ -0,0 +1,163 @@
+# shared_data.py
+# 共享内存数据平面：读取后的数值列只发布一次，分析进程、批次任务和绘图按描述符挂载，不复制数据
+# 发布的数据带引用计数，空闲数据按最近使用保留少量，程序退出时统一释放共享内存段
+
+import atexit
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from multiprocessing import shared_memory
+
+class SharedFrame:
+    """
+    共享内存中的数值矩阵：(行数 × 列数) 列优先 float64，缺失值为NaN
+
+    描述符为只含段名、形状和列名的小字典，可在进程间传递后用 attach 挂载
+    """
+
+    def __init__(self, shm, descriptor, owner=False):
+        self.shm = shm
+        self.descriptor = descriptor
+        self.owner = owner
+        self.columns = list(descriptor["columns"])
+        self._column_pos = {col: j for j, col in enumerate(self.columns)}
+        self.matrix = np.ndarray(tuple(descriptor["shape"]), dtype=float, buffer=shm.buf, order='F')
+        if not owner:
+            # 挂载方只读，防止误写影响其他进程
+            self.matrix.flags.writeable = False
+
+    @classmethod
+    def create(cls, matrix, columns):
+        """新建共享内存段并写入矩阵，返回拥有该段的 SharedFrame"""
+        matrix = np.asarray(matrix, dtype=float)
+        shm = shared_memory.SharedMemory(create=True, size=max(matrix.nbytes, 1))
+        descriptor = {"name": shm.name, "shape": list(matrix.shape), "columns": list(columns)}
+        frame = cls(shm, descriptor, owner=True)
+        frame.matrix[...] = matrix
+        return frame
+
+    @classmethod
+    def attach(cls, descriptor):
+        """按描述符挂载已发布的共享内存段（不复制数据）"""
+        return cls(shared_memory.SharedMemory(name=descriptor["name"]), descriptor)
+
+    def has_columns(self, columns):
+        return all(col in self._column_pos for col in columns)
+
+    def positions(self, columns):
+        return [self._column_pos[col] for col in columns]
+
+    def column(self, col):
+        """单列视图"""
+        return self.matrix[:, self._column_pos[col]]
+
+    def frame(self, index=None):
+        """以共享缓冲区为底层数据的 DataFrame 视图（供绘图等只读使用）"""
+        return pd.DataFrame({col: self.matrix[:, j] for j, col in enumerate(self.columns)},
+                            index=index, copy=False)
+
+    def close(self):
+        """释放本进程对共享内存段的映射"""
+        if self.shm is not None:
+            self.matrix = None
+            try:
+                self.shm.close()
+            except BufferError:
+                # 仍有视图引用缓冲区时映射随视图回收；段名照常删除，不会泄漏
+                pass
+            if self.owner:
+                self.shm.unlink()
+            self.shm = None
+
+class DataPlane:
+    """
+    数据平面：按键登记已发布的 SharedFrame 及其来源 DataFrame
+
+    acquire/release 维护引用计数；计数归零的数据保留最近使用的 max_idle 个以便复用，其余立即释放
+    """
+
+    def __init__(self, max_idle=4):
+        self.max_idle = max_idle
+        self._entries = {}  # 键 -> {"frame", "data", "metadata", "refs"}
+        self._idle = OrderedDict()
+        self._lock = threading.Lock()
+
+    def publish(self, key, data, metadata=None):
+        """
+        发布 DataFrame 中可数值化的列（与分析时的 pd.to_numeric 一致），引用计数加1
+
+        已发布的键直接复用，返回描述符
+        """
+        with self._lock:
+            if key in self._entries:
+                return self._acquire(key)
+
+        columns, arrays = [], []
+        for col in data.columns:
+            if str(col).startswith('Unnamed:'):
+                continue
+            values = pd.to_numeric(data[col], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+            if not np.isnan(values).all():
+                columns.append(col)
+                arrays.append(values)
+        matrix = np.column_stack(arrays) if arrays else np.empty((len(data), 0))
+        frame = SharedFrame.create(matrix, columns)
+
+        with self._lock:
+            if key in self._entries:
+                # 并发发布时保留先完成的一份
+                frame.close()
+                return self._acquire(key)
+            self._entries[key] = {"frame": frame, "data": data, "metadata": metadata, "refs": 1}
+            return frame.descriptor
+
+    def _acquire(self, key):
+        entry = self._entries[key]
+        entry["refs"] += 1
+        self._idle.pop(key, None)
+        return entry["frame"].descriptor
+
+    def acquire(self, key):
+        """对已发布的数据增加一次引用，返回描述符；未发布返回None"""
+        with self._lock:
+            return self._acquire(key) if key in self._entries else None
+
+    def release(self, key):
+        """减少一次引用；空闲数据超过 max_idle 时释放最久未用的共享内存段"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry["refs"] == 0:
+                return
+            entry["refs"] -= 1
+            if entry["refs"] == 0:
+                self._idle[key] = True
+                while len(self._idle) > self.max_idle:
+                    stale, _ = self._idle.popitem(last=False)
+                    self._entries.pop(stale)["frame"].close()
+
+    def get(self, key):
+        """返回 (DataFrame, 元数据, SharedFrame)，未发布返回None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return (entry["data"], entry["metadata"], entry["frame"]) if entry else None
+
+    def frame_for(self, data):
+        """若 DataFrame 正是某个已发布的数据，返回其 SharedFrame（供分析上下文复用共享矩阵）"""
+        with self._lock:
+            for entry in self._entries.values():
+                if entry["data"] is data:
+                    return entry["frame"]
+        return None
+
+    def shutdown(self):
+        """释放全部共享内存段（GUI 退出或进程结束时调用）"""
+        with self._lock:
+            for entry in self._entries.values():
+                entry["frame"].close()
+            self._entries.clear()
+            self._idle.clear()
+
+# 进程内唯一的数据平面
+data_plane = DataPlane()
+atexit.register(data_plane.shutdown)
@@ -0,0 +1,346 @@
+# streaming_stats.py
+# 可合并的流式统计累加器：按数据块增量更新，可跨进程合并，内存占用与数据量无关
+# 所有累加器都按列向量化处理，输入为 (行数 × 列数) 的浮点矩阵，缺失值为NaN
+
+import warnings
+import numpy as np
+from scipy import stats
+
+class StatsAccumulator:
+    """
+    逐列流式统计：计数、缺失数、均值/方差（Welford/Chan 合并公式）、最小值、最大值
+    """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        k = len(self.columns)
+        self.rows = 0
+        self.count = np.zeros(k, dtype=np.int64)
+        self.nan_count = np.zeros(k, dtype=np.int64)
+        self.mean = np.zeros(k)
+        self.m2 = np.zeros(k)  # 离差平方和
+        self.min = np.full(k, np.inf)
+        self.max = np.full(k, -np.inf)
+
+    def update(self, matrix):
+        """
+        用一个数据块更新累加器
+
+        参数:
+            matrix (ndarray): (行数 × 列数) 浮点矩阵，列顺序与 columns 一致
+        """
+        matrix = np.asarray(matrix, dtype=float)
+        valid = ~np.isnan(matrix)
+        count = valid.sum(axis=0)
+        dense = bool((count == matrix.shape[0]).all())
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if dense:
+                # 无缺失值时省去掩码运算
+                mean = matrix.sum(axis=0) / np.maximum(count, 1)
+                deviation = matrix - mean
+            else:
+                mean = np.where(count > 0, np.where(valid, matrix, 0.0).sum(axis=0) / np.maximum(count, 1), 0.0)
+                deviation = matrix - mean
+                deviation[~valid] = 0.0
+        m2 = np.einsum('ij,ij->j', deviation, deviation)
+
+        chunk = StatsAccumulator(self.columns)
+        chunk.rows = matrix.shape[0]
+        chunk.count = count.astype(np.int64)
+        chunk.nan_count = (matrix.shape[0] - count).astype(np.int64)
+        chunk.mean = mean
+        chunk.m2 = m2
+        if matrix.shape[0] > 0:
+            # fmin/fmax 跳过NaN，全为NaN的列结果为NaN，按无数据处理
+            chunk.min = np.where(count > 0, np.fmin.reduce(matrix, axis=0), np.inf)
+            chunk.max = np.where(count > 0, np.fmax.reduce(matrix, axis=0), -np.inf)
+        return self.merge(chunk)
+
+    def merge(self, other):
+        """合并另一个累加器（如其他数据块或其他工作进程的结果），原地更新并返回自身"""
+        if other.columns != self.columns:
+            raise ValueError("❌ 累加器列不一致，无法合并")
+        n = self.count + other.count
+        delta = other.mean - self.mean
+        with np.errstate(invalid='ignore', divide='ignore'):
+            ratio = np.where(n > 0, other.count / np.maximum(n, 1), 0.0)
+        self.mean = self.mean + delta * ratio
+        self.m2 = self.m2 + other.m2 + delta ** 2 * self.count * ratio
+        self.count = n
+        self.nan_count = self.nan_count + other.nan_count
+        self.rows += other.rows
+        self.min = np.minimum(self.min, other.min)
+        self.max = np.maximum(self.max, other.max)
+        return self
+
+    def result(self):
+        """
+        输出与 DataAnalyzer.basic_statistics 相同结构的逐列统计（不含分位数）
+
+        无有效值的列不输出
+        """
+        results = {}
+        for j, col in enumerate(self.columns):
+            n = int(self.count[j])
+            if n == 0:
+                continue
+            mean = float(self.mean[j])
+            std = float(np.sqrt(self.m2[j] / (n - 1))) if n > 1 else float('nan')
+            results[col] = {
+                "count": n,
+                "mean": mean,
+                "std": std,
+                "min": float(self.min[j]),
+                "max": float(self.max[j]),
+                "cv": float(std / mean) if mean != 0 else 0,  # 变异系数
+                "nan_count": int(self.nan_count[j])
+            }
+        return results
+
+class TrendAccumulator:
+    """
+    逐列流式线性回归：累加 x、y 的均值与协方差矩（可合并），并记录首末有效值
+
+    x 默认为数据行号，缺失值所在行不参与回归但行号照常递增，保证 x 与 y 对齐；
+    也可逐块传入真实横坐标（如经过的秒数），此时斜率单位为 y/秒。
+    两种横坐标不能混用：行号在合并时按左侧累加器的行数平移，真实横坐标原样保留。
+    单个数据块时即为对整个矩阵的一次批量回归。
+    """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        k = len(self.columns)
+        self.rows = 0
+        # 横坐标类型：'row' 行号 / 'time' 真实横坐标，尚未更新过为None
+        self.x_mode = None
+        self.count = np.zeros(k, dtype=np.int64)
+        self.mean_x = np.zeros(k)
+        self.mean_y = np.zeros(k)
+        self.cxx = np.zeros(k)
+        self.cyy = np.zeros(k)
+        self.cxy = np.zeros(k)
+        self.first = np.full(k, np.nan)
+        self.last = np.full(k, np.nan)
+
+    def update(self, matrix, x=None):
+        """
+        用一个数据块更新累加器
+
+        参数:
+            matrix (ndarray): (行数 × 列数) 浮点矩阵，列顺序与 columns 一致
+            x (ndarray): 可选，各行的真实横坐标（NaN 所在行不参与回归），None 为行号
+        """
+        matrix = np.asarray(matrix, dtype=float)
+        rows, k = matrix.shape
+        if x is not None:
+            x = np.asarray(x, dtype=float)
+            missing = np.isnan(x)
+            if missing.any():
+                matrix = np.where(missing[:, None], np.nan, matrix)
+
+        if x is None:
+            # 横坐标为相对本块起点的行号（合并时再按左侧累加器的行数平移），
+            # 以块中点为原点计算，减小平方和的数值误差
+            center = (rows - 1) / 2 if rows else 0.0
+            u = np.arange(rows, dtype=float) - center
+        else:
+            # 真实横坐标同样以区间中点为原点；无效行的 u 记为0，由掩码剔除
+            center = (np.nanmin(x) + np.nanmax(x)) / 2 if (~missing).any() else 0.0
+            u = np.where(missing, 0.0, x - center)
+
+        # 按列优先存储，缺失位置可用内存顺序的扁平下标定位（行 = 下标 % 行数，列 = 下标 // 行数）
+        matrix = np.asfortranarray(matrix)
+        missing = np.isnan(matrix)
+        valid = ~missing
+        has = valid.any(axis=0)
+        cols = np.arange(k)
+        first_idx = np.argmax(valid, axis=0)
+        last_idx = rows - 1 - np.argmax(valid[::-1], axis=0) if rows else first_idx
+        first = np.where(has, matrix[first_idx, cols], np.nan) if rows else np.full(k, np.nan)
+        # 每列先减去首个有效值，二阶矩的抵消误差与列的绝对量级无关
+        shift = np.where(has, first, 0.0)
+        centered = np.subtract(matrix, shift, order='F')
+        if missing.any():
+            # 缺失位置置0；x 的各列矩 = 全体行的矩 - 缺失位置的贡献，耗时只与缺失值个数有关
+            flat = np.flatnonzero(missing.ravel(order='F'))
+            centered.ravel(order='F')[flat] = 0.0
+            miss_rows, miss_cols = flat % max(rows, 1), flat // max(rows, 1)
+            count = rows - np.bincount(miss_cols, minlength=k)
+            sum_u = u.sum() - np.bincount(miss_cols, weights=u[miss_rows], minlength=k)
+            sum_uu = u @ u - np.bincount(miss_cols, weights=u[miss_rows] ** 2, minlength=k)
+        else:
+            count = np.full(k, rows, dtype=np.int64)
+            sum_u = np.full(k, u.sum())
+            sum_uu = np.full(k, u @ u)
+        # y 的一阶矩与 x·y 交叉矩由一次矩阵乘法 [1, u]ᵀ·Y 得到
+        sum_y, sum_uy = np.vstack([np.ones(rows), u]) @ centered
+        sum_yy = np.einsum('ij,ij->j', centered, centered)
+
+        safe = np.maximum(count, 1)
+        mean_u = sum_u / safe
+        mean_c = sum_y / safe
+        chunk = TrendAccumulator(self.columns)
+        chunk.rows = rows
+        chunk.x_mode = 'row' if x is None else 'time'
+        chunk.count = count.astype(np.int64)
+        chunk.mean_x = mean_u + center
+        chunk.mean_y = mean_c + shift
+        chunk.cxx = np.maximum(sum_uu - count * mean_u * mean_u, 0.0)
+        chunk.cyy = np.maximum(sum_yy - count * mean_c * mean_c, 0.0)
+        chunk.cxy = sum_uy - count * mean_u * mean_c
+        chunk.first = first
+        chunk.last = np.where(has, matrix[last_idx, cols], np.nan) if rows else np.full(k, np.nan)
+        return self.merge(chunk)
+
+    def merge(self, other):
+        """
+        按先后顺序合并另一个累加器（other 的数据紧接在自身之后），原地更新并返回自身
+
+        横坐标与数据位置相关，跨进程合并时必须按数据块在文件中的顺序依次合并
+        """
+        if other.columns != self.columns:
+            raise ValueError("❌ 累加器列不一致，无法合并")
+        if self.x_mode and other.x_mode and self.x_mode != other.x_mode:
+            raise ValueError("❌ 累加器横坐标类型不一致（行号/真实横坐标），无法合并")
+        # 行号相对各自起点，需按左侧行数平移；真实横坐标为绝对值
+        other_mean_x = other.mean_x + self.rows if other.x_mode == 'row' else other.mean_x
+
+        n = self.count + other.count
+        with np.errstate(invalid='ignore', divide='ignore'):
+            ratio = np.where(n > 0, other.count / np.maximum(n, 1), 0.0)
+        dx = other_mean_x - self.mean_x
+        dy = other.mean_y - self.mean_y
+        weight = self.count * ratio
+        self.cxx = self.cxx + other.cxx + dx * dx * weight
+        self.cyy = self.cyy + other.cyy + dy * dy * weight
+        self.cxy = self.cxy + other.cxy + dx * dy * weight
+        self.mean_x = self.mean_x + dx * ratio
+        self.mean_y = self.mean_y + dy * ratio
+        self.first = np.where(self.count > 0, self.first, other.first)
+        self.last = np.where(other.count > 0, other.last, self.last)
+        self.count = n
+        self.rows += other.rows
+        self.x_mode = self.x_mode or other.x_mode
+        return self
+
+    def regression(self):
+        """
+        由累加量计算各列的回归参数（与 scipy.stats.linregress 公式一致）
+
+        返回:
+            dict: slope/intercept/r/p_value/stderr 数组，有效值不足3个的列为NaN
+        """
+        n = self.count.astype(float)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            slope = self.cxy / self.cxx
+            degenerate = (self.cxx == 0) | (self.cyy == 0)
+            r = np.where(degenerate, np.where(self.cxy == 0, np.nan, 0.0), self.cxy / np.sqrt(self.cxx * self.cyy))
+            r = np.clip(r, -1.0, 1.0)
+            intercept = self.mean_y - slope * self.mean_x
+            df = n - 2
+            tiny = 1.0e-20
+            t = r * np.sqrt(df / ((1.0 - r + tiny) * (1.0 + r + tiny)))
+            p_value = 2 * stats.t.sf(np.abs(t), df)
+            stderr = np.sqrt((1 - r ** 2) * self.cyy / self.cxx / df)
+        short = self.count <= 2
+        for arr in (slope, r, intercept, p_value, stderr):
+            arr[short] = np.nan
+        return {"slope": slope, "intercept": intercept, "r": r, "p_value": p_value, "stderr": stderr}
+
+    def result(self):
+        """输出与 DataAnalyzer.trend_analysis 相同结构的逐列趋势结果（有效值不超过2个的列不输出，真实横坐标时附带 slope_unit）"""
+        reg = self.regression()
+        results = {}
+        for j, col in enumerate(self.columns):
+            if self.count[j] <= 2:
+                continue
+            slope = float(reg["slope"][j])
+            r_value = float(reg["r"][j])
+            p_value = float(reg["p_value"][j])
+            first, last = float(self.first[j]), float(self.last[j])
+            results[col] = {
+                "slope": slope,
+                "intercept": float(reg["intercept"][j]),
+                "r_squared": float(r_value ** 2),
+                "correlation": r_value,
+                "p_value": p_value,
+                "std_err": float(reg["stderr"][j]),
+                "trend_direction": "上升" if slope > 0 else "下降" if slope < 0 else "平稳",
+                "trend_strength": "强" if abs(r_value) > 0.7 else "中等" if abs(r_value) > 0.3 else "弱",
+                "is_significant": bool(p_value < 0.05),
+                "relative_change": float((last - first) / first * 100) if first != 0 else 0
+            }
+            if self.x_mode == 'time':
+                results[col]["slope_unit"] = "每秒"
+        return results
+
+class SpectrumAccumulator:
+    """
+    逐列流式 Welch 功率谱：按 nperseg 分段（默认重叠一半）、Hann 窗、逐段去均值后做批量 rfft，
+    累加各段周期图；数据块之间保留不足一段的尾部，分段位置与一次处理整段数据完全一致
+
+    每段内的缺失值在去均值后记为0（即以该段有效值的均值填补）
+    """
+
+    def __init__(self, columns, nperseg=1024, noverlap=None, batch_segments=64):
+        self.columns = list(columns)
+        self.nperseg = int(nperseg)
+        self.noverlap = self.nperseg // 2 if noverlap is None else int(noverlap)
+        self.step = self.nperseg - self.noverlap
+        self.batch_segments = batch_segments
+        self.window = np.hanning(self.nperseg + 1)[:-1] if self.nperseg > 1 else np.ones(1)  # 周期 Hann 窗
+        self.segments = 0
+        self.rows = 0
+        self.power = np.zeros((self.nperseg // 2 + 1, len(self.columns)))
+        self._tail = np.empty((0, len(self.columns)))
+
+    def update(self, matrix):
+        """
+        用一个数据块更新累加器
+
+        参数:
+            matrix (ndarray): (行数 × 列数) 浮点矩阵，列顺序与 columns 一致
+        """
+        matrix = np.asarray(matrix, dtype=float)
+        self.rows += matrix.shape[0]
+        data = np.vstack([self._tail, matrix]) if len(self._tail) else matrix
+        count = (len(data) - self.nperseg) // self.step + 1 if len(data) >= self.nperseg else 0
+        if count > 0:
+            # 分段为原数组的跨步视图，按批做 FFT，工作内存不超过 batch_segments 段
+            frames = np.lib.stride_tricks.sliding_window_view(data, self.nperseg, axis=0)[::self.step][:count]
+            for start in range(0, count, self.batch_segments):
+                batch = frames[start:start + self.batch_segments]  # (段数 × 列数 × nperseg)
+                with np.errstate(invalid='ignore'), warnings.catch_warnings():
+                    warnings.simplefilter('ignore', RuntimeWarning)
+                    batch = batch - np.nanmean(batch, axis=2, keepdims=True)
+                batch = np.nan_to_num(batch, nan=0.0) * self.window
+                spectrum = np.fft.rfft(batch, axis=2)
+                self.power += (spectrum.real ** 2 + spectrum.imag ** 2).sum(axis=0).T
+            self.segments += count
+        self._tail = data[count * self.step:].copy()
+        return self
+
+    @property
+    def segment_length(self):
+        """实际分段长度（一段都不足时以剩余数据作为一段）"""
+        return self.nperseg if self.segments or len(self._tail) < 2 else len(self._tail)
+
+    def result(self, sample_rate=1.0):
+        """
+        单边功率谱密度（与 scipy.signal.welch 的 density 缩放一致）
+
+        返回:
+            tuple: (频率数组, (频率数 × 列数) PSD 矩阵)；一段都不足时以剩余数据作为一段
+        """
+        if self.segments == 0:
+            if len(self._tail) < 2:
+                return np.zeros(0), np.zeros((0, len(self.columns)))
+            short = SpectrumAccumulator(self.columns, len(self._tail), 0).update(self._tail)
+            return short.result(sample_rate)
+        psd = self.power / (self.segments * sample_rate * (self.window ** 2).sum())
+        # 单边谱：除直流与奈奎斯特频率外能量加倍
+        if self.nperseg % 2:
+            psd[1:] *= 2
+        else:
+            psd[1:-1] *= 2
+        return np.fft.rfftfreq(self.nperseg, 1.0 / sample_rate), psd
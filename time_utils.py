@@ -0,0 +1,97 @@
+# time_utils.py
+# 时间列解析：按样例推断一次时间格式并缓存，之后同形状的时间列按固定格式向量化解析
+# 解析结果统一为从首个有效时间起经过的秒数，供趋势、重采样和金字塔使用
+
+import re
+import numpy as np
+import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+
+# 样例形状（数字替换为0）-> 时间格式；None 表示该形状无法按固定格式解析
+_FORMAT_CACHE = {}
+# pandas 无法推断的纯时刻格式
+_TIME_ONLY_FORMATS = ("%H:%M:%S", "%H:%M:%S.%f", "%H:%M")
+
+def _shape(text):
+    return re.sub(r"\d", "0", text.strip())
+
+def infer_time_format(sample):
+    """按一个时间样例推断格式（同形状的样例只推断一次）"""
+    key = _shape(sample)
+    if key not in _FORMAT_CACHE:
+        fmt = guess_datetime_format(sample.strip())
+        if fmt is None:
+            for candidate in _TIME_ONLY_FORMATS:
+                try:
+                    pd.to_datetime(sample.strip(), format=candidate)
+                    fmt = candidate
+                    break
+                except ValueError:
+                    continue
+        _FORMAT_CACHE[key] = fmt
+    return _FORMAT_CACHE[key]
+
+def parse_time(values):
+    """
+    解析时间列
+
+    参数:
+        values (Series): 时间列（数值或时间字符串）
+
+    返回:
+        tuple: (类型, 数组)
+               'numeric'  → float 数组（原始数值，单位视为秒）
+               'datetime' → datetime64[ns] 数组（无法解析的为 NaT）
+               无法解析（有效值不足一半）时返回 (None, None)
+    """
+    values = pd.Series(values)
+    if pd.api.types.is_numeric_dtype(values):
+        return "numeric", values.to_numpy(dtype=float, na_value=np.nan)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return "datetime", values.to_numpy(dtype="datetime64[ns]")
+
+    present = values.dropna()
+    if present.empty:
+        return None, None
+    sample = str(present.iloc[0])
+    fmt = infer_time_format(sample)
+    if fmt is not None:
+        parsed = pd.to_datetime(values, format=fmt, errors="coerce")
+        if parsed.notna().sum() * 2 >= len(present):
+            return "datetime", parsed.to_numpy(dtype="datetime64[ns]")
+    numeric = pd.to_numeric(values, errors="coerce")
+    if numeric.notna().sum() * 2 >= len(present):
+        return "numeric", numeric.to_numpy(dtype=float, na_value=np.nan)
+    return None, None
+
+def elapsed_seconds(kind, values):
+    """把 parse_time 的结果转换为从首个有效时间起经过的秒数（float，无效为NaN）"""
+    if kind == "datetime":
+        values = np.asarray(values).astype("datetime64[ns]")
+        valid = np.flatnonzero(~np.isnat(values))
+        if not len(valid):
+            return np.full(len(values), np.nan)
+        # 先在整数纳秒上减去起点再转浮点，避免绝对时间戳的精度损失
+        ticks = values.astype(np.int64)
+        seconds = (ticks - ticks[valid[0]]).astype(float) / 1e9
+        seconds[np.isnat(values)] = np.nan
+        return seconds
+    seconds = np.asarray(values, dtype=float)
+    valid = np.flatnonzero(~np.isnan(seconds))
+    return seconds - seconds[valid[0]] if len(valid) else seconds
+
+def interval_seconds(interval):
+    """把 '1s'/'1min'/'1h' 或数值（秒）转换为秒数"""
+    if isinstance(interval, (int, float)):
+        seconds = float(interval)
+    else:
+        seconds = pd.to_timedelta(interval).total_seconds()
+    if seconds <= 0:
+        raise ValueError(f"❌ 无效的时间间隔: {interval}")
+    return seconds
+
+def format_times(kind, values):
+    """时间值转为输出用列表：datetime 为精确到秒的字符串，数值原样输出"""
+    if kind == "datetime":
+        return np.datetime_as_string(np.asarray(values).astype("datetime64[ns]"), unit="s").tolist()
+    return [float(v) for v in values]